@@ -0,0 +1,460 @@
+"""
+Admission control for LLM calls.
+
+``BaseChatAPIHandler._post`` and ``_post_stream`` take a slot here before they
+send anything, so the app never has more than ``concurrency`` calls in flight
+per model and host (match it to the host's OLLAMA_NUM_PARALLEL). With ``shared``
+on, the slots are tickets in a SQLite file (``path``), so the limit and the
+priority order hold across every process that uses it: the UI, each uvicorn
+worker and the ingestion workers. With it off, each process has its own gates
+and ``concurrency`` is per process. Requests over the limit wait in a priority
+queue instead of piling up in Ollama's FIFO:
+
+- ``interactive``  chat turns (the default)
+- ``background``   conversation summaries, model warm-ups
+- ``bulk``         batch work such as ingest-time summaries
+
+A freed slot goes to the highest-priority waiter, oldest first (shared waiters
+poll for their turn every few milliseconds, up to ``poll_seconds``). Load is shed
+with ``Overloaded`` (a RuntimeError the API maps to HTTP 503 + Retry-After):
+when the queue holds ``max_queue`` requests, a newcomer evicts the newest
+waiter of a lower priority or is refused itself, and a waiter gives up after its
+priority's ``max_wait_seconds``. Callers pick a priority with a context manager,
+which applies to the calls made on the current thread:
+
+    from admission import BACKGROUND, priority
+    with priority(BACKGROUND):
+        handler.api_call(messages, model)
+
+Recorded: ``neuranix_admission_wait_seconds`` (model, priority) for admitted
+calls and ``neuranix_admission_rejected_total`` (model, priority, reason).
+
+Config (``admission`` section):
+{
+  "enabled": true,
+  "concurrency": 2,                   # calls in flight per model and host
+  "models": {"llava": 1},             # per-model overrides, matched like ollama.models
+  "hosts": {"api.openai.com": 16},    # per-host overrides (host[:port]), for every model on it
+  "max_queue": 32,                    # waiting calls per model and host
+  "max_wait_seconds": {"interactive": 30, "background": 120, "bulk": 600},
+  "retry_after_seconds": 5,
+  "shared": true,                     # one set of gates for every process on the host
+  "path": "./chatTracking/admission.db",
+  "poll_seconds": 0.05,               # longest pause between a shared waiter's checks
+  "stale_seconds": 30                 # tickets of a process that stopped heartbeating are dropped
+}
+"""
+from __future__ import annotations
+
+import contextvars
+import heapq
+import itertools
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from utils import load_config
+from utils.metrics import ADMISSION_REJECTED_TOTAL, ADMISSION_WAIT_SECONDS
+from utils.tracing import set_attributes
+
+logger = logging.getLogger(__name__)
+
+config = load_config()
+
+INTERACTIVE, BACKGROUND, BULK = "interactive", "background", "bulk"
+PRIORITIES = (INTERACTIVE, BACKGROUND, BULK)  # highest first
+
+_priority: contextvars.ContextVar[str] = contextvars.ContextVar("admission_priority", default=INTERACTIVE)
+
+
+class Overloaded(RuntimeError):
+    """An LLM call refused by admission control; safe to retry after ``retry_after`` seconds."""
+
+    def __init__(self, message: str, model: str, reason: str, retry_after: float):
+        super().__init__(message)
+        self.model = model
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@contextmanager
+def priority(name: str) -> Iterator[None]:
+    """Run the LLM calls made inside the block at priority ``name``."""
+    if name not in PRIORITIES:
+        raise ValueError(f"unknown priority {name!r}; expected one of {', '.join(PRIORITIES)}")
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+# ---------------------------
+# Config
+# ---------------------------
+@dataclass(frozen=True)
+class AdmissionCfg:
+    enabled: bool = True
+    concurrency: int = 2
+    models: Tuple[Tuple[str, int], ...] = ()
+    hosts: Tuple[Tuple[str, int], ...] = ()
+    max_queue: int = 32
+    max_wait_seconds: Tuple[Tuple[str, float], ...] = ((INTERACTIVE, 30.0), (BACKGROUND, 120.0), (BULK, 600.0))
+    retry_after_seconds: float = 5.0
+    shared: bool = True
+    path: str = "./chatTracking/admission.db"
+    poll_seconds: float = 0.05
+    stale_seconds: float = 30.0
+
+    @staticmethod
+    def from_dict(d: Optional[Dict[str, Any]]) -> "AdmissionCfg":
+        ac = d or {}
+        waits = {**dict(AdmissionCfg.max_wait_seconds), **(ac.get("max_wait_seconds") or {})}
+        return AdmissionCfg(
+            enabled=bool(ac.get("enabled", True)),
+            concurrency=max(1, int(ac.get("concurrency", 2))),
+            models=tuple((name, max(1, int(limit))) for name, limit in (ac.get("models") or {}).items()),
+            hosts=tuple((host, max(1, int(limit))) for host, limit in (ac.get("hosts") or {}).items()),
+            max_queue=max(0, int(ac.get("max_queue", 32))),
+            max_wait_seconds=tuple((name, float(waits[name])) for name in PRIORITIES),
+            retry_after_seconds=float(ac.get("retry_after_seconds", 5.0)),
+            shared=bool(ac.get("shared", True)),
+            path=str(ac.get("path", AdmissionCfg.path)),
+            poll_seconds=max(0.001, float(ac.get("poll_seconds", 0.05))),
+            stale_seconds=max(1.0, float(ac.get("stale_seconds", 30.0))),
+        )
+
+    def limit_for(self, model: str, host: str = "") -> int:
+        per_model = dict(self.models)
+        return (
+            per_model.get(model) or per_model.get(model.split(":", 1)[0]) or dict(self.hosts).get(host) or self.concurrency
+        )
+
+    def max_wait(self, name: str) -> float:
+        return dict(self.max_wait_seconds)[name]
+
+
+# ---------------------------
+# Controller
+# ---------------------------
+@dataclass(order=True)
+class _Waiter:
+    rank: int
+    seq: int
+    priority: str = field(compare=False)
+    event: threading.Event = field(compare=False, default_factory=threading.Event)
+    outcome: Optional[str] = field(compare=False, default=None)  # "granted" or "shed"
+
+
+@dataclass
+class _Gate:
+    limit: int
+    active: int = 0
+    waiters: List[_Waiter] = field(default_factory=list)  # heap: best rank, then oldest, first
+
+
+class AdmissionController:
+    def __init__(self, cfg: AdmissionCfg):
+        self.cfg = cfg
+        self._gates: Dict[Tuple[str, str], _Gate] = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+
+    def _reject(self, model: str, name: str, reason: str, detail: str) -> Overloaded:
+        ADMISSION_REJECTED_TOTAL.inc(model=model, priority=name, reason=reason)
+        logger.warning("Refused %s call to %s: %s", name, model, detail)
+        return Overloaded(
+            f"{model} is at capacity ({detail}); please retry in {self.cfg.retry_after_seconds:.0f}s.",
+            model, reason, self.cfg.retry_after_seconds,
+        )
+
+    def acquire(self, model: str, host: str = "", name: Optional[str] = None) -> float:
+        """Wait for a slot on (host, model); returns the seconds waited or raises ``Overloaded``."""
+        name = name or _priority.get()
+        t0 = time.monotonic()
+        with self._lock:
+            gate = self._gates.get((host, model))
+            if gate is None:
+                gate = self._gates[(host, model)] = _Gate(self.cfg.limit_for(model, host))
+            if gate.active < gate.limit and not gate.waiters:
+                gate.active += 1
+                ADMISSION_WAIT_SECONDS.observe(0.0, model=model, priority=name)
+                return 0.0
+            waiter = _Waiter(PRIORITIES.index(name), next(self._seq), name)
+            if len(gate.waiters) >= self.cfg.max_queue:
+                victim = max(gate.waiters, default=None)  # lowest priority, newest
+                if victim is None or victim.rank <= waiter.rank:
+                    raise self._reject(model, name, "queue_full", f"{len(gate.waiters)} calls queued")
+                gate.waiters.remove(victim)
+                heapq.heapify(gate.waiters)
+                victim.outcome = "shed"
+                victim.event.set()
+            heapq.heappush(gate.waiters, waiter)
+
+        waiter.event.wait(self.cfg.max_wait(name))
+        with self._lock:
+            if waiter.outcome is None:  # timed out while still queued
+                gate.waiters.remove(waiter)
+                heapq.heapify(gate.waiters)
+        waited = time.monotonic() - t0
+        if waiter.outcome == "granted":
+            ADMISSION_WAIT_SECONDS.observe(waited, model=model, priority=name)
+            return waited
+        if waiter.outcome == "shed":
+            raise self._reject(model, name, "shed", "displaced by higher-priority calls")
+        raise self._reject(model, name, "timeout", f"waited {waited:.0f}s for a slot")
+
+    def release(self, model: str, host: str = "") -> None:
+        with self._lock:
+            gate = self._gates[(host, model)]
+            if gate.waiters:
+                waiter = heapq.heappop(gate.waiters)  # the slot passes straight to it
+                waiter.outcome = "granted"
+                waiter.event.set()
+            else:
+                gate.active -= 1
+
+    @contextmanager
+    def admit(self, model: str, host: str = "") -> Iterator[float]:
+        """Hold a slot on (host, model) for the duration of the block."""
+        if not self.cfg.enabled:
+            yield 0.0
+            return
+        waited = self.acquire(model, host)
+        set_attributes(admission_wait_ms=round(waited * 1000.0, 1))
+        try:
+            yield waited
+        finally:
+            self.release(model, host)
+
+    def status(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {
+                    "host": host,
+                    "model": model,
+                    "limit": gate.limit,
+                    "active": gate.active,
+                    "queued": {name: sum(w.priority == name for w in gate.waiters) for name in PRIORITIES},
+                }
+                for (host, model), gate in self._gates.items()
+            ]
+
+
+# ---------------------------
+# Shared controller (every process using the same file)
+# ---------------------------
+_TICKETS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickets (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,  -- arrival order across processes
+    host TEXT NOT NULL,
+    model TEXT NOT NULL,
+    rank INTEGER NOT NULL,                  -- PRIORITIES index, lower first
+    priority TEXT NOT NULL,
+    state TEXT NOT NULL,                    -- waiting | active | shed
+    owner TEXT NOT NULL,                    -- host:pid of the calling process
+    heartbeat REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tickets_gate ON tickets(host, model, state);
+CREATE INDEX IF NOT EXISTS idx_tickets_owner ON tickets(owner);
+"""
+
+
+class SharedAdmissionController(AdmissionController):
+    """
+    The gates of ``AdmissionController`` kept as ticket rows in SQLite. A call inserts
+    a ticket; it is active at once when the gate has room and nobody waits, else it
+    waits until the active tickets plus the waiting ones ahead of it (better priority,
+    then older) leave room. Each process refreshes its tickets' heartbeat from a
+    daemon thread, so the tickets of a process that died stop counting after
+    ``stale_seconds``.
+    """
+
+    def __init__(self, cfg: AdmissionCfg):
+        super().__init__(cfg)
+        self._pid: Optional[int] = None
+        self._owner = ""
+        self._local = threading.local()
+        self._start_lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cfg.path)), exist_ok=True)
+            conn = sqlite3.connect(self.cfg.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_TICKETS_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _immediate(self) -> Iterator[sqlite3.Connection]:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _owner_id(self) -> str:
+        """This process's ticket owner; starts the heartbeat thread on first use (and after a fork)."""
+        if self._pid != os.getpid():
+            with self._start_lock:
+                if self._pid != os.getpid():
+                    self._local = threading.local()
+                    self._owner = f"{socket.gethostname()}:{os.getpid()}"
+                    threading.Thread(target=self._heartbeat, args=(self._owner,), name="admission-heartbeat", daemon=True).start()
+                    self._pid = os.getpid()
+        return self._owner
+
+    def _heartbeat(self, owner: str) -> None:
+        while self._owner == owner:
+            time.sleep(self.cfg.stale_seconds / 3.0)
+            try:
+                self._conn().execute("UPDATE tickets SET heartbeat = ? WHERE owner = ?", (time.time(), owner))
+            except sqlite3.Error as e:
+                logger.warning("Admission heartbeat failed: %s", e)
+
+    def _has_room(self, conn: sqlite3.Connection, seq: int, rank: int, host: str, model: str, limit: int) -> bool:
+        active, ahead = conn.execute(
+            """
+            SELECT COALESCE(SUM(state = 'active'), 0),
+                   COALESCE(SUM(state = 'waiting' AND (rank < ? OR (rank = ? AND seq < ?))), 0)
+            FROM tickets WHERE host = ? AND model = ? AND heartbeat >= ?
+            """,
+            (rank, rank, seq, host, model, time.time() - self.cfg.stale_seconds),
+        ).fetchone()
+        return active + ahead < limit
+
+    def _state(self, conn: sqlite3.Connection, seq: int) -> Optional[str]:
+        row = conn.execute("SELECT state FROM tickets WHERE seq = ?", (seq,)).fetchone()
+        return row[0] if row else None
+
+    def _poll(self, seq: int, rank: int, host: str, model: str, limit: int) -> Optional[str]:
+        """The ticket's state after one check, promoting it to ``active`` when its turn has come."""
+        conn = self._conn()
+        state = self._state(conn, seq)
+        if state != "waiting" or not self._has_room(conn, seq, rank, host, model, limit):
+            return state  # checked without the write lock: most polls end here
+        with self._immediate() as conn:
+            conn.execute("DELETE FROM tickets WHERE heartbeat < ?", (time.time() - self.cfg.stale_seconds,))
+            state = self._state(conn, seq)
+            if state == "waiting" and self._has_room(conn, seq, rank, host, model, limit):
+                conn.execute("UPDATE tickets SET state = 'active' WHERE seq = ?", (seq,))
+                state = "active"
+        return state
+
+    def _take(self, model: str, host: str, name: str) -> Tuple[int, float]:
+        """Wait for an active ticket on (host, model); returns (ticket, seconds waited) or raises ``Overloaded``."""
+        rank = PRIORITIES.index(name)
+        limit = self.cfg.limit_for(model, host)
+        owner = self._owner_id()
+        t0 = time.monotonic()
+        with self._immediate() as conn:
+            now = time.time()
+            conn.execute("DELETE FROM tickets WHERE heartbeat < ?", (now - self.cfg.stale_seconds,))
+            active, waiting = conn.execute(
+                "SELECT COALESCE(SUM(state = 'active'), 0), COALESCE(SUM(state = 'waiting'), 0) "
+                "FROM tickets WHERE host = ? AND model = ?",
+                (host, model),
+            ).fetchone()
+            state = "active" if active < limit and not waiting else "waiting"
+            if state == "waiting" and waiting >= self.cfg.max_queue:
+                victim = conn.execute(
+                    "SELECT seq, rank FROM tickets WHERE host = ? AND model = ? AND state = 'waiting' "
+                    "ORDER BY rank DESC, seq DESC LIMIT 1",  # lowest priority, newest
+                    (host, model),
+                ).fetchone()
+                if victim is None or victim[1] <= rank:
+                    raise self._reject(model, name, "queue_full", f"{waiting} calls queued")
+                conn.execute("UPDATE tickets SET state = 'shed' WHERE seq = ?", (victim[0],))
+            seq = conn.execute(
+                "INSERT INTO tickets (host, model, rank, priority, state, owner, heartbeat) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (host, model, rank, name, state, owner, now),
+            ).lastrowid
+
+        deadline = t0 + self.cfg.max_wait(name)
+        pause = 0.002
+        while state == "waiting":
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                cur = self._conn().execute("DELETE FROM tickets WHERE seq = ? AND state = 'waiting'", (seq,))
+                state = None if cur.rowcount else self._state(self._conn(), seq)  # granted or shed meanwhile
+                break
+            time.sleep(min(pause, remaining))
+            pause = min(pause * 2, self.cfg.poll_seconds)
+            state = self._poll(seq, rank, host, model, limit)
+
+        waited = time.monotonic() - t0
+        if state == "active":
+            ADMISSION_WAIT_SECONDS.observe(waited, model=model, priority=name)
+            return seq, waited
+        self._give_back(seq)
+        if state == "shed":
+            raise self._reject(model, name, "shed", "displaced by higher-priority calls")
+        raise self._reject(model, name, "timeout", f"waited {waited:.0f}s for a slot")
+
+    def _give_back(self, seq: int) -> None:
+        self._conn().execute("DELETE FROM tickets WHERE seq = ?", (seq,))
+
+    def _held(self) -> Dict[Tuple[str, str], List[int]]:
+        held = getattr(self._local, "held", None)
+        if held is None:
+            held = self._local.held = {}
+        return held
+
+    def acquire(self, model: str, host: str = "", name: Optional[str] = None) -> float:
+        seq, waited = self._take(model, host, name or _priority.get())
+        self._held().setdefault((host, model), []).append(seq)
+        return waited
+
+    def release(self, model: str, host: str = "") -> None:
+        self._give_back(self._held()[(host, model)].pop())
+
+    @contextmanager
+    def admit(self, model: str, host: str = "") -> Iterator[float]:
+        """Hold a ticket on (host, model) for the duration of the block (released from any thread)."""
+        if not self.cfg.enabled:
+            yield 0.0
+            return
+        seq, waited = self._take(model, host, _priority.get())
+        set_attributes(admission_wait_ms=round(waited * 1000.0, 1))
+        try:
+            yield waited
+        finally:
+            self._give_back(seq)
+
+    def status(self) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT host, model, state, priority, COUNT(*) FROM tickets WHERE heartbeat >= ? "
+            "GROUP BY host, model, state, priority ORDER BY host, model",
+            (time.time() - self.cfg.stale_seconds,),
+        ).fetchall()
+        gates: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for host, model, state, name, count in rows:
+            gate = gates.setdefault(
+                (host, model),
+                {"host": host, "model": model, "limit": self.cfg.limit_for(model, host), "active": 0,
+                 "queued": {p: 0 for p in PRIORITIES}},
+            )
+            if state == "active":
+                gate["active"] += count
+            elif state == "waiting":
+                gate["queued"][name] += count
+        return list(gates.values())
+
+
+def build_controller(cfg: AdmissionCfg) -> AdmissionController:
+    return SharedAdmissionController(cfg) if cfg.shared else AdmissionController(cfg)
+
+
+controller = build_controller(AdmissionCfg.from_dict(config.get("admission")))
@@ -1,8 +1,11 @@
+import json
 import logging
 import os
+import time
 import requests
 import streamlit as st
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type
+from urllib.parse import urlsplit
 from dotenv import load_dotenv
 
 from utils import (
@@ -10,8 +13,20 @@ from utils import (
     convert_bytes_to_base64_with_prefix,
     convert_ns_to_seconds,
     load_config,
+    ollama_model_params,
 )
-from vectordb_handler import load_vectordb
+from utils.metrics import (
+    LLM_ERRORS_TOTAL,
+    LLM_PHASE_SECONDS,
+    LLM_REQUEST_SECONDS,
+    LLM_TOKENS_TOTAL,
+    LLM_TTFT_SECONDS,
+    RETRIEVAL_SECONDS,
+)
+from admission import BACKGROUND, controller, priority
+from ollama_router import NODE_ERRORS, get_router
+from utils.prompt_templates import rag_user_template, system_prompt
+from utils.tracing import current_trace_id, set_attributes, span, traced
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 logger = logging.getLogger(__name__)
@@ -19,6 +34,12 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 config = load_config()
 openai_api_key = os.getenv("OPENAI_API_KEY")
+openai_base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+
+
+def session_setting(key: str, default: Any = None) -> Any:
+    """A Streamlit session setting; callers outside the UI pass the value explicitly instead."""
+    return st.session_state.get(key, default)
 
 # ==================================================================
 #  Project   : Neura-Nix - Multimodal AI Assistant {Ollama MultiRag}
@@ -32,7 +53,8 @@ class BaseChatAPIHandler:
     @classmethod
     def _post(cls, url: str, headers: Dict[str, str], payload: Dict[str, Any]) -> Dict[str, Any]:
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=cls.DEFAULT_TIMEOUT)
+            with controller.admit(payload.get("model", ""), urlsplit(url).netloc):
+                response = requests.post(url, headers=headers, json=payload, timeout=cls.DEFAULT_TIMEOUT)
             response.raise_for_status()
             return response.json()
         except requests.RequestException as e:
@@ -42,68 +64,192 @@ class BaseChatAPIHandler:
             logger.error("Invalid JSON response from %s", url)
             raise
 
+    @classmethod
+    def _post_stream(cls, url: str, headers: Dict[str, str], payload: Dict[str, Any]) -> Iterator[str]:
+        """POST and yield the non-empty lines of a streamed (NDJSON/SSE) response."""
+        try:
+            with controller.admit(payload.get("model", ""), urlsplit(url).netloc), requests.post(
+                url, headers=headers, json=payload, timeout=cls.DEFAULT_TIMEOUT, stream=True
+            ) as response:
+                response.raise_for_status()
+                for line in response.iter_lines(decode_unicode=True):
+                    if line:
+                        yield line
+        except requests.RequestException as e:
+            logger.error("HTTP request failed: %s", e)
+            raise
+
 
 class OpenAIChatAPIHandler(BaseChatAPIHandler):
     """Handler for OpenAI chat API."""
-    API_URL = "https://api.openai.com/v1/chat/completions"
+    API_URL = f"{openai_base_url}/chat/completions"
 
     @classmethod
-    def api_call(cls, chat_history: List[Dict[str, Any]]) -> str:
+    @traced("openai.api_call")
+    def api_call(cls, chat_history: List[Dict[str, Any]], model: Optional[str] = None) -> str:
         payload = {
-            "model": st.session_state["model_to_use"],
+            "model": model or session_setting("model_to_use"),
             "messages": chat_history,
             "stream": False,
         }
+        set_attributes(model=payload["model"], messages=len(chat_history))
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {openai_api_key}",
         }
 
-        data = cls._post(cls.API_URL, headers, payload)
+        try:
+            with LLM_REQUEST_SECONDS.time(provider="openai", model=payload["model"]):
+                data = cls._post(cls.API_URL, headers, payload)
+        except Exception:
+            LLM_ERRORS_TOTAL.inc(provider="openai")
+            raise
         if "error" in data:
+            LLM_ERRORS_TOTAL.inc(provider="openai")
             return data["error"].get("message", "Unknown error from OpenAI")
+        usage = data.get("usage") or {}
+        LLM_TOKENS_TOTAL.inc(usage.get("prompt_tokens", 0), model=payload["model"], kind="prompt")
+        LLM_TOKENS_TOTAL.inc(usage.get("completion_tokens", 0), model=payload["model"], kind="eval")
+        set_attributes(prompt_tokens=usage.get("prompt_tokens", 0), eval_tokens=usage.get("completion_tokens", 0))
         return data.get("choices", [{}])[0].get("message", {}).get("content", "")
 
     @classmethod
-    def image_chat(cls, user_input: str, chat_history: List[Dict[str, Any]], image: bytes) -> str:
-        chat_history.append(
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": user_input},
-                    {"type": "image_url", "image_url": {"url": convert_bytes_to_base64_with_prefix(image)}},
-                ],
-            }
-        )
-        return cls.api_call(chat_history)
+    def stream_call(cls, chat_history: List[Dict[str, Any]], model: Optional[str] = None) -> Iterator[str]:
+        """Like ``api_call``, yielding content deltas from the SSE stream as they arrive."""
+        model = model or session_setting("model_to_use")
+        payload = {"model": model, "messages": chat_history, "stream": True}
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {openai_api_key}",
+        }
+        with span("openai.api_call", model=model, messages=len(chat_history), stream=True):
+            t0 = time.perf_counter()
+            first = True
+            try:
+                with LLM_REQUEST_SECONDS.time(provider="openai", model=model):
+                    for line in cls._post_stream(cls.API_URL, headers, payload):
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        delta = (json.loads(data).get("choices") or [{}])[0].get("delta", {}).get("content")
+                        if delta:
+                            if first:
+                                LLM_TTFT_SECONDS.observe(time.perf_counter() - t0, provider="openai", model=model)
+                                first = False
+                            yield delta
+            except Exception:
+                LLM_ERRORS_TOTAL.inc(provider="openai")
+                raise
+
+    @classmethod
+    def image_message(cls, user_input: str, image: bytes) -> Dict[str, Any]:
+        return {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": user_input},
+                {"type": "image_url", "image_url": {"url": convert_bytes_to_base64_with_prefix(image)}},
+            ],
+        }
+
+    @classmethod
+    def image_chat(cls, user_input: str, chat_history: List[Dict[str, Any]], image: bytes, model: Optional[str] = None) -> str:
+        chat_history.append(cls.image_message(user_input, image))
+        return cls.api_call(chat_history, model)
 
 
 class OllamaChatAPIHandler(BaseChatAPIHandler):
     """Handler for Ollama chat API."""
 
     @classmethod
-    def api_call(cls, chat_history: List[Dict[str, Any]]) -> str:
-        payload = {
-            "model": st.session_state["model_to_use"],
-            "messages": chat_history,
-            "stream": False,
-        }
-        url = f"{config['ollama']['base_url'].rstrip('/')}/api/chat"
+    @traced("ollama.api_call")
+    def api_call(cls, chat_history: List[Dict[str, Any]], model: Optional[str] = None) -> str:
+        model = model or session_setting("model_to_use")
+        payload = {"model": model, "messages": chat_history, "stream": False, **ollama_model_params(model)}
+        set_attributes(model=payload["model"], messages=len(chat_history))
 
-        data = cls._post(url, {"Content-Type": "application/json"}, payload)
+        def post(base_url: str) -> Dict[str, Any]:
+            set_attributes(node=base_url)
+            return cls._post(f"{base_url}/api/chat", {"Content-Type": "application/json"}, payload)
+
+        try:
+            with LLM_REQUEST_SECONDS.time(provider="ollama", model=payload["model"]):
+                data = get_router().call(model, post)
+        except Exception:
+            LLM_ERRORS_TOTAL.inc(provider="ollama")
+            raise
 
         if "error" in data:
+            LLM_ERRORS_TOTAL.inc(provider="ollama")
             return f"OLLAMA ERROR: {data['error']}"
 
         cls._print_times(data)
+        cls._record_times(payload["model"], data)
         return data.get("message", {}).get("content", "")
 
     @classmethod
-    def image_chat(cls, user_input: str, chat_history: List[Dict[str, Any]], image: bytes) -> str:
-        chat_history.append(
-            {"role": "user", "content": user_input, "images": [convert_bytes_to_base64(image)]}
-        )
-        return cls.api_call(chat_history)
+    def stream_call(cls, chat_history: List[Dict[str, Any]], model: Optional[str] = None) -> Iterator[str]:
+        """Like ``api_call``, yielding content deltas from the NDJSON stream as they arrive."""
+        model = model or session_setting("model_to_use")
+        payload = {"model": model, "messages": chat_history, "stream": True, **ollama_model_params(model)}
+        router = get_router()
+        with span("ollama.api_call", model=model, messages=len(chat_history), stream=True):
+            try:
+                with LLM_REQUEST_SECONDS.time(provider="ollama", model=model):
+                    tried: List[str] = []
+                    while True:
+                        streamed = False
+                        try:
+                            with router.route(model, tried) as base_url:
+                                tried.append(base_url)
+                                set_attributes(node=base_url)
+                                url = f"{base_url}/api/chat"
+                                for line in cls._post_stream(url, {"Content-Type": "application/json"}, payload):
+                                    data = json.loads(line)
+                                    if "error" in data:
+                                        raise RuntimeError(f"OLLAMA ERROR: {data['error']}")
+                                    delta = data.get("message", {}).get("content")
+                                    if delta:
+                                        streamed = True
+                                        yield delta
+                                    if data.get("done"):
+                                        # The final chunk carries the same timings as a non-streamed reply.
+                                        cls._print_times(data)
+                                        cls._record_times(model, data)
+                                        break
+                            break
+                        except NODE_ERRORS:
+                            # Another node can take over only while nothing has reached the caller.
+                            if streamed or len(tried) >= len(router.nodes):
+                                raise
+            except Exception:
+                LLM_ERRORS_TOTAL.inc(provider="ollama")
+                raise
+
+    @classmethod
+    def image_message(cls, user_input: str, image: bytes) -> Dict[str, Any]:
+        return {"role": "user", "content": user_input, "images": [convert_bytes_to_base64(image)]}
+
+    @classmethod
+    @traced("ollama.warm_up")
+    def warm_up(cls, model: str) -> float:
+        """Load ``model`` (an empty generate request) with its keep_alive; returns Ollama's load seconds."""
+        payload = {"model": model, "prompt": "", "stream": False, **ollama_model_params(model)}
+        with priority(BACKGROUND):
+            data = get_router().call(
+                model, lambda base_url: cls._post(f"{base_url}/api/generate", {"Content-Type": "application/json"}, payload)
+            )
+        load_s = convert_ns_to_seconds(data.get("load_duration", 0))
+        LLM_PHASE_SECONDS.observe(load_s, model=model, phase="load")
+        set_attributes(model=model, load_s=round(load_s, 4))
+        logger.info("Warmed up %s (load %.2fs)", model, load_s)
+        return load_s
+
+    @classmethod
+    def image_chat(cls, user_input: str, chat_history: List[Dict[str, Any]], image: bytes, model: Optional[str] = None) -> str:
+        chat_history.append(cls.image_message(user_input, image))
+        return cls.api_call(chat_history, model)
 
     @classmethod
     def _print_times(cls, data: Dict[str, Any]) -> None:
@@ -116,6 +262,27 @@ class OllamaChatAPIHandler(BaseChatAPIHandler):
         for k, v in times.items():
             logger.info("%s: %.4f seconds", k, v)
 
+    @classmethod
+    def _record_times(cls, model: str, data: Dict[str, Any]) -> None:
+        """Feed Ollama's server-side timings into the metrics histograms."""
+        phases = {
+            phase: convert_ns_to_seconds(data.get(f"{phase}_duration", 0))
+            for phase in ("load", "prompt_eval", "eval")
+        }
+        for phase, seconds in phases.items():
+            LLM_PHASE_SECONDS.observe(seconds, model=model, phase=phase)
+        # Without streaming, the first token is produced once the model is loaded and the prompt evaluated.
+        LLM_TTFT_SECONDS.observe(phases["load"] + phases["prompt_eval"], provider="ollama", model=model)
+        LLM_TOKENS_TOTAL.inc(data.get("prompt_eval_count", 0), model=model, kind="prompt")
+        LLM_TOKENS_TOTAL.inc(data.get("eval_count", 0), model=model, kind="eval")
+        set_attributes(
+            load_s=round(phases["load"], 4),
+            prompt_eval_s=round(phases["prompt_eval"], 4),
+            eval_s=round(phases["eval"], 4),
+            prompt_tokens=data.get("prompt_eval_count", 0),
+            eval_tokens=data.get("eval_count", 0),
+        )
+
 # ==================================================================
 #  Project   : Neura-Nix - Multimodal AI Assistant {Ollama MultiRag}
 #  Author    : UjjwalS (https://www.ujjwalsaini.dev)
@@ -123,18 +290,80 @@ class OllamaChatAPIHandler(BaseChatAPIHandler):
 #  Copyright : © 2025 UjjwalS. All rights reserved.
 # ==================================================================
 class ChatAPIHandler:
-    """Unified handler that dispatches to OpenAI or Ollama."""
+    """
+    Unified handler that dispatches to OpenAI or Ollama.
+
+    ``endpoint``, ``model`` and ``pdf_chat`` default to the Streamlit session's
+    settings; the API server, benchmarks and load tests pass them explicitly.
+    """
 
     @classmethod
+    @traced("ChatAPIHandler.chat")
     def chat(
         cls,
         user_input: str,
         chat_history: List[Dict[str, Any]],
         image: Optional[bytes] = None,
+        endpoint: Optional[str] = None,
+        model: Optional[str] = None,
+        pdf_chat: Optional[bool] = None,
     ) -> str:
-        endpoint = st.session_state.get("endpoint_to_use")
-        model = st.session_state.get("model_to_use")
-        logger.info("Using endpoint=%s, model=%s", endpoint, model)
+        handler, model = cls._prepare(user_input, chat_history, image, endpoint, model, pdf_chat)
+        return handler.api_call(chat_history, model)
+
+    @classmethod
+    def stream_chat(
+        cls,
+        user_input: str,
+        chat_history: List[Dict[str, Any]],
+        image: Optional[bytes] = None,
+        endpoint: Optional[str] = None,
+        model: Optional[str] = None,
+        pdf_chat: Optional[bool] = None,
+    ) -> Iterator[str]:
+        """
+        Like ``chat``, yielding the answer in pieces as the model produces them.
+        The spans it opens live across yields, so consume it on a single thread.
+        """
+        with span("ChatAPIHandler.stream_chat"):
+            handler, model = cls._prepare(user_input, chat_history, image, endpoint, model, pdf_chat)
+            yield from handler.stream_call(chat_history, model)
+
+    @classmethod
+    def warm_up(cls, endpoint: str, model: str) -> None:
+        """Preload the session's model so its first turn does not pay the load; a no-op for OpenAI."""
+        if endpoint == "ollama" and model and config["ollama"].get("warm_up", True):
+            OllamaChatAPIHandler.warm_up(model)
+
+    @staticmethod
+    def _with_system_prompt(chat_history: List[Dict[str, Any]]) -> None:
+        """
+        Put the static system prompt first, merged with a leading summary message, so
+        every request for a session starts with the same tokens: system prompt, summary,
+        history, and only then this turn's message.
+        """
+        if chat_history and chat_history[0].get("role") == "system":
+            chat_history[0] = {"role": "system", "content": f"{system_prompt}\n\n{chat_history[0]['content']}"}
+        else:
+            chat_history.insert(0, {"role": "system", "content": system_prompt})
+
+    @classmethod
+    def _prepare(
+        cls,
+        user_input: str,
+        chat_history: List[Dict[str, Any]],
+        image: Optional[bytes],
+        endpoint: Optional[str],
+        model: Optional[str],
+        pdf_chat: Optional[bool],
+    ) -> Tuple[Type[BaseChatAPIHandler], str]:
+        """Resolve the settings and append this turn's user message to ``chat_history``."""
+        endpoint = endpoint or session_setting("endpoint_to_use")
+        model = model or session_setting("model_to_use")
+        if pdf_chat is None:
+            pdf_chat = bool(session_setting("pdf_chat", False))
+        logger.info("Using endpoint=%s, model=%s (turn=%s)", endpoint, model, current_trace_id())
+        set_attributes(endpoint=endpoint, model=model, pdf_chat=pdf_chat, image=image is not None)
 
         if endpoint == "openai":
             handler = OpenAIChatAPIHandler
@@ -142,22 +371,26 @@ class ChatAPIHandler:
             handler = OllamaChatAPIHandler
         else:
             raise ValueError(f"Unknown endpoint: {endpoint}")
+        cls._with_system_prompt(chat_history)
 
         # PDF chat mode (RAG)
-        if st.session_state.get("pdf_chat", False):
-            vector_db = load_vectordb()
-            retrieved = vector_db.similarity_search(
-                user_input, k=config["chat_config"]["number_of_retrieved_documents"]
-            )
+        if pdf_chat:
+            from retrieval_service import get_retrieval_service  # batches lookups across sessions
+            from summary_index import retrieve  # broad questions go to ingest-time summaries
+
+            vector_db = get_retrieval_service()
+            backend = vector_db.backend
+            k = config["chat_config"]["number_of_retrieved_documents"]
+            with span("similarity_search", backend=backend, k=k), RETRIEVAL_SECONDS.time(backend=backend):
+                retrieved = retrieve(vector_db, user_input, k)
             context = "\n".join([doc.page_content for doc in retrieved])
-            template = f"Answer the user question based on this context:\n{context}\n\nUser Question: {user_input}"
-            chat_history.append({"role": "user", "content": template})
-            return handler.api_call(chat_history)
+            chat_history.append({"role": "user", "content": rag_user_template.format(human_input=user_input, context=context)})
 
         # Image chat mode
-        if image:
-            return handler.image_chat(user_input, chat_history, image)
+        elif image:
+            chat_history.append(handler.image_message(user_input, image))
 
         # Default chat
-        chat_history.append({"role": "user", "content": user_input})
-        return handler.api_call(chat_history)
+        else:
+            chat_history.append({"role": "user", "content": user_input})
+        return handler, model
@@ -0,0 +1,201 @@
+"""
+Rolling-summary conversation memory.
+
+Instead of the last ``chat_memory_length`` messages verbatim, a request carries a
+stored summary of the session's older text messages plus its newest messages,
+together capped at ``token_budget``:
+
+    from conversation_memory import load_chat_context, update_summary_async
+    history = load_chat_context(session_id)                 # [summary message] + recent turns
+    answer = ChatAPIHandler.chat(user_input, history, ...)
+    ...save the turn...
+    update_summary_async(session_id, endpoint, model)       # fold older turns in, off the request path
+
+The summary lives in the ``session_summaries`` table next to the session's messages
+(``database_operations``), together with the id of the last message it covers. After
+a turn, a background thread folds the messages that fell out of the verbatim window
+into it once ``summarize_batch`` of them have accumulated, one LLM call per batch;
+a session is never queued twice. Until then they stay verbatim, so no message is
+ever missing from the prompt unless the budget forces it out.
+
+Config (``chat_config.memory`` section):
+{
+  "enabled": true,
+  "token_budget": 1500,      # summary + verbatim history per request
+  "recent_messages": 6,      # newest messages that always stay verbatim
+  "summarize_batch": 4,      # fold older messages in once this many have accumulated
+  "summary_words": 200,
+  "max_input_tokens": 3000   # new lines per summarisation call (a long backlog takes several)
+}
+With memory disabled, ``load_chat_context`` returns the last ``chat_memory_length``
+messages as before.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from admission import BACKGROUND, priority
+from database_operations import (
+    load_last_k_text_messages_ollama, load_session_summary, load_text_messages_after, save_session_summary,
+)
+from utils import load_config
+from utils.prompt_templates import summary_message_template, summary_prompt_template
+from utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+config = load_config()
+
+
+# ---------------------------
+# Config
+# ---------------------------
+@dataclass(frozen=True)
+class MemoryCfg:
+    enabled: bool = True
+    token_budget: int = 1500
+    recent_messages: int = 6
+    summarize_batch: int = 4
+    summary_words: int = 200
+    max_input_tokens: int = 3000
+
+    @staticmethod
+    def from_dict(d: Optional[Dict[str, Any]]) -> "MemoryCfg":
+        mc = d or {}
+        return MemoryCfg(
+            enabled=bool(mc.get("enabled", True)),
+            token_budget=int(mc.get("token_budget", 1500)),
+            recent_messages=max(1, int(mc.get("recent_messages", 6))),
+            summarize_batch=max(1, int(mc.get("summarize_batch", 4))),
+            summary_words=int(mc.get("summary_words", 200)),
+            max_input_tokens=int(mc.get("max_input_tokens", 3000)),
+        )
+
+
+memory_cfg = MemoryCfg.from_dict(config["chat_config"].get("memory"))
+
+
+@lru_cache(maxsize=1)
+def _token_counter() -> Callable[[str], int]:
+    """tiktoken counts when available (same encoding as the splitter), else ~4 characters per token."""
+    try:
+        from text_chunker import tiktoken_length
+
+        return tiktoken_length(config.get("pdf_text_splitter", {}).get("encoding", "cl100k_base"))
+    except Exception as e:  # not installed, or the encoding file cannot be fetched
+        logger.info("Token counts are estimated from characters (%s)", e)
+        return lambda text: len(text) // 4 + 1
+
+
+def count_tokens(text: str) -> int:
+    return _token_counter()(text)
+
+
+# ---------------------------
+# Request path
+# ---------------------------
+def load_chat_context(chat_history_id: str, cfg: MemoryCfg = memory_cfg) -> List[Dict[str, Any]]:
+    """Chat history for the next request: the session summary, then the newest messages that fit the budget."""
+    if not cfg.enabled:
+        return load_last_k_text_messages_ollama(chat_history_id, config["chat_config"]["chat_memory_length"])
+
+    summary, last_id = load_session_summary(chat_history_id)
+    # Verbatim messages never exceed recent_messages + summarize_batch - 1 while the summariser keeps up.
+    recent = load_text_messages_after(chat_history_id, last_id, cfg.recent_messages + cfg.summarize_batch, newest=True)
+
+    budget = cfg.token_budget
+    head: List[Dict[str, Any]] = []
+    if summary:
+        head = [{"role": "system", "content": summary_message_template.format(summary=summary)}]
+        budget -= count_tokens(head[0]["content"])
+
+    kept: List[Dict[str, Any]] = []
+    for message in reversed(recent):
+        cost = count_tokens(message["content"] or "")
+        if cost > budget and kept:
+            break
+        budget -= cost
+        kept.append({"role": message["role"], "content": message["content"]})
+    kept.reverse()
+    return head + kept
+
+
+# ---------------------------
+# Background summariser
+# ---------------------------
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-summarizer")
+_pending: Set[str] = set()
+_pending_lock = threading.Lock()
+
+
+def _summarize(summary: Optional[str], messages: List[Dict[str, Any]], endpoint: str, model: str, cfg: MemoryCfg) -> str:
+    from chat_api_handler import OllamaChatAPIHandler, OpenAIChatAPIHandler
+
+    handler = OpenAIChatAPIHandler if endpoint == "openai" else OllamaChatAPIHandler
+    new_lines = "\n".join(f"{'Human' if m['role'] == 'user' else 'AI'}: {m['content']}" for m in messages)
+    prompt = summary_prompt_template.format(
+        max_words=cfg.summary_words, summary=summary or "(none yet)", new_lines=new_lines
+    )
+    with priority(BACKGROUND):  # never ahead of a user's turn
+        new_summary = handler.api_call([{"role": "user", "content": prompt}], model).strip()
+    if new_summary.startswith("OLLAMA ERROR"):
+        raise RuntimeError(new_summary)
+    return new_summary
+
+
+def update_summary(chat_history_id: str, endpoint: str, model: str, cfg: MemoryCfg = memory_cfg) -> bool:
+    """Fold every complete batch of messages older than the verbatim window into the summary."""
+    updated = False
+    while True:
+        summary, last_id = load_session_summary(chat_history_id)
+        window = load_text_messages_after(chat_history_id, last_id, cfg.recent_messages + cfg.summarize_batch, newest=True)
+        if len(window) < cfg.recent_messages + cfg.summarize_batch:
+            return updated
+        # Everything before the verbatim window, oldest first, up to max_input_tokens per call.
+        boundary = window[len(window) - cfg.recent_messages]["message_id"]
+        older = load_text_messages_after(chat_history_id, last_id, 10_000)
+        batch, tokens = [], 0
+        for message in older:
+            if message["message_id"] >= boundary:
+                break
+            tokens += count_tokens(message["content"] or "")
+            if batch and tokens > cfg.max_input_tokens:
+                break
+            batch.append(message)
+
+        with span("memory.summarize", session=chat_history_id, messages=len(batch)):
+            new_summary = _summarize(summary, batch, endpoint, model, cfg)
+        if not new_summary:
+            return updated
+        save_session_summary(chat_history_id, new_summary, batch[-1]["message_id"])
+        updated = True
+
+
+def _run_update(chat_history_id: str, endpoint: str, model: str, cfg: MemoryCfg) -> None:
+    with _pending_lock:
+        _pending.discard(chat_history_id)
+    try:
+        update_summary(chat_history_id, endpoint, model, cfg)
+    except Exception as e:
+        logger.warning("Summary update for %s failed (%s); retried after the next turn.", chat_history_id, e)
+
+
+def update_summary_async(chat_history_id: str, endpoint: str, model: str, cfg: MemoryCfg = memory_cfg) -> None:
+    """Queue a summary update for after this turn; a session already queued is not queued again."""
+    if not cfg.enabled or not endpoint or not model:
+        return
+    with _pending_lock:
+        if chat_history_id in _pending:
+            return
+        _pending.add(chat_history_id)
+    _executor.submit(_run_update, chat_history_id, endpoint, model, cfg)
+
+
+def flush(timeout: float = 30.0) -> None:
+    """Wait for the summary updates queued so far (benchmarks, shutdown)."""
+    _executor.submit(lambda: None).result(timeout)
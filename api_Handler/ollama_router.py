@@ -0,0 +1,280 @@
+"""
+Model-aware routing across several Ollama hosts.
+
+``ollama.endpoints`` lists the hosts (``base_url`` alone when empty). The router
+keeps one node per host and, on a background thread, polls each one's
+``/api/ps`` (models loaded in memory) and ``/api/tags`` (models pulled); a host
+that does not answer is marked down until a later probe succeeds. Chat calls
+then go to:
+
+1. a healthy node that already has the model loaded (no load time) and fewer
+   than ``router.spill_outstanding`` requests in flight, else
+2. a healthy node that has the model pulled, else
+3. any healthy node (Ollama answers with an error if it lacks the model),
+
+breaking ties by the fewest requests this process has outstanding on the node.
+A node picked for a model counts as having it loaded until the next probe, so
+bursts for a cold model stick to one host instead of loading it everywhere.
+Connection failures mark the node down and ``call`` retries on the next node; read
+timeouts (a busy node) propagate to the caller.
+
+    from ollama_router import get_router
+    data = get_router().call(model, lambda base_url: post(f"{base_url}/api/chat", ...))
+    with get_router().route(model) as base_url:      # streaming: no retry once bytes flowed
+        ...
+
+    python ollama_router.py status                   # probe the configured hosts once
+
+With a single endpoint every call goes straight to it and nothing is polled.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple, TypeVar
+
+import requests
+
+from utils import load_config, ollama_endpoints
+from utils.metrics import OLLAMA_NODE_FAILURES_TOTAL, OLLAMA_ROUTED_TOTAL
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# The node itself is unreachable; other failures (HTTP errors, unknown models) are not retried elsewhere.
+# A read timeout is not one: the node is busy with the prompt, and sending it again elsewhere doubles the work.
+NODE_ERRORS = (requests.ConnectionError, requests.ConnectTimeout)
+
+
+def normalize_model(name: str) -> str:
+    """Ollama reports ``llama3.2:latest`` for a model requested as ``llama3.2``."""
+    return name if ":" in name else f"{name}:latest"
+
+
+# ---------------------------
+# Config
+# ---------------------------
+@dataclass(frozen=True)
+class RouterCfg:
+    endpoints: Tuple[str, ...] = ("http://localhost:11434",)
+    refresh_seconds: float = 5.0
+    probe_timeout_seconds: float = 2.0
+    spill_outstanding: int = 4  # a warm node this busy no longer wins over a cold one
+
+    @staticmethod
+    def from_dict(d: Optional[Dict[str, Any]]) -> "RouterCfg":
+        """Build from the ``ollama`` config section (``endpoints``, ``base_url`` and ``router``)."""
+        oc = d or {}
+        rc = oc.get("router") or {}
+        return RouterCfg(
+            endpoints=tuple(ollama_endpoints(oc)),
+            refresh_seconds=float(rc.get("refresh_seconds", 5.0)),
+            probe_timeout_seconds=float(rc.get("probe_timeout_seconds", 2.0)),
+            spill_outstanding=max(1, int(rc.get("spill_outstanding", 4))),
+        )
+
+
+# ---------------------------
+# Nodes
+# ---------------------------
+@dataclass
+class OllamaNode:
+    url: str
+    healthy: bool = True  # optimistic until the first probe says otherwise
+    loaded: Set[str] = field(default_factory=set)
+    available: Optional[Set[str]] = None  # None: not probed yet
+    outstanding: int = 0
+    last_probe: float = 0.0
+    last_error: Optional[str] = None
+
+    def has(self, model: str) -> bool:
+        return self.available is None or model in self.available
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "loaded": sorted(self.loaded),
+            "available": sorted(self.available) if self.available is not None else None,
+            "outstanding": self.outstanding,
+            "last_error": self.last_error,
+        }
+
+
+class OllamaRouter:
+    def __init__(self, cfg: RouterCfg):
+        self.cfg = cfg
+        self.nodes = [OllamaNode(url) for url in cfg.endpoints]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- Discovery and health ---------------------------------------
+    def _probe(self, node: OllamaNode) -> None:
+        timeout = self.cfg.probe_timeout_seconds
+        try:
+            ps = requests.get(f"{node.url}/api/ps", timeout=timeout).json()
+            tags = requests.get(f"{node.url}/api/tags", timeout=timeout).json()
+        except (requests.RequestException, ValueError) as e:
+            with self._lock:
+                if node.healthy:
+                    logger.warning("Ollama node %s is down: %s", node.url, e)
+                node.healthy, node.last_error = False, str(e)
+                node.last_probe = time.monotonic()
+            return
+        with self._lock:
+            if not node.healthy:
+                logger.info("Ollama node %s is back", node.url)
+            node.healthy, node.last_error = True, None
+            node.loaded = {normalize_model(m["name"]) for m in ps.get("models", [])}
+            node.available = {normalize_model(m["name"]) for m in tags.get("models", [])}
+            node.last_probe = time.monotonic()
+
+    def refresh(self) -> None:
+        """Probe every node once (in parallel, so one slow host does not delay the others)."""
+        threads = [threading.Thread(target=self._probe, args=(node,), daemon=True) for node in self.nodes]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(self.cfg.probe_timeout_seconds * 2 + 1)
+
+    def start(self) -> "OllamaRouter":
+        """Probe now and then every ``refresh_seconds`` on a daemon thread; a no-op for one node."""
+        if len(self.nodes) < 2 or self._thread is not None:
+            return self
+        self.refresh()
+
+        def _loop() -> None:
+            while not self._stop.wait(self.cfg.refresh_seconds):
+                self.refresh()
+
+        self._thread = threading.Thread(target=_loop, name="ollama-router", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    # --- Routing ----------------------------------------------------
+    def pick(self, model: str, exclude: Sequence[str] = ()) -> OllamaNode:
+        """Choose a node for ``model`` (skipping the URLs in ``exclude``) and count a request on it."""
+        model = normalize_model(model)
+        with self._lock:
+            candidates = [n for n in self.nodes if n.url not in exclude]
+            healthy = [n for n in candidates if n.healthy] or candidates  # all down: try anyway
+            if not healthy:
+                raise requests.ConnectionError("no Ollama node left to try")
+            for reason, pool in (
+                ("loaded", [n for n in healthy if model in n.loaded and n.outstanding < self.cfg.spill_outstanding]),
+                ("available", [n for n in healthy if n.has(model)]),
+                ("fallback", healthy),
+            ):
+                if pool:
+                    break
+            node = min(pool, key=lambda n: n.outstanding)
+            node.outstanding += 1
+            node.loaded.add(model)  # it will be, once this request runs
+        OLLAMA_ROUTED_TOTAL.inc(node=node.url, reason=reason)
+        return node
+
+    def _release(self, node: OllamaNode, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            node.outstanding -= 1
+            if isinstance(error, NODE_ERRORS):
+                node.healthy, node.last_error = False, str(error)
+        if isinstance(error, NODE_ERRORS):
+            OLLAMA_NODE_FAILURES_TOTAL.inc(node=node.url)
+            logger.warning("Ollama node %s failed (%s); routing around it", node.url, error)
+
+    @contextmanager
+    def route(self, model: str, exclude: Sequence[str] = ()) -> Iterator[str]:
+        """Yield the base URL of the chosen node for the duration of one request."""
+        node = self.pick(model, exclude)
+        try:
+            yield node.url
+        except BaseException as e:
+            self._release(node, e)
+            raise
+        self._release(node)
+
+    def call(self, model: str, fn: Callable[[str], T]) -> T:
+        """Run ``fn(base_url)`` on the chosen node; on a connection failure, retry on the next one."""
+        tried: List[str] = []
+        while True:
+            node = self.pick(model, tried)
+            tried.append(node.url)
+            try:
+                result = fn(node.url)
+            except NODE_ERRORS as e:
+                self._release(node, e)
+                if len(tried) >= len(self.nodes):
+                    raise
+                continue
+            except BaseException:
+                self._release(node)
+                raise
+            self._release(node)
+            return result
+
+    def models(self) -> List[str]:
+        """Models pulled on any healthy node that has been probed."""
+        with self._lock:
+            return sorted({m for n in self.nodes if n.healthy and n.available for m in n.available})
+
+    def status(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [n.as_dict() for n in self.nodes]
+
+
+_router: Optional[OllamaRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> OllamaRouter:
+    """The process-wide router, built from config.yaml and started on first use."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = OllamaRouter(RouterCfg.from_dict(load_config().get("ollama"))).start()
+    return _router
+
+
+def configure(cfg: RouterCfg) -> OllamaRouter:
+    """Replace the process-wide router (benchmarks, tests)."""
+    global _router
+    with _router_lock:
+        if _router is not None:
+            _router.stop()
+        _router = OllamaRouter(cfg).start()
+    return _router
+
+
+def main(argv: Sequence[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("status", help="probe the configured Ollama hosts once")
+    ap.parse_args(argv)
+
+    router = OllamaRouter(RouterCfg.from_dict(load_config().get("ollama")))
+    router.refresh()
+    for node in router.status():
+        state = "up  " if node["healthy"] else "DOWN"
+        print(f"{state} {node['url']}")
+        if node["healthy"]:
+            print(f"     loaded:    {', '.join(node['loaded']) or '-'}")
+            print(f"     available: {', '.join(node['available'] or []) or '-'}")
+        else:
+            print(f"     {node['last_error']}")
+    return 0 if all(n["healthy"] for n in router.status()) else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    sys.exit(main(sys.argv[1:]))
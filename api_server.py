@@ -0,0 +1,428 @@
+"""
+Headless HTTP/JSON API alongside the Streamlit UI.
+
+Serves the same building blocks as main.py (ChatAPIHandler, database_operations,
+the ingestion JobQueue and the ASR pipeline) from an ASGI app, so a request costs
+routing plus the work itself instead of a full script rerun.
+
+    python api_server.py                                  # host/port/workers from `api_server` config
+    uvicorn api_server:app --host 0.0.0.0 --port 8000 --workers 4
+
+Routes (nginx forwards /api/ unchanged):
+  GET    /api/health
+  GET    /api/models?endpoint=ollama
+  GET    /api/ollama/nodes            the Ollama hosts chat calls are routed over, with loaded models
+  GET    /api/admission               LLM calls in flight and queued per model and host
+  POST   /api/warmup                  {"model", "endpoint"}: preload a model at session start
+  POST   /api/chat                    {"message", "model", "endpoint", "session_id", "pdf_chat", "image_b64", "history"}
+  POST   /api/chat/stream             same body; NDJSON lines {"delta": ...}, then {"done": true, ...}
+  POST   /api/retrieve                {"queries", "k", "filter", "source_hash"}: top-k chunks per query, embedded in one batch
+  POST   /api/transcribe              multipart `file` (wav/mp3/ogg/webm)
+  POST   /api/ingest                  multipart `files` (PDFs) -> ingestion jobs
+  GET    /api/ingest/{job_id}
+  GET    /api/index/stats?top=50      vectors, disk size and entries per document (index_maintenance)
+  DELETE /api/index/sources/{source_hash}   remove a document's chunks, summaries and ingest jobs
+  GET    /api/sessions
+  GET    /api/sessions/{session_id}/messages
+  DELETE /api/sessions/{session_id}
+
+Blocking work (LLM calls, SQLite, ASR) runs in the server's thread pool; streamed
+turns run on a dedicated pool and hand deltas to the event loop as they arrive.
+Uploaded PDFs go to the same job queue as the UI's, so they are indexed by the
+ingestion workers (the UI's, ``spawn_ingest_workers`` here, or ``job_queue.py worker``);
+``spawn_ingest_workers`` are started once per host, not once per uvicorn worker.
+Each worker process serves its metrics from ``metrics.worker_port`` upwards.
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import binascii
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional
+
+from fastapi import FastAPI, File, HTTPException, Request, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+from admission import Overloaded, controller
+from chat_api_handler import ChatAPIHandler
+from conversation_memory import load_chat_context, update_summary_async
+from dedup import DedupCfg, existing_index, source_filter
+from job_queue import JobQueue, QueueCfg, spawn_workers
+from ollama_router import get_router
+from retrieval_service import get_retrieval_service
+from utils import get_timestamp, list_ollama_models, list_openai_models, load_config
+from utils.metrics import API_REQUEST_SECONDS, MetricsCfg, start_http_server
+from utils.tracing import current_trace_id, turn
+from database_operations import (
+    delete_chat_history, get_all_chat_history_ids, init_db, load_messages, save_image_message, save_text_message,
+)
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+logger = logging.getLogger(__name__)
+
+config = load_config()
+
+
+# ---------------------------
+# Config
+# ---------------------------
+@dataclass(frozen=True)
+class ApiServerCfg:
+    host: str = "0.0.0.0"
+    port: int = 8000
+    workers: int = 2
+    stream_threads: int = 32
+    max_upload_mb: int = 50
+    spawn_ingest_workers: int = 0
+
+    @staticmethod
+    def from_dict(d: Optional[Dict[str, Any]]) -> "ApiServerCfg":
+        """Build from the ``api_server`` config section; API_PORT / API_WORKERS override."""
+        ac = d or {}
+        return ApiServerCfg(
+            host=str(ac.get("host", "0.0.0.0")),
+            port=int(os.getenv("API_PORT", ac.get("port", 8000))),
+            workers=int(os.getenv("API_WORKERS", ac.get("workers", 2))),
+            stream_threads=int(ac.get("stream_threads", 32)),
+            max_upload_mb=int(ac.get("max_upload_mb", 50)),
+            spawn_ingest_workers=int(ac.get("spawn_ingest_workers", 0)),
+        )
+
+
+api_cfg = ApiServerCfg.from_dict(config.get("api_server"))
+metrics_cfg = MetricsCfg.from_dict(config.get("metrics"))
+queue_cfg = QueueCfg.from_dict(config.get("ingestion_queue"))
+dedup_cfg = DedupCfg.from_dict(config.get("dedup"))
+
+MODEL_LISTERS = {
+    "ollama": list_ollama_models,
+    "openai": list_openai_models,
+}
+
+
+# ---------------------------
+# Schemas
+# ---------------------------
+class ChatRequest(BaseModel):
+    message: str
+    model: str
+    endpoint: Literal["ollama", "openai"] = "ollama"
+    session_id: Optional[str] = None  # a new session is created when omitted
+    pdf_chat: bool = False
+    image_b64: Optional[str] = None
+    history: bool = True  # send the session's summary and recent messages (conversation_memory)
+
+
+class WarmupRequest(BaseModel):
+    model: str
+    endpoint: Literal["ollama", "openai"] = "ollama"
+
+
+class RetrieveRequest(BaseModel):
+    queries: List[str]
+    k: int = 4
+    filter: Optional[Dict[str, Any]] = None  # Chroma-style `where`, e.g. {"level": "chunk"}
+    source_hash: Optional[str] = None  # one document's chunks, including those shared with others by dedup
+
+
+class ChatResponse(BaseModel):
+    session_id: str
+    answer: str
+    turn_id: Optional[str] = None
+    elapsed_ms: float
+
+
+# ---------------------------
+# App
+# ---------------------------
+_state: Dict[str, Any] = {}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    init_db()
+    _state["queue"] = JobQueue(queue_cfg)
+    _state["dedup"] = existing_index(dedup_cfg)  # resolves source_hash filters to shared chunks
+    _state["stream_pool"] = ThreadPoolExecutor(api_cfg.stream_threads, thread_name_prefix="api-stream")
+    if api_cfg.spawn_ingest_workers:
+        spawn_workers(queue_cfg, api_cfg.spawn_ingest_workers, once=True)  # lifespan runs in every uvicorn worker
+    if metrics_cfg.enabled:
+        start_http_server(metrics_cfg.host, metrics_cfg.worker_port, attempts=api_cfg.workers + queue_cfg.spawn_workers + 8)
+    yield
+    _state["stream_pool"].shutdown(wait=False, cancel_futures=True)
+
+
+app = FastAPI(title="Neura-Nix API", version="1.0.0", lifespan=lifespan)
+
+
+@app.exception_handler(Overloaded)
+async def overloaded(request: Request, exc: Overloaded) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "reason": exc.reason},
+        headers={"Retry-After": str(int(exc.retry_after))},
+    )
+
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        API_REQUEST_SECONDS.observe(
+            time.perf_counter() - t0,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status),
+        )
+
+
+def _new_session_id() -> str:
+    # The UI keys sessions by timestamp; the suffix keeps concurrent API sessions apart.
+    return f"{get_timestamp()}-{secrets.token_hex(3)}"
+
+
+def _decode_image(image_b64: Optional[str]) -> Optional[bytes]:
+    if not image_b64:
+        return None
+    try:
+        return base64.b64decode(image_b64.split(",", 1)[-1], validate=True)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=422, detail="image_b64 is not valid base64")
+
+
+def _history(req: ChatRequest, session_id: str, image: Optional[bytes]) -> List[Dict[str, Any]]:
+    # Image turns go out without history, as in the UI.
+    if image is not None or not req.history:
+        return []
+    return load_chat_context(session_id)
+
+
+def _save_turn(session_id: str, req: ChatRequest, image: Optional[bytes], answer: str) -> None:
+    save_text_message(session_id, "user", req.message)
+    if image is not None:
+        save_image_message(session_id, "user", image)
+    save_text_message(session_id, "assistant", answer)
+    update_summary_async(session_id, req.endpoint, req.model)
+
+
+async def _read_upload(upload: UploadFile) -> bytes:
+    data = await upload.read(api_cfg.max_upload_mb * 1024 * 1024 + 1)
+    if len(data) > api_cfg.max_upload_mb * 1024 * 1024:
+        raise HTTPException(status_code=413, detail=f"{upload.filename} exceeds {api_cfg.max_upload_mb} MB")
+    return data
+
+
+# ---------------------------
+# Routes
+# ---------------------------
+@app.get("/api/health")
+def health() -> Dict[str, Any]:
+    return {"status": "ok", "pid": os.getpid()}
+
+
+@app.get("/api/models")
+def models(endpoint: Literal["ollama", "openai"] = "ollama") -> Dict[str, Any]:
+    return {"endpoint": endpoint, "models": MODEL_LISTERS[endpoint]()}
+
+
+@app.get("/api/ollama/nodes")
+def ollama_nodes() -> Dict[str, Any]:
+    return {"nodes": get_router().status()}
+
+
+@app.get("/api/admission")
+def admission() -> Dict[str, Any]:
+    return {"gates": controller.status()}
+
+
+@app.post("/api/warmup")
+def warmup(req: WarmupRequest) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    ChatAPIHandler.warm_up(req.endpoint, req.model)
+    return {"model": req.model, "elapsed_ms": (time.perf_counter() - t0) * 1000.0}
+
+
+@app.post("/api/chat", response_model=ChatResponse)
+def chat(req: ChatRequest) -> ChatResponse:
+    t0 = time.perf_counter()
+    session_id = req.session_id or _new_session_id()
+    image = _decode_image(req.image_b64)
+    with turn("api_turn", session=session_id, kind="image" if image else "pdf" if req.pdf_chat else "text"):
+        answer = ChatAPIHandler.chat(
+            user_input=req.message,
+            chat_history=_history(req, session_id, image),
+            image=image,
+            endpoint=req.endpoint,
+            model=req.model,
+            pdf_chat=req.pdf_chat,
+        )
+        _save_turn(session_id, req, image, answer)
+        turn_id = current_trace_id()
+    return ChatResponse(session_id=session_id, answer=answer, turn_id=turn_id, elapsed_ms=(time.perf_counter() - t0) * 1000.0)
+
+
+@app.post("/api/chat/stream")
+async def chat_stream(req: ChatRequest) -> StreamingResponse:
+    session_id = req.session_id or _new_session_id()
+    image = _decode_image(req.image_b64)
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    cancelled = threading.Event()
+
+    def emit(event: Dict[str, Any]) -> None:
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    def produce() -> None:
+        # The whole turn runs on one pool thread, so its spans and SQLite connection stay put.
+        t0 = time.perf_counter()
+        parts: List[str] = []
+        try:
+            with turn("api_turn", session=session_id, kind="stream"):
+                stream = ChatAPIHandler.stream_chat(
+                    user_input=req.message,
+                    chat_history=_history(req, session_id, image),
+                    image=image,
+                    endpoint=req.endpoint,
+                    model=req.model,
+                    pdf_chat=req.pdf_chat,
+                )
+                for delta in stream:
+                    if cancelled.is_set():
+                        stream.close()
+                        return
+                    parts.append(delta)
+                    emit({"delta": delta})
+                answer = "".join(parts)
+                _save_turn(session_id, req, image, answer)
+                emit({"done": True, "session_id": session_id, "turn_id": current_trace_id(),
+                      "elapsed_ms": (time.perf_counter() - t0) * 1000.0})
+        except Exception as e:
+            logger.error("Streamed turn failed: %s", e)
+            event: Dict[str, Any] = {"error": str(e)}
+            if isinstance(e, Overloaded):
+                event["retry_after"] = e.retry_after
+            emit(event)
+        finally:
+            emit(None)
+
+    _state["stream_pool"].submit(produce)
+
+    async def body() -> AsyncIterator[bytes]:
+        try:
+            while (event := await events.get()) is not None:
+                yield (json.dumps(event) + "\n").encode("utf-8")
+        finally:
+            cancelled.set()  # client went away: stop reading from the model
+
+    return StreamingResponse(body(), media_type="application/x-ndjson", headers={"X-Session-Id": session_id})
+
+
+@app.post("/api/retrieve")
+def retrieve(req: RetrieveRequest) -> Dict[str, Any]:
+    if not req.queries or req.k < 1:
+        raise HTTPException(status_code=422, detail="queries must be non-empty and k at least 1")
+    t0 = time.perf_counter()
+    with turn("api_retrieve", queries=len(req.queries), k=req.k):
+        where = req.filter
+        if req.source_hash:
+            by_source = source_filter(req.source_hash, _state.get("dedup"))
+            where = {"$and": [where, by_source]} if where else by_source
+        results = get_retrieval_service().search_many(req.queries, req.k, where)
+    return {
+        "results": [
+            {"query": query, "documents": [{"content": d.page_content, "metadata": d.metadata} for d in docs]}
+            for query, docs in zip(req.queries, results)
+        ],
+        "elapsed_ms": (time.perf_counter() - t0) * 1000.0,
+    }
+
+
+@app.post("/api/transcribe")
+async def transcribe(file: UploadFile = File(...)) -> Dict[str, Any]:
+    audio = await _read_upload(file)
+
+    def run() -> str:
+        from utils.audio_handler import transcribe_audio  # transformers/librosa load on first use
+
+        with turn("api_turn", kind="transcribe"):
+            return transcribe_audio(audio)
+
+    text = await asyncio.get_running_loop().run_in_executor(None, run)
+    return {"text": text}
+
+
+@app.post("/api/ingest")
+async def ingest(files: List[UploadFile] = File(...)) -> Dict[str, Any]:
+    queue: JobQueue = _state["queue"]
+    jobs = []
+    for upload in files:
+        data = await _read_upload(upload)
+        job = await asyncio.get_running_loop().run_in_executor(None, queue.submit, data, upload.filename or "upload.pdf")
+        jobs.append(asdict(job))
+    return {"jobs": jobs}
+
+
+@app.get("/api/ingest/{job_id}")
+def ingest_status(job_id: str) -> Dict[str, Any]:
+    jobs = _state["queue"].get([job_id])
+    if not jobs:
+        raise HTTPException(status_code=404, detail="unknown job")
+    return {**asdict(jobs[0]), "finished": jobs[0].finished}
+
+
+@app.get("/api/index/stats")
+def index_stats(top: int = 50) -> Dict[str, Any]:
+    from index_maintenance import stats  # chromadb loads on first use
+
+    report = stats()
+    report["per_source"] = report["per_source"][:top]
+    return report
+
+
+@app.delete("/api/index/sources/{source_hash}")
+def delete_index_source(source_hash: str) -> Dict[str, Any]:
+    from index_maintenance import delete_source
+
+    return delete_source(source_hash)
+
+
+@app.get("/api/sessions")
+def sessions() -> Dict[str, Any]:
+    return {"sessions": get_all_chat_history_ids()}
+
+
+@app.get("/api/sessions/{session_id}/messages")
+def session_messages(session_id: str) -> Dict[str, Any]:
+    messages = load_messages(session_id)
+    for message in messages:
+        if message["message_type"] != "text" and message["content"] is not None:
+            message["content"] = base64.b64encode(message["content"]).decode("ascii")
+    return {"session_id": session_id, "messages": messages}
+
+
+@app.delete("/api/sessions/{session_id}")
+def delete_session(session_id: str) -> Dict[str, Any]:
+    delete_chat_history(session_id)
+    return {"session_id": session_id, "deleted": True}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("api_server:app", host=api_cfg.host, port=api_cfg.port, workers=api_cfg.workers)
@@ -0,0 +1,183 @@
+"""
+Interactive chat latency while long background and bulk calls share the model.
+
+Usage:
+  python benchmarks/bench_admission.py
+  python benchmarks/bench_admission.py --interactive 8 --background 6 --duration-s 20
+  python benchmarks/bench_admission.py --out benchmarks/results/ --json
+
+Against one fake Ollama that runs ``--parallel`` requests per model and queues
+the rest FIFO (as Ollama does), for ``--duration-s`` seconds:
+
+- ``--interactive`` users send short chat turns, with think time between them
+- ``--background`` workers send long summarisation-sized prompts back to back at
+  ``background`` priority, and ``--bulk`` workers do the same at ``bulk``
+
+Variants (see api_Handler/admission.py):
+
+- ``off``    admission disabled: every call goes straight to Ollama's queue
+- ``on``     ``concurrency`` = ``--parallel``, so waiting happens in the
+             priority queue and interactive turns jump ahead
+- ``shed``   as ``on`` with a small ``max_queue``: excess background/bulk calls
+             are refused instead of queued
+
+Reported per priority: calls completed, refused and latency percentiles, plus
+the admission queue wait recorded in ``neuranix_admission_wait_seconds``. Each
+variant runs in its own process, since the app reads config.yaml at import time.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_services import FakeOllama, LLMProfile, add_profile_args  # noqa: E402
+from harness import bench_workspace, run_metadata, summarize, write_results  # noqa: E402
+from synthetic_pdf import make_text  # noqa: E402
+
+VARIANTS = ("off", "on", "shed")
+
+
+def overrides_for(variant: str, args: argparse.Namespace) -> Dict[str, Any]:
+    admission = {
+        "enabled": variant != "off",
+        "concurrency": args.parallel,
+        "max_queue": args.shed_queue if variant == "shed" else 1000,
+    }
+    return {"admission": admission, "ollama": {"warm_up": False}}
+
+
+def run_variant(args: argparse.Namespace, variant: str) -> Dict[str, Any]:
+    profile = LLMProfile.from_args(args)
+    with FakeOllama(profile) as ollama, bench_workspace(ollama.url, overrides=overrides_for(variant, args)):
+        from admission import BACKGROUND, BULK, INTERACTIVE, Overloaded, priority
+        from chat_api_handler import OllamaChatAPIHandler
+        from utils.metrics import ADMISSION_WAIT_SECONDS
+
+        words = make_text(pages=8, words_per_page=400, seed=3).split()
+        long_prompt = " ".join(words[: args.long_words])
+        latencies: Dict[str, List[float]] = defaultdict(list)
+        refused: Dict[str, int] = defaultdict(int)
+        lock = threading.Lock()
+        deadline = time.monotonic() + args.duration_s
+
+        def call(name: str, prompt: str) -> None:
+            t0 = time.perf_counter()
+            try:
+                with priority(name):
+                    OllamaChatAPIHandler.api_call([{"role": "user", "content": prompt}], args.model)
+            except Overloaded:
+                with lock:
+                    refused[name] += 1
+                time.sleep(0.2)  # a real caller backs off before retrying
+                return
+            with lock:
+                latencies[name].append(time.perf_counter() - t0)
+
+        def interactive(idx: int) -> None:
+            rng = random.Random(args.seed + idx)
+            while time.monotonic() < deadline:
+                start = rng.randrange(0, len(words) - 40)
+                call(INTERACTIVE, " ".join(words[start : start + 30]))
+                time.sleep(rng.expovariate(1.0 / args.think_s))
+
+        def worker(name: str) -> None:
+            while time.monotonic() < deadline:
+                call(name, long_prompt)
+
+        threads = [threading.Thread(target=interactive, args=(i,)) for i in range(args.interactive)]
+        threads += [threading.Thread(target=worker, args=(BACKGROUND,)) for _ in range(args.background)]
+        threads += [threading.Thread(target=worker, args=(BULK,)) for _ in range(args.bulk)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        out: Dict[str, Any] = {}
+        for name in (INTERACTIVE, BACKGROUND, BULK):
+            count, total = ADMISSION_WAIT_SECONDS.snapshot(model=args.model, priority=name)
+            out[name] = {
+                "completed": len(latencies[name]),
+                "refused": refused[name],
+                "queue_wait_mean_ms": total / count * 1000.0 if count else 0.0,
+                "latency": summarize(latencies[name]),
+            }
+        return out
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--variants", default=",".join(VARIANTS))
+    ap.add_argument("--model", default="llama3.2:latest")
+    ap.add_argument("--interactive", type=int, default=6, help="interactive users")
+    ap.add_argument("--background", type=int, default=4, help="background (summary) workers")
+    ap.add_argument("--bulk", type=int, default=4, help="bulk workers")
+    ap.add_argument("--think-s", type=float, default=1.0, help="mean pause between interactive turns")
+    ap.add_argument("--long-words", type=int, default=2000, help="words in a background/bulk prompt")
+    ap.add_argument("--duration-s", type=float, default=15.0)
+    ap.add_argument("--shed-queue", type=int, default=4, help="max_queue of the shed variant")
+    ap.add_argument("--seed", type=int, default=11)
+    ap.add_argument("--out", help="result file (.json) or directory")
+    ap.add_argument("--json", action="store_true")
+    ap.add_argument("--variant", help=argparse.SUPPRESS)  # child process: run one variant, print JSON
+    add_profile_args(ap)
+    ap.set_defaults(prompt_tps=4000.0, eval_tps=300.0, reply_tokens=30, parallel=2)
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.ERROR)
+
+    if args.variant:
+        print(json.dumps(run_variant(args, args.variant)))
+        return 0
+
+    selected = [v.strip() for v in args.variants.split(",") if v.strip()]
+    unknown = set(selected) - set(VARIANTS)
+    if unknown:
+        ap.error(f"unknown variants: {', '.join(sorted(unknown))}")
+    results: Dict[str, Any] = {
+        "benchmark": "admission",
+        "meta": run_metadata(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("out", "json", "variant")},
+        "profile": asdict(LLMProfile.from_args(args)),
+        "scenarios": {},
+    }
+    failed = False
+    for name in selected:
+        proc = subprocess.run([sys.executable, __file__, *argv, "--variant", name], capture_output=True, text=True)
+        if proc.returncode != 0:
+            results["scenarios"][name] = {"error": proc.stderr.strip().splitlines()[-1:] or ["unknown"]}
+            failed = True
+            continue
+        results["scenarios"][name] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    path = write_results(results, args.out, "admission")
+    if args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        print(f"  {'variant':<8}{'priority':<13}{'done':>6}{'refused':>9}{'wait ms':>9}{'p50 ms':>9}{'p95 ms':>9}")
+        for name, r in results["scenarios"].items():
+            if "error" in r:
+                print(f"  {name:<8} error: {r['error']}")
+                continue
+            for prio, p in r.items():
+                print(
+                    f"  {name:<8}{prio:<13}{p['completed']:>6}{p['refused']:>9}{p['queue_wait_mean_ms']:>9.0f}"
+                    f"{p['latency'].get('p50_ms', 0.0):>9.0f}{p['latency'].get('p95_ms', 0.0):>9.0f}"
+                )
+        if path:
+            print(f"wrote {path}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,140 @@
+"""
+Compare the legacy JSON chunk cache (text key + JSON chunk list) with the
+compressed offset blob in ``chunk_codec``.
+
+Usage:
+  python benchmarks/bench_chunk_cache.py --pdf-dir ./manuals
+  python benchmarks/bench_chunk_cache.py --docs 20 --size-mb 4      # synthetic corpus
+
+Reports stored bytes per document and cache-hit latency for both formats.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "ingestionPipeline")]
+
+import chunk_codec  # noqa: E402
+
+WORDS = (
+    "safety device operating manual install clause warranty pressure valve section "
+    "figure table appendix maintenance procedure the of and to in for with shall must"
+).split()
+
+
+def synthetic_texts(docs: int, size_mb: float, seed: int = 7) -> Iterator[Tuple[str, str]]:
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    for d in range(docs):
+        parts: List[str] = []
+        n = 0
+        while n < target:
+            line = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 18)))
+            parts.append(line)
+            n += len(line) + 1
+            if rng.random() < 0.08:
+                parts.append("")
+        yield f"synthetic-{d}", "\n".join(parts)
+
+
+def pdf_texts(pdf_dir: str) -> Iterator[Tuple[str, str]]:
+    import pypdfium2
+
+    for path in sorted(Path(pdf_dir).rglob("*.pdf")):
+        with pypdfium2.PdfDocument(str(path)) as pdf:
+            text = "\n".join(pdf.get_page(i).get_textpage().get_text_range() for i in range(len(pdf)))
+        yield path.name, text
+
+
+def make_splitter(chunk_size: int, overlap: int):
+    try:
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+        return RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=overlap, separators=["\n\n", "\n", " ", ""]
+        ).split_text
+    except ImportError:
+        step = chunk_size - overlap
+        return lambda t: [t[i : i + chunk_size].strip() for i in range(0, len(t), step)]
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000.0
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pdf-dir")
+    ap.add_argument("--docs", type=int, default=10)
+    ap.add_argument("--size-mb", type=float, default=2.0)
+    ap.add_argument("--chunk-size", type=int, default=1024)
+    ap.add_argument("--overlap", type=int, default=50)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--json", dest="json_out", help="write per-document results to this file")
+    args = ap.parse_args(argv)
+
+    split = make_splitter(args.chunk_size, args.overlap)
+    source = pdf_texts(args.pdf_dir) if args.pdf_dir else synthetic_texts(args.docs, args.size_mb)
+    print(f"codec={chunk_codec.default_codec()} (1=zlib 2=zstd 3=lz4)")
+    print(f"{'document':<24}{'chunks':>8}{'legacy KB':>12}{'blob KB':>10}{'ratio':>8}"
+          f"{'legacy hit ms':>15}{'blob hit ms':>13}{'chunk-only ms':>15}")
+
+    rows = []
+    for name, text in source:
+        chunks = split(text)
+        legacy_text = text.encode("utf-8")
+        legacy_chunks = json.dumps(chunks).encode("utf-8")
+        blob = chunk_codec.encode_chunks(text, chunks)
+
+        def legacy_hit():
+            t = legacy_text.decode("utf-8")
+            c = json.loads(legacy_chunks.decode("utf-8"))
+            return t, c
+
+        def blob_hit():
+            doc = chunk_codec.decode(blob)
+            return doc.text, list(doc.chunks())
+
+        def blob_chunk_hit():
+            # What chunk_text() pays: the caller already holds the text.
+            return chunk_codec.decode(blob, known_text=text).chunks()
+
+        row = {
+            "document": name,
+            "chunks": len(chunks),
+            "legacy_bytes": len(legacy_text) + len(legacy_chunks),
+            "blob_bytes": len(blob),
+            "legacy_hit_ms": timed(legacy_hit, args.repeat),
+            "blob_hit_ms": timed(blob_hit, args.repeat),
+            "blob_chunk_hit_ms": timed(blob_chunk_hit, args.repeat),
+        }
+        rows.append(row)
+        print(f"{name[:23]:<24}{row['chunks']:>8}{row['legacy_bytes'] / 1024:>12.1f}{row['blob_bytes'] / 1024:>10.1f}"
+              f"{row['legacy_bytes'] / row['blob_bytes']:>8.1f}{row['legacy_hit_ms']:>15.2f}"
+              f"{row['blob_hit_ms']:>13.2f}{row['blob_chunk_hit_ms']:>15.3f}")
+
+    if rows:
+        legacy = sum(r["legacy_bytes"] for r in rows)
+        blob = sum(r["blob_bytes"] for r in rows)
+        print(f"\ntotal: legacy={legacy / 1048576:.1f} MiB blob={blob / 1048576:.1f} MiB ({legacy / blob:.1f}x smaller)")
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(rows, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,97 @@
+"""
+Native offset-based chunker vs LangChain's RecursiveCharacterTextSplitter.
+
+Usage:
+  python benchmarks/bench_chunker.py --sizes-kb 64 512 4096 --chunk-size 1024 --overlap 50
+  python benchmarks/bench_chunker.py --separators "\\n" "\\n\\n" --json   # the old config order
+
+Reports throughput (MB/s of input text) for each splitter and for the native
+chunker's ``spans()`` (offsets only, what the pipeline stores), and checks that
+both splitters return identical chunks. Exits non-zero on any mismatch.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "ingestionPipeline"), str(ROOT / "benchmarks")]
+
+from synthetic_pdf import make_text  # noqa: E402
+from text_chunker import NativeChunker  # noqa: E402
+
+
+def _mb_per_s(fn: Callable[[], object], nbytes: int, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return nbytes / 1048576 / statistics.median(samples)
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes-kb", type=int, nargs="+", default=[64, 512, 4096])
+    ap.add_argument("--chunk-size", type=int, default=1024)
+    ap.add_argument("--overlap", type=int, default=50)
+    ap.add_argument("--separators", nargs="*", default=None, help='escape sequences allowed, e.g. "\\n\\n"')
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args(argv)
+
+    separators = [s.encode().decode("unicode_escape") for s in args.separators] if args.separators else None
+    native = NativeChunker(args.chunk_size, args.overlap, separators)
+    try:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+    except ImportError:
+        try:
+            from langchain.text_splitter import RecursiveCharacterTextSplitter
+        except ImportError:
+            RecursiveCharacterTextSplitter = None
+    langchain = (
+        RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.overlap, separators=separators)
+        if RecursiveCharacterTextSplitter is not None
+        else None
+    )
+
+    rows: List[Dict[str, object]] = []
+    mismatches = 0
+    for size_kb in args.sizes_kb:
+        words = max(1, size_kb * 1024 // 7 // 20)
+        text = make_text(pages=20, words_per_page=words, seed=size_kb)
+        nbytes = len(text.encode("utf-8"))
+        row: Dict[str, object] = {"size_kb": nbytes // 1024, "chunks": len(native.spans(text)) // 2}
+        row["native_spans_mb_s"] = _mb_per_s(lambda: native.spans(text), nbytes, args.repeat)
+        row["native_split_mb_s"] = _mb_per_s(lambda: native.split_text(text), nbytes, args.repeat)
+        if langchain is not None:
+            row["langchain_mb_s"] = _mb_per_s(lambda: langchain.split_text(text), nbytes, args.repeat)
+            row["speedup"] = row["native_spans_mb_s"] / row["langchain_mb_s"]
+            row["identical"] = native.split_text(text) == langchain.split_text(text)
+            mismatches += not row["identical"]
+        rows.append(row)
+
+    if args.json:
+        print(json.dumps({"chunk_size": args.chunk_size, "overlap": args.overlap, "separators": separators, "results": rows}, indent=2))
+    else:
+        print(f"chunk_size={args.chunk_size} overlap={args.overlap} separators={separators!r}")
+        for row in rows:
+            line = (
+                f"{row['size_kb']:>7} KB  {row['chunks']:>6} chunks  "
+                f"native spans {row['native_spans_mb_s']:7.1f} MB/s  native split {row['native_split_mb_s']:7.1f} MB/s"
+            )
+            if "langchain_mb_s" in row:
+                line += f"  langchain {row['langchain_mb_s']:7.1f} MB/s  x{row['speedup']:.1f}  identical={row['identical']}"
+            print(line)
+        if langchain is None:
+            print("langchain not installed: native numbers only")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
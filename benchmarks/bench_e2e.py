@@ -0,0 +1,271 @@
+"""
+End-to-end benchmarks against local Ollama/OpenAI stand-ins.
+
+Usage:
+  python benchmarks/bench_e2e.py                                  # all scenarios
+  python benchmarks/bench_e2e.py --scenarios rag,history --eval-tps 40 --load-ms 800
+  python benchmarks/bench_e2e.py --out benchmarks/results/        # <dir>/e2e-<commit>-<time>.json
+  python benchmarks/bench_e2e.py --compare benchmarks/results/e2e-<old>.json
+  python benchmarks/bench_e2e.py --compare old.json new.json      # compare two result files
+
+Scenarios (each runs in a scratch workspace, see harness.bench_workspace):
+
+- ``ingest``   synthetic PDFs through ``PDFIngestor.ingest_many`` into a real Chroma
+               collection, embedding via the fake Ollama: pdfs/s, chunks/s, MB/s
+- ``rag``      ``ChatAPIHandler.chat(pdf_chat=True)`` turns: retrieval and turn latency
+- ``history``  ``database_operations`` inserts and history loads at N messages per session
+- ``sessions`` S concurrent sessions doing load-history -> chat -> save turns: throughput
+               and latency under contention (see loadgen.py for mixed, paced traffic)
+
+The LLM stand-ins pace responses by ``--load-ms``, ``--prompt-tps`` and ``--eval-tps``,
+so numbers reflect the app's overhead on top of a known model speed. Scenarios whose
+dependencies are not installed are reported as skipped; any other failure exits 1.
+Results carry the git commit, so runs from different commits can be compared.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_services import FakeOllama, FakeOpenAI, LLMProfile, add_profile_args  # noqa: E402
+from harness import bench_workspace, init_chat_db, print_comparison, run_metadata, summarize, write_results  # noqa: E402
+from synthetic_pdf import make_pdf, make_text  # noqa: E402
+
+SCENARIOS = ("ingest", "rag", "history", "sessions")
+
+
+def _timed(fn: Callable[[], Any], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def _queries(n: int, seed: int) -> List[str]:
+    lines = [line for line in make_text(pages=2, words_per_page=300, seed=seed).splitlines() if line.strip()]
+    return [lines[i % len(lines)] for i in range(n)]
+
+
+# ---------------------------
+# Scenarios
+# ---------------------------
+def _ingest_corpus(ws: Path, pdfs: int, pages: int, seed: int) -> Dict[str, Any]:
+    from Pdf_IngestionPipeline import get_ingestor
+
+    corpus = ws / "corpus"
+    corpus.mkdir(exist_ok=True)
+    paths = []
+    for i in range(pdfs):
+        path = corpus / f"doc{seed}_{i}.pdf"
+        path.write_bytes(make_pdf(pages, 400, seed=seed * 1000 + i))
+        paths.append(str(path))
+    total_bytes = sum(Path(p).stat().st_size for p in paths)
+
+    t0 = time.perf_counter()
+    chunks = get_ingestor().ingest_many(paths)
+    elapsed = time.perf_counter() - t0
+    return {
+        "pdfs": pdfs,
+        "pages": pages,
+        "chunks": chunks,
+        "seconds": elapsed,
+        "pdfs_per_s": pdfs / elapsed,
+        "chunks_per_s": chunks / elapsed,
+        "mb_per_s": total_bytes / 1e6 / elapsed,
+    }
+
+
+def scenario_ingest(ws: Path, args: argparse.Namespace) -> Dict[str, Any]:
+    from utils.metrics import EMBEDDING_BATCH_SECONDS, INGEST_STAGE_SECONDS
+
+    result = _ingest_corpus(ws, args.pdfs, args.pages, seed=1)
+    stages = {}
+    for stage in ("extract_text_from_pdf", "split", "add_documents"):
+        count, total = INGEST_STAGE_SECONDS.snapshot(stage=stage)
+        if count:
+            stages[f"{stage}_mean_ms"] = total / count * 1000.0
+    count, total = EMBEDDING_BATCH_SECONDS.snapshot(kind="ingest")
+    if count:
+        stages["embed_batch_mean_ms"] = total / count * 1000.0
+    result["stages"] = stages
+    return result
+
+
+def scenario_rag(ws: Path, args: argparse.Namespace) -> Dict[str, Any]:
+    from chat_api_handler import ChatAPIHandler
+    from vectordb_handler import get_retriever, load_vectordb
+
+    if load_vectordb()._collection.count() == 0:
+        _ingest_corpus(ws, max(2, args.pdfs // 4), args.pages, seed=2)
+    k = 5
+    queries = _queries(args.turns, seed=3)
+    retrieval = _timed(lambda: get_retriever().similarity_search(queries[0], k=k), args.turns)
+    turns = []
+    for q in queries:
+        t0 = time.perf_counter()
+        ChatAPIHandler.chat(q, [], endpoint=args.endpoint, model=args.model, pdf_chat=True)
+        turns.append(time.perf_counter() - t0)
+    return {"retrieval": summarize(retrieval), "turn": summarize(turns)}
+
+
+def scenario_history(ws: Path, args: argparse.Namespace) -> Dict[str, Any]:
+    import database_operations as db
+    from utils import load_config
+
+    init_chat_db()
+    k = load_config()["chat_config"]["chat_memory_length"]
+    out: Dict[str, Any] = {}
+    for n in args.history_sizes:
+        session = f"history-{n}"
+        with sqlite3.connect(db.DB_PATH) as conn:
+            conn.executemany(
+                "INSERT INTO messages (chat_history_id, sender_type, message_type, text_content) VALUES (?, ?, 'text', ?)",
+                ((session, "user" if i % 2 == 0 else "assistant", f"message {i} " * 20) for i in range(n)),
+            )
+        out[f"n{n}"] = {
+            "load_messages": summarize(_timed(lambda: db.load_messages(session), args.repeat)),
+            "load_last_k": summarize(_timed(lambda: db.load_last_k_text_messages_ollama(session, k), args.repeat)),
+            "save_text_message": summarize(_timed(lambda: db.save_text_message(session, "user", "hello"), args.repeat)),
+        }
+    return out
+
+
+def scenario_sessions(ws: Path, args: argparse.Namespace) -> Dict[str, Any]:
+    import database_operations as db
+    from chat_api_handler import ChatAPIHandler
+    from utils import load_config
+
+    init_chat_db()
+    k = load_config()["chat_config"]["chat_memory_length"]
+    latencies: List[float] = []
+    errors: List[str] = []
+    lock = threading.Lock()
+
+    def session(idx: int) -> None:
+        session_id = f"bench-session-{idx}"
+        for q in _queries(args.turns, seed=100 + idx):
+            t0 = time.perf_counter()
+            try:
+                history = db.load_last_k_text_messages_ollama(session_id, k)
+                answer = ChatAPIHandler.chat(q, history, endpoint=args.endpoint, model=args.model, pdf_chat=False)
+                db.save_text_message(session_id, "user", q)
+                db.save_text_message(session_id, "assistant", answer)
+            except Exception as e:
+                with lock:
+                    errors.append(repr(e))
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - t0)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(args.sessions)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    return {
+        "sessions": args.sessions,
+        "turns": len(latencies),
+        "errors": len(errors),
+        "turns_per_s": len(latencies) / elapsed,
+        "turn": summarize(latencies),
+    }
+
+
+def _rounded(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        return {k: _rounded(v) for k, v in obj.items()}
+    return round(obj, 3) if isinstance(obj, float) else obj
+
+
+RUNNERS: Dict[str, Callable[[Path, argparse.Namespace], Dict[str, Any]]] = {
+    "ingest": scenario_ingest,
+    "rag": scenario_rag,
+    "history": scenario_history,
+    "sessions": scenario_sessions,
+}
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS))
+    ap.add_argument("--endpoint", choices=("ollama", "openai"), default="ollama")
+    ap.add_argument("--model", default="llama3.2:latest")
+    ap.add_argument("--pdfs", type=int, default=8)
+    ap.add_argument("--pages", type=int, default=10)
+    ap.add_argument("--turns", type=int, default=20)
+    ap.add_argument("--sessions", type=int, default=8)
+    ap.add_argument("--history-sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--out", help="result file (.json) or directory")
+    ap.add_argument("--compare", nargs="+", metavar="RESULT", help="baseline result (and optionally a second one)")
+    ap.add_argument("--json", action="store_true", help="print the full result as JSON")
+    ap.add_argument("--keep-workspace", action="store_true")
+    ap.add_argument("--verbose", action="store_true", help="keep the app's INFO logs")
+    add_profile_args(ap)
+    args = ap.parse_args(argv)
+    # Before any app import: their basicConfig(INFO) calls then become no-ops.
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    if args.compare and len(args.compare) == 2:
+        base, new = (json.loads(Path(p).read_text()) for p in args.compare)
+        print_comparison(base, new)
+        return 0
+
+    selected = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(selected) - set(RUNNERS)
+    if unknown:
+        ap.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    profile = LLMProfile.from_args(args)
+    results: Dict[str, Any] = {
+        "benchmark": "e2e",
+        "meta": run_metadata(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("compare", "out", "json", "keep_workspace", "verbose")},
+        "profile": asdict(profile),
+        "scenarios": {},
+    }
+    failed = False
+    with FakeOllama(profile) as ollama, FakeOpenAI(profile) as openai:
+        with bench_workspace(ollama.url, openai.url, keep=args.keep_workspace) as ws:
+            for name in selected:
+                t0 = time.perf_counter()
+                try:
+                    results["scenarios"][name] = RUNNERS[name](ws, args)
+                except ModuleNotFoundError as e:
+                    results["scenarios"][name] = {"skipped": f"missing dependency: {e.name}"}
+                except Exception as e:
+                    results["scenarios"][name] = {"error": repr(e)}
+                    failed = True
+                results["scenarios"][name]["wall_s"] = time.perf_counter() - t0
+        results["fake_requests"] = dict(ollama.requests + openai.requests)
+        results["model_loads"] = ollama.slots.loads + openai.slots.loads
+
+    path = write_results(results, args.out, "e2e")
+    if args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        for name, res in results["scenarios"].items():
+            print(f"[{name}] " + json.dumps(_rounded(res), sort_keys=True))
+        if path:
+            print(f"wrote {path}")
+    if args.compare:
+        print_comparison(json.loads(Path(args.compare[0]).read_text()), results)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,164 @@
+"""
+Parity check + benchmark for the single PDF ingestion path.
+
+Usage:
+  python benchmarks/bench_ingestion_paths.py --pdfs 8 --pages 20 --repeat 3
+  python benchmarks/bench_ingestion_paths.py --json
+
+Feeds synthetic PDFs through the names the UI and the CLI import
+(``utils.pdf_handler.add_documents_to_db`` and
+``Pdf_IngestionPipeline.add_documents_to_db``) and exits non-zero unless:
+
+- both names resolve to the same function, backed by ``get_ingestor()``;
+- the chunks handed to the vector DB equal a plain ``RecursiveCharacterTextSplitter``
+  run with the configured settings (the output of the removed slow path);
+- a repeat upload of the same files is served from the document cache
+  (no pdfium extraction, no splitting).
+
+Timings compare that baseline (a new splitter per text, no cache, one add call)
+with the pipeline on a cold and a warm cache. The vector DB is an in-memory
+recorder, so embedding time is excluded on both sides.
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "database"), str(ROOT / "ingestionPipeline"), str(ROOT / "benchmarks")]
+
+from synthetic_pdf import make_pdf  # noqa: E402
+
+
+class RecordingVectorDB:
+    """Stands in for Chroma: keeps what would have been embedded."""
+
+    def __init__(self) -> None:
+        self.batches: List[List[Any]] = []
+
+    def add_documents(self, documents: List[Any]) -> None:
+        self.batches.append(list(documents))
+
+    def reset(self) -> List[str]:
+        chunks = [d.page_content for batch in self.batches for d in batch]
+        self.batches = []
+        return chunks
+
+
+def _baseline(pdfs: List[bytes], splitter_cfg: Dict[str, Any]) -> List[str]:
+    """What utils/pdf_handler used to do: extract, then a fresh splitter per text."""
+    import pypdfium2
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    chunks: List[str] = []
+    for data in pdfs:
+        with pypdfium2.PdfDocument(data) as pdf:
+            text = "\n".join(pdf.get_page(i).get_textpage().get_text_range() for i in range(len(pdf)))
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=splitter_cfg.get("chunk_size", 1000),
+            chunk_overlap=splitter_cfg.get("overlap", 100),
+            separators=splitter_cfg.get("separators"),
+        )
+        chunks.extend(splitter.split_text(text))
+    return chunks
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pdfs", type=int, default=8)
+    ap.add_argument("--pages", type=int, default=20)
+    ap.add_argument("--words-per-page", type=int, default=400)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args(argv)
+
+    import Pdf_IngestionPipeline as pipeline
+    from utils import load_config
+    from utils import pdf_handler
+
+    recorder = RecordingVectorDB()
+    pipeline.load_vectordb = lambda: recorder  # keep Chroma and the embedding server out of the measurement
+    pipeline.invalidate_fast_retriever = lambda: None
+    ingestor = pipeline.get_ingestor()
+    ingestor.dedup = None  # parity is about extraction/chunking; dedup would drop the warm-run repeats
+    splitter_cfg = load_config().get("pdf_text_splitter", {}) or {}
+
+    failures: List[str] = []
+    if pdf_handler.add_documents_to_db is not pipeline.add_documents_to_db:
+        failures.append("utils.pdf_handler.add_documents_to_db is not the pipeline's function")
+    if ingestor.vdb is not recorder:
+        failures.append("get_ingestor() did not build the ingestor lazily")
+
+    results: Dict[str, Any] = {"pdfs": args.pdfs, "pages": args.pages, "repeat": args.repeat}
+    baseline_s: List[float] = []
+    cold_s: List[float] = []
+    warm_s: List[float] = []
+    for run in range(args.repeat):
+        # Fresh content per run, so "cold" really misses the cache.
+        pdfs = [make_pdf(args.pages, args.words_per_page, seed=run * 1000 + i) for i in range(args.pdfs)]
+        uploads = [io.BytesIO(p) for p in pdfs]  # what st.file_uploader hands to main()
+
+        t0 = time.perf_counter()
+        expected = _baseline(pdfs, splitter_cfg)
+        baseline_s.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        pdf_handler.add_documents_to_db(uploads)
+        cold_s.append(time.perf_counter() - t0)
+        got = recorder.reset()
+        if got != expected:
+            failures.append(f"run {run}: pipeline produced {len(got)} chunks, baseline {len(expected)}")
+
+        calls = {"extract": 0, "split": 0}
+        real_extract, real_split = pipeline.extract_text_from_pdf, ingestor.chunker.split
+
+        def _extract(src, _f=real_extract):
+            calls["extract"] += 1
+            return _f(src)
+
+        def _split(text, _f=real_split):
+            calls["split"] += 1
+            return _f(text)
+
+        pipeline.extract_text_from_pdf, ingestor.chunker.split = _extract, _split
+        try:
+            t0 = time.perf_counter()
+            pdf_handler.add_documents_to_db([io.BytesIO(p) for p in pdfs])
+            warm_s.append(time.perf_counter() - t0)
+        finally:
+            pipeline.extract_text_from_pdf, ingestor.chunker.split = real_extract, real_split
+        if recorder.reset() != expected:
+            failures.append(f"run {run}: cached upload returned different chunks")
+        if calls["extract"] or calls["split"]:
+            failures.append(f"run {run}: repeat upload was not served from cache ({calls})")
+
+    results.update(
+        cache_backend="redis" if ingestor.cache.available else "local-lru",
+        baseline_ms=statistics.median(baseline_s) * 1000.0,
+        pipeline_cold_ms=statistics.median(cold_s) * 1000.0,
+        pipeline_warm_ms=statistics.median(warm_s) * 1000.0,
+        parity=not failures,
+        failures=failures,
+    )
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(
+            f"{args.pdfs} PDFs x {args.pages} pages ({results['cache_backend']} cache)\n"
+            f"  baseline (old slow path) {results['baseline_ms']:9.1f} ms\n"
+            f"  pipeline, cold cache     {results['pipeline_cold_ms']:9.1f} ms\n"
+            f"  pipeline, warm cache     {results['pipeline_warm_ms']:9.1f} ms"
+        )
+        for f in failures:
+            print("FAIL: " + f)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
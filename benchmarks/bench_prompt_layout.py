@@ -0,0 +1,169 @@
+"""
+Model loads and prompt-eval work per chat turn: baseline settings vs the repo's.
+
+Usage:
+  python benchmarks/bench_prompt_layout.py
+  python benchmarks/bench_prompt_layout.py --sessions 4 --turns 16 --think-s 2 --server-keep-alive 1
+  python benchmarks/bench_prompt_layout.py --out benchmarks/results/ --json
+
+Each variant runs S sessions of T text turns against the fake Ollama, pausing
+``--think-s`` between turns, with the fake server unloading idle models after
+``--server-keep-alive`` seconds (Ollama's OLLAMA_KEEP_ALIVE) and reusing its KV
+cache for the longest prompt prefix it has seen (see fake_services.py):
+
+- ``baseline``  the old request shape: no keep_alive/options, no warm-up, and the
+                last ``chat_memory_length`` messages verbatim (a sliding window, so
+                the prompt prefix changes every turn)
+- ``tuned``     config.yaml as shipped: explicit keep_alive and num_ctx, a warm-up
+                call at session start, and summary + stable history (conversation_memory)
+
+Reported per variant, from Ollama's own durations: model loads, load seconds and
+prompt-eval tokens/seconds per turn, time to first token and turn latency. Each
+variant runs in its own process, since the app reads config.yaml at import time.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_services import FakeOllama, LLMProfile, add_profile_args  # noqa: E402
+from harness import bench_workspace, init_chat_db, run_metadata, summarize, write_results  # noqa: E402
+from synthetic_pdf import make_text  # noqa: E402
+
+VARIANTS: Dict[str, Dict[str, Any]] = {
+    "baseline": {
+        "ollama": {"keep_alive_seconds": None, "options": None, "models": None, "warm_up": False},
+        "chat_config": {"memory": {"enabled": False}},
+    },
+    "tuned": {},
+}
+
+
+def run_variant(args: argparse.Namespace, overrides: Dict[str, Any]) -> Dict[str, Any]:
+    profile = LLMProfile.from_args(args)
+    profile.keep_alive_s = args.server_keep_alive
+    with FakeOllama(profile) as ollama, bench_workspace(ollama.url, overrides=overrides):
+        import database_operations as db
+        from chat_api_handler import ChatAPIHandler
+        from conversation_memory import flush, load_chat_context, update_summary_async
+        from utils.metrics import LLM_PHASE_SECONDS, LLM_TOKENS_TOTAL, LLM_TTFT_SECONDS
+
+        init_chat_db()
+        lines = [line for line in make_text(pages=4, words_per_page=300, seed=5).splitlines() if line.strip()]
+        turns: List[float] = []
+        lock = threading.Lock()
+
+        def session(idx: int) -> None:
+            session_id = f"layout-{idx}"
+            ChatAPIHandler.warm_up("ollama", args.model)
+            time.sleep(args.think_s)  # the user reads the page and types
+            for i in range(args.turns):
+                question = lines[(idx * args.turns + i) % len(lines)]
+                t0 = time.perf_counter()
+                history = load_chat_context(session_id)
+                answer = ChatAPIHandler.chat(question, history, endpoint="ollama", model=args.model, pdf_chat=False)
+                db.save_text_message(session_id, "user", question)
+                db.save_text_message(session_id, "assistant", answer)
+                with lock:
+                    turns.append(time.perf_counter() - t0)
+                update_summary_async(session_id, "ollama", args.model)
+                time.sleep(args.think_s)
+
+        threads = [threading.Thread(target=session, args=(i,)) for i in range(args.sessions)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        flush()
+
+        n = len(turns)
+        load_count, load_s = LLM_PHASE_SECONDS.snapshot(model=args.model, phase="load")
+        _, prompt_s = LLM_PHASE_SECONDS.snapshot(model=args.model, phase="prompt_eval")
+        ttft_count, ttft_s = LLM_TTFT_SECONDS.snapshot(provider="ollama", model=args.model)
+        return {
+            "turns": n,
+            "model_loads": ollama.slots.loads,
+            "load_s_total": load_s,
+            "llm_calls": load_count,  # every chat, summary and warm-up call reports a load phase
+            "prompt_tokens_per_call": LLM_TOKENS_TOTAL.value(model=args.model, kind="prompt") / max(1, ttft_count),
+            "prompt_eval_ms_per_call": prompt_s / max(1, ttft_count) * 1000.0,
+            "ttft_mean_ms": ttft_s / max(1, ttft_count) * 1000.0,
+            "turn": summarize(turns),
+        }
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--variants", default=",".join(VARIANTS))
+    ap.add_argument("--model", default="llama3.2:latest")
+    ap.add_argument("--sessions", type=int, default=2)
+    ap.add_argument("--turns", type=int, default=10)
+    ap.add_argument("--think-s", type=float, default=1.5, help="pause between turns")
+    ap.add_argument("--server-keep-alive", type=float, default=1.0, help="fake Ollama's default keep_alive (s)")
+    ap.add_argument("--out", help="result file (.json) or directory")
+    ap.add_argument("--json", action="store_true")
+    ap.add_argument("--variant", help=argparse.SUPPRESS)  # child process: run one variant, print JSON
+    add_profile_args(ap)
+    ap.set_defaults(load_ms=1500.0, prompt_tps=400.0, eval_tps=200.0)
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.variant:
+        print(json.dumps(run_variant(args, VARIANTS[args.variant])))
+        return 0
+
+    selected = [v.strip() for v in args.variants.split(",") if v.strip()]
+    unknown = set(selected) - set(VARIANTS)
+    if unknown:
+        ap.error(f"unknown variants: {', '.join(sorted(unknown))}")
+    profile = LLMProfile.from_args(args)
+    profile.keep_alive_s = args.server_keep_alive
+    results: Dict[str, Any] = {
+        "benchmark": "prompt_layout",
+        "meta": run_metadata(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("out", "json", "variant")},
+        "profile": asdict(profile),
+        "scenarios": {},
+    }
+    failed = False
+    for name in selected:
+        proc = subprocess.run(
+            [sys.executable, __file__, *argv, "--variant", name], capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            results["scenarios"][name] = {"error": proc.stderr.strip().splitlines()[-1:] or ["unknown"]}
+            failed = True
+            continue
+        results["scenarios"][name] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    path = write_results(results, args.out, "prompt_layout")
+    if args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        print(f"  {'variant':<10}{'turns':>7}{'loads':>7}{'load s':>9}{'prompt tok/call':>17}{'prompt ms/call':>16}{'ttft ms':>10}{'turn p50':>10}{'turn p95':>10}")
+        for name, r in results["scenarios"].items():
+            if "error" in r:
+                print(f"  {name:<10} error: {r['error']}")
+                continue
+            print(
+                f"  {name:<10}{r['turns']:>7}{r['model_loads']:>7}{r['load_s_total']:>9.1f}"
+                f"{r['prompt_tokens_per_call']:>17.0f}{r['prompt_eval_ms_per_call']:>16.1f}{r['ttft_mean_ms']:>10.1f}"
+                f"{r['turn']['p50_ms']:>10.1f}{r['turn']['p95_ms']:>10.1f}"
+            )
+        if path:
+            print(f"wrote {path}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
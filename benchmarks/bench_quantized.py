@@ -0,0 +1,117 @@
+"""
+Quantised first pass + float32 rescoring vs exact float32 search.
+
+Usage:
+  python benchmarks/bench_quantized.py --size 100000 --dim 768 --rescore 4 8 16
+  python benchmarks/bench_quantized.py --index chroma_db/fast_index/pdf_embeddings   # real embeddings
+
+Reports resident memory, on-disk size, recall@k against exact float32 top-k,
+and median query latency for each mode. Synthetic vectors are drawn from a
+Gaussian mixture, which is closer to real embedding geometry than pure noise.
+Real-collection queries are perturbed copies of stored vectors.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "database")]
+
+from quantized_index import QuantizedVectorIndex  # noqa: E402
+from vector_index import NumpyVectorIndex  # noqa: E402
+
+
+def clustered(n: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    labels = rng.integers(0, clusters, n)
+    return centers[labels] + 0.35 * rng.standard_normal((n, dim), dtype=np.float32)
+
+
+def p50_ms(fn, queries, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        for q in queries:
+            t0 = time.perf_counter()
+            fn(q)
+            samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000.0
+
+
+def recall(truth: List[List[int]], got: List[List[int]]) -> float:
+    return float(np.mean([len(set(t) & set(g)) / len(t) for t, g in zip(truth, got)]))
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--index", help="existing NumpyVectorIndex directory to benchmark instead of synthetic data")
+    ap.add_argument("--size", type=int, default=50000)
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("--clusters", type=int, default=200)
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--rescore", type=int, nargs="+", default=[4, 8, 16])
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--json", dest="json_out")
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.index:
+            base = NumpyVectorIndex.load(args.index)
+            work = Path(tmp) / "copy"
+            rows = [(base.ids, np.asarray(base.vectors), base.documents, base.metadatas)]
+            base = NumpyVectorIndex.build(work, rows, len(base), base.dim)
+        else:
+            vecs = clustered(args.size, args.dim, args.clusters, seed=1)
+            ids = [str(i) for i in range(args.size)]
+            base = NumpyVectorIndex.build(Path(tmp), [(ids, vecs, [""] * args.size, [{}] * args.size)], args.size, args.dim)
+
+        rng = np.random.default_rng(2)
+        picks = rng.integers(0, len(base), args.queries)
+        queries = np.asarray(base.vectors[picks]) + 0.05 * rng.standard_normal((args.queries, base.dim), dtype=np.float32)
+        truth = [[r for r, _ in base.search(q, args.k)] for q in queries]
+
+        rows = [{
+            "mode": "float32",
+            "rescore_factor": None,
+            "resident_mb": len(base) * base.dim * 4 / 1048576,
+            "recall_at_k": 1.0,
+            "p50_ms": p50_ms(lambda q: base.search(q, args.k), queries, args.repeat),
+        }]
+        disk = {"float32": (Path(base.path) / "vectors.npy").stat().st_size}
+        for mode in ("int8", "binary"):
+            for factor in args.rescore:
+                qi = QuantizedVectorIndex.wrap(base, mode, factor)
+                got = [[r for r, _ in qi.search(q, args.k)] for q in queries]
+                fp = qi.footprint()
+                disk[mode] = fp["codes_file_bytes"]
+                rows.append({
+                    "mode": mode,
+                    "rescore_factor": factor,
+                    "resident_mb": fp["resident_bytes"] / 1048576,
+                    "recall_at_k": recall(truth, got),
+                    "p50_ms": p50_ms(lambda q: qi.search(q, args.k), queries, args.repeat),
+                })
+
+    print(f"vectors={len(base)} dim={base.dim} k={args.k}")
+    print("on-disk: " + ", ".join(f"{m}={b / 1048576:.1f} MiB" for m, b in disk.items()))
+    print(f"{'mode':<9}{'rescore':>8}{'resident MiB':>14}{'recall@k':>10}{'p50 ms':>9}")
+    for r in rows:
+        factor = "-" if r["rescore_factor"] is None else r["rescore_factor"]
+        print(f"{r['mode']:<9}{factor:>8}{r['resident_mb']:>14.1f}{r['recall_at_k']:>10.3f}{r['p50_ms']:>9.2f}")
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps({"disk_bytes": disk, "rows": rows}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,189 @@
+"""
+RAG lookups from many concurrent sessions: one embedding request per query vs micro-batched.
+
+Usage:
+  python benchmarks/bench_retrieval_service.py
+  python benchmarks/bench_retrieval_service.py --sessions 32 --lookups 20 --embed-parallel 1
+  python benchmarks/bench_retrieval_service.py --window-ms 10 --out benchmarks/results/ --json
+
+A NumpyVectorIndex of ``--chunks`` synthetic chunks (embedded like the fake
+Ollama embeds) is searched through retrieval_service by ``--sessions`` threads,
+each doing ``--lookups`` similarity searches with think time between them. The
+fake Ollama serves ``--embed-parallel`` embedding requests at a time and queues
+the rest, as Ollama does with its embedding model. Variants:
+
+- ``single``   ``retrieval.micro_batch`` off: every lookup sends its own ``/api/embed``
+- ``batched``  lookups arriving within ``--window-ms`` share one ``/api/embed``
+               and one matrix product
+
+Reported per variant: lookups per second, lookup latency percentiles, the number
+of embedding requests and the mean batch size. Each variant runs in its own
+process, since the app reads config.yaml at import time.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import random
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_services import FakeOllama, LLMProfile, add_profile_args, embed_text  # noqa: E402
+from harness import bench_workspace, run_metadata, summarize, write_results  # noqa: E402
+from synthetic_pdf import make_text  # noqa: E402
+
+VARIANTS = ("single", "batched")
+
+
+class FakeOllamaEmbeddings:
+    """The ``embed_documents`` part of OllamaEmbeddings, against the fake server's /api/embed."""
+
+    def __init__(self, base_url: str, model: str = "nomic-embed-text:latest"):
+        self.url = f"{base_url}/api/embed"
+        self.model = model
+
+    def embed_documents(self, texts: Sequence[str]) -> List[List[float]]:
+        resp = requests.post(self.url, json={"model": self.model, "input": list(texts)}, timeout=60)
+        resp.raise_for_status()
+        return resp.json()["embeddings"]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def run_variant(args: argparse.Namespace, variant: str) -> Dict[str, Any]:
+    profile = LLMProfile.from_args(args)
+    profile.embed_parallel = args.embed_parallel
+    retrieval = {"micro_batch": variant == "batched", "window_ms": args.window_ms, "max_batch": args.max_batch}
+    with FakeOllama(profile) as ollama, bench_workspace(ollama.url, overrides={"retrieval": retrieval}) as ws:
+        from retrieval_service import RetrievalCfg, RetrievalService
+        from utils import load_config
+        from utils.metrics import RETRIEVAL_BATCH_SIZE
+        from vector_index import FastRetriever, NumpyVectorIndex
+
+        words = make_text(pages=max(1, args.chunks // 4), words_per_page=400, seed=5).split()
+        chunks = [" ".join(words[i : i + 100]) for i in range(0, len(words) - 100, 100)][: args.chunks]
+        metas = [{"source_hash": f"src{i % 8}", "chunk_index": i} for i in range(len(chunks))]
+        vectors = [embed_text(c, profile.embedding_dim) for c in chunks]
+        index = NumpyVectorIndex.build(
+            ws / "fast_index", [([f"chunk:{i}" for i in range(len(chunks))], vectors, chunks, metas)],
+            len(chunks), profile.embedding_dim,
+        )
+        store = FastRetriever(index, FakeOllamaEmbeddings(ollama.url))
+        service = RetrievalService(RetrievalCfg.from_dict(load_config().get("retrieval")), retriever=lambda: store)
+
+        latencies: List[float] = []
+        errors: List[str] = []
+        lock = threading.Lock()
+
+        def session(idx: int) -> None:
+            rng = random.Random(args.seed + idx)
+            for _ in range(args.lookups):
+                start = rng.randrange(0, len(words) - 20)
+                question = " ".join(words[start : start + 12])
+                t0 = time.perf_counter()
+                try:
+                    service.similarity_search(question, k=args.k)
+                except Exception as e:  # counted, the session carries on
+                    with lock:
+                        errors.append(type(e).__name__)
+                    continue
+                with lock:
+                    latencies.append(time.perf_counter() - t0)
+                if args.think_ms > 0:
+                    time.sleep(rng.expovariate(1000.0 / args.think_ms))
+
+        threads = [threading.Thread(target=session, args=(i,)) for i in range(args.sessions)]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - t0
+
+        batches, queries = RETRIEVAL_BATCH_SIZE.snapshot()
+        return {
+            "lookups": len(latencies),
+            "errors": len(errors),
+            "wall_s": wall,
+            "lookups_per_s": len(latencies) / wall if wall else 0.0,
+            "embed_requests": ollama.requests["/api/embed"],
+            "mean_batch": queries / batches if batches else 0.0,
+            "lookup": summarize(latencies),
+        }
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--variants", default=",".join(VARIANTS))
+    ap.add_argument("--chunks", type=int, default=2000, help="chunks in the index")
+    ap.add_argument("--sessions", type=int, default=16, help="concurrent sessions")
+    ap.add_argument("--lookups", type=int, default=25, help="lookups per session")
+    ap.add_argument("--k", type=int, default=4)
+    ap.add_argument("--think-ms", type=float, default=20.0, help="mean pause between a session's lookups")
+    ap.add_argument("--embed-parallel", type=int, default=1, help="embedding requests the fake Ollama runs at once")
+    ap.add_argument("--window-ms", type=float, default=5.0, help="retrieval.window_ms")
+    ap.add_argument("--max-batch", type=int, default=64, help="retrieval.max_batch")
+    ap.add_argument("--seed", type=int, default=13)
+    ap.add_argument("--out", help="result file (.json) or directory")
+    ap.add_argument("--json", action="store_true")
+    ap.add_argument("--variant", help=argparse.SUPPRESS)  # child process: run one variant, print JSON
+    add_profile_args(ap)
+    ap.set_defaults(embed_ms=15.0)
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.ERROR)
+
+    if args.variant:
+        print(json.dumps(run_variant(args, args.variant)))
+        return 0
+
+    selected = [v.strip() for v in args.variants.split(",") if v.strip()]
+    unknown = set(selected) - set(VARIANTS)
+    if unknown:
+        ap.error(f"unknown variants: {', '.join(sorted(unknown))}")
+    results: Dict[str, Any] = {
+        "benchmark": "retrieval_service",
+        "meta": run_metadata(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("out", "json", "variant")},
+        "profile": asdict(LLMProfile.from_args(args)),
+        "scenarios": {},
+    }
+    failed = False
+    for name in selected:
+        proc = subprocess.run([sys.executable, __file__, *argv, "--variant", name], capture_output=True, text=True)
+        if proc.returncode != 0:
+            results["scenarios"][name] = {"error": proc.stderr.strip().splitlines()[-1:] or ["unknown"]}
+            failed = True
+            continue
+        results["scenarios"][name] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    path = write_results(results, args.out, "retrieval_service")
+    if args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        print(f"  {'variant':<9}{'lookups':>8}{'errors':>8}{'per s':>8}{'embeds':>8}{'batch':>7}{'p50 ms':>9}{'p95 ms':>9}")
+        for name, r in results["scenarios"].items():
+            if "error" in r:
+                print(f"  {name:<9} error: {r['error']}")
+                continue
+            print(
+                f"  {name:<9}{r['lookups']:>8}{r['errors']:>8}{r['lookups_per_s']:>8.0f}{r['embed_requests']:>8}"
+                f"{r['mean_batch']:>7.1f}{r['lookup'].get('p50_ms', 0.0):>9.1f}{r['lookup'].get('p95_ms', 0.0):>9.1f}"
+            )
+        if path:
+            print(f"wrote {path}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
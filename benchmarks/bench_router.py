@@ -0,0 +1,174 @@
+"""
+Chat latency and model loads with several Ollama hosts: one host vs the router's pool.
+
+Usage:
+  python benchmarks/bench_router.py
+  python benchmarks/bench_router.py --nodes 3 --sessions 6 --turns 8 --models llama3.2,llava,mistral
+  python benchmarks/bench_router.py --kill-after-s 3 --out benchmarks/results/ --json
+
+Starts ``--nodes`` fake Ollama servers (see fake_services.py) and runs S sessions
+of T chat turns, each session on one of ``--models``. Variants:
+
+- ``single``  ``ollama.endpoints`` is the first node only (the old ``base_url`` setup)
+- ``pool``    all nodes, routed by ollama_router (warm node first, then fewest in flight)
+
+With ``--kill-after-s`` one node is stopped mid-run, to show calls moving to the
+remaining nodes instead of failing. Reported per variant: turn latency, errors,
+and per node the chat calls served and model loads paid. Each variant runs in
+its own process, since the app reads config.yaml at import time.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import random
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_services import FakeOllama, LLMProfile, add_profile_args  # noqa: E402
+from harness import bench_workspace, init_chat_db, run_metadata, summarize, write_results  # noqa: E402
+from synthetic_pdf import make_text  # noqa: E402
+
+VARIANTS = ("single", "pool")
+
+
+def run_variant(args: argparse.Namespace, variant: str) -> Dict[str, Any]:
+    models = [m.strip() for m in args.models.split(",") if m.strip()]
+    profile = LLMProfile.from_args(args)
+    profile.models = tuple(models)
+    nodes = [FakeOllama(profile).start() for _ in range(args.nodes)]
+    endpoints = [n.url for n in (nodes if variant == "pool" else nodes[:1])]
+    router = {"refresh_seconds": args.refresh_s, "spill_outstanding": args.spill}
+    overrides = {"ollama": {"endpoints": endpoints, "router": router, "warm_up": False}}
+    try:
+        with bench_workspace(nodes[0].url, overrides=overrides):
+            from chat_api_handler import ChatAPIHandler
+
+            init_chat_db()
+            lines = [line for line in make_text(pages=2, words_per_page=200, seed=9).splitlines() if line.strip()]
+            turns: List[float] = []
+            errors: List[str] = []
+            lock = threading.Lock()
+            rng = random.Random(args.seed)
+            think = [[rng.expovariate(1.0 / args.think_s) if args.think_s > 0 else 0.0 for _ in range(args.turns)]
+                     for _ in range(args.sessions)]
+
+            def session(idx: int) -> None:
+                model = models[idx % len(models)]
+                history: List[Dict[str, Any]] = []
+                for i in range(args.turns):
+                    question = lines[(idx * args.turns + i) % len(lines)]
+                    t0 = time.perf_counter()
+                    try:
+                        answer = ChatAPIHandler.chat(question, history, endpoint="ollama", model=model, pdf_chat=False)
+                    except Exception as e:  # counted, the session carries on
+                        with lock:
+                            errors.append(type(e).__name__)
+                        continue
+                    history.append({"role": "assistant", "content": answer})
+                    with lock:
+                        turns.append(time.perf_counter() - t0)
+                    time.sleep(think[idx][i])
+
+            threads = [threading.Thread(target=session, args=(i,)) for i in range(args.sessions)]
+            t0 = time.perf_counter()
+            for t in threads:
+                t.start()
+            if args.kill_after_s > 0 and len(endpoints) > 1:
+                time.sleep(args.kill_after_s)
+                nodes[-1].stop()
+            for t in threads:
+                t.join()
+            wall = time.perf_counter() - t0
+
+            return {
+                "turns": len(turns),
+                "errors": len(errors),
+                "wall_s": wall,
+                "turn": summarize(turns),
+                "nodes": [
+                    {"url": n.url, "chat_calls": n.requests["/api/chat"], "model_loads": n.slots.loads}
+                    for n in nodes[: len(endpoints)]
+                ],
+            }
+    finally:
+        for n in nodes:
+            try:
+                n.stop()
+            except OSError:  # already stopped by --kill-after-s
+                pass
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--variants", default=",".join(VARIANTS))
+    ap.add_argument("--nodes", type=int, default=3)
+    ap.add_argument("--models", default="llama3.2:latest,llava:latest,mistral:latest")
+    ap.add_argument("--sessions", type=int, default=6)
+    ap.add_argument("--turns", type=int, default=6)
+    ap.add_argument("--think-s", type=float, default=0.2, help="mean pause between turns")
+    ap.add_argument("--refresh-s", type=float, default=1.0, help="router probe interval")
+    ap.add_argument("--spill", type=int, default=4, help="router.spill_outstanding")
+    ap.add_argument("--kill-after-s", type=float, default=0.0, help="stop the last node after this long (pool only)")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--out", help="result file (.json) or directory")
+    ap.add_argument("--json", action="store_true")
+    ap.add_argument("--variant", help=argparse.SUPPRESS)  # child process: run one variant, print JSON
+    add_profile_args(ap)
+    ap.set_defaults(load_ms=800.0, eval_tps=200.0, parallel=1)
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.variant:
+        print(json.dumps(run_variant(args, args.variant)))
+        return 0
+
+    selected = [v.strip() for v in args.variants.split(",") if v.strip()]
+    unknown = set(selected) - set(VARIANTS)
+    if unknown:
+        ap.error(f"unknown variants: {', '.join(sorted(unknown))}")
+    results: Dict[str, Any] = {
+        "benchmark": "router",
+        "meta": run_metadata(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("out", "json", "variant")},
+        "profile": asdict(LLMProfile.from_args(args)),
+        "scenarios": {},
+    }
+    failed = False
+    for name in selected:
+        proc = subprocess.run([sys.executable, __file__, *argv, "--variant", name], capture_output=True, text=True)
+        if proc.returncode != 0:
+            results["scenarios"][name] = {"error": proc.stderr.strip().splitlines()[-1:] or ["unknown"]}
+            failed = True
+            continue
+        results["scenarios"][name] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    path = write_results(results, args.out, "router")
+    if args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        print(f"  {'variant':<8}{'turns':>7}{'errors':>8}{'wall s':>8}{'turn p50':>10}{'turn p95':>10}  calls/loads per node")
+        for name, r in results["scenarios"].items():
+            if "error" in r:
+                print(f"  {name:<8} error: {r['error']}")
+                continue
+            per_node = "  ".join(f"{n['chat_calls']}/{n['model_loads']}" for n in r["nodes"])
+            print(
+                f"  {name:<8}{r['turns']:>7}{r['errors']:>8}{r['wall_s']:>8.1f}"
+                f"{r['turn']['p50_ms']:>10.1f}{r['turn']['p95_ms']:>10.1f}  {per_node}"
+            )
+        if path:
+            print(f"wrote {path}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
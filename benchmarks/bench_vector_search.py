@@ -0,0 +1,121 @@
+"""
+NumPy fast path vs Chroma for top-k retrieval at several collection sizes.
+
+Usage:
+  python benchmarks/bench_vector_search.py --sizes 1000 5000 20000 100000 --dim 768
+
+Synthetic unit vectors with a ``source_hash`` metadata field are loaded into a
+NumpyVectorIndex and (when chromadb is installed) an ephemeral Chroma
+collection. Query embeddings are precomputed, so both sides are measured on
+search alone, not on the embedding HTTP call.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "database")]
+
+from vector_index import NumpyVectorIndex  # noqa: E402
+
+
+def _p50_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000.0
+
+
+def _corpus(n: int, dim: int, sources: int, seed: int):
+    rng = np.random.default_rng(seed)
+    vecs = rng.standard_normal((n, dim), dtype=np.float32)
+    ids = [f"doc:{i}" for i in range(n)]
+    metas = [{"source_hash": f"src{i % sources}", "chunk_index": i} for i in range(n)]
+    return ids, vecs, metas
+
+
+def bench_numpy(path: Path, ids, vecs, metas, queries, k: int, repeat: int) -> Dict[str, float]:
+    t0 = time.perf_counter()
+    index = NumpyVectorIndex.build(path, [(ids, vecs, [""] * len(ids), metas)], len(ids), vecs.shape[1])
+    build_s = time.perf_counter() - t0
+    where = {"source_hash": "src3"}
+    return {
+        "build_s": build_s,
+        "single_ms": _p50_ms(lambda: index.search(queries[0], k), repeat),
+        "filtered_ms": _p50_ms(lambda: index.search(queries[0], k, where), repeat),
+        "batch_ms_per_query": _p50_ms(lambda: index.search_batch(queries, k), repeat) / len(queries),
+    }
+
+
+def bench_chroma(path: Path, ids, vecs, metas, queries, k: int, repeat: int) -> Dict[str, float]:
+    import chromadb
+
+    client = chromadb.PersistentClient(path=str(path))
+    coll = client.create_collection("bench", metadata={"hnsw:space": "cosine"})
+    t0 = time.perf_counter()
+    step = 5000
+    for i in range(0, len(ids), step):
+        coll.add(ids=ids[i : i + step], embeddings=vecs[i : i + step].tolist(), metadatas=metas[i : i + step])
+    build_s = time.perf_counter() - t0
+    q0 = [queries[0].tolist()]
+    qs = queries.tolist()
+    return {
+        "build_s": build_s,
+        "single_ms": _p50_ms(lambda: coll.query(query_embeddings=q0, n_results=k), repeat),
+        "filtered_ms": _p50_ms(lambda: coll.query(query_embeddings=q0, n_results=k, where={"source_hash": "src3"}), repeat),
+        "batch_ms_per_query": _p50_ms(lambda: coll.query(query_embeddings=qs, n_results=k), repeat) / len(qs),
+    }
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000, 50000])
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--batch", type=int, default=16, help="queries per batched call")
+    ap.add_argument("--sources", type=int, default=50)
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--json", dest="json_out")
+    args = ap.parse_args(argv)
+
+    try:
+        import chromadb  # noqa: F401
+        have_chroma = True
+    except ImportError:
+        have_chroma = False
+        print("chromadb not installed: reporting the NumPy path only")
+
+    rows = []
+    print(f"{'size':>8} {'engine':<7}{'build s':>9}{'single ms':>11}{'filtered ms':>13}{'batch ms/q':>12}")
+    for n in args.sizes:
+        ids, vecs, metas = _corpus(n, args.dim, args.sources, seed=n)
+        queries = np.random.default_rng(0).standard_normal((args.batch, args.dim), dtype=np.float32)
+        with tempfile.TemporaryDirectory() as tmp:
+            results = {"numpy": bench_numpy(Path(tmp) / "np", ids, vecs, metas, queries, args.k, args.repeat)}
+            if have_chroma:
+                results["chroma"] = bench_chroma(Path(tmp) / "chroma", ids, vecs, metas, queries, args.k, args.repeat)
+        for engine, r in results.items():
+            print(f"{n:>8} {engine:<7}{r['build_s']:>9.2f}{r['single_ms']:>11.3f}{r['filtered_ms']:>13.3f}{r['batch_ms_per_query']:>12.3f}")
+            rows.append({"size": n, "engine": engine, **r})
+        if have_chroma:
+            winner = "numpy" if results["numpy"]["single_ms"] < results["chroma"]["single_ms"] else "chroma"
+            print(f"{'':>8} -> single-query winner at {n}: {winner}")
+
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(rows, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,513 @@
+"""
+Local stand-ins for Ollama and the OpenAI API, for benchmarks and load tests.
+
+    from fake_services import FakeOllama, FakeOpenAI, LLMProfile
+    with FakeOllama(LLMProfile(eval_tokens_per_s=40, load_ms=800)) as ollama:
+        ...  # point config.yaml's ollama.base_url at ollama.url
+
+Both servers answer with the real response shapes (non-streamed JSON and
+streamed NDJSON/SSE) and sleep according to the profile, so client code sees
+realistic load, prompt-eval and per-token timings without a GPU:
+
+- Ollama: /api/chat, /api/generate, /api/embed, /api/embeddings, /api/tags, /api/ps
+- OpenAI: /v1/chat/completions, /v1/embeddings, /v1/models
+
+A model that is not resident pays ``load_ms`` once, and again after its
+``keep_alive`` (the request's, else ``keep_alive_s``) or when a request changes
+``options.num_ctx``, like an Ollama model reload. At most ``parallel`` requests
+per model run at a time; the rest queue, like ``OLLAMA_NUM_PARALLEL``. Each model
+keeps its last ``parallel`` prompts+replies as a KV cache: only the part of a
+prompt after the longest cached prefix counts as prompt eval, as in Ollama.
+Embeddings are hashed bags of words, L2-normalised, so texts sharing words are
+close and retrieval results are meaningful. Run standalone to serve both:
+
+    python benchmarks/fake_services.py --ollama-port 11434 --openai-port 8089
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import re
+import sys
+import threading
+import time
+from collections import Counter as TallyCounter
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+WORD = re.compile(r"\w+")
+REPLY_WORDS = "the context says that the answer depends on the retrieved documents and the question".split()
+
+
+@dataclass
+class LLMProfile:
+    load_ms: float = 0.0  # paid when a model is not resident
+    keep_alive_s: float = 300.0  # resident models are unloaded after this long idle
+    prompt_tokens_per_s: float = 2000.0
+    eval_tokens_per_s: float = 60.0
+    reply_tokens: int = 48
+    embed_ms: float = 3.0  # per request
+    embed_ms_per_text: float = 0.3
+    embedding_dim: int = 256
+    embed_parallel: int = 0  # concurrent embedding requests; 0 = unlimited
+    parallel: int = 4  # concurrent requests per model; the rest wait
+    models: Tuple[str, ...] = ("llama3.2:latest", "llava:latest", "nomic-embed-text:latest")
+    error_rate: float = 0.0  # fraction of chat calls answered with HTTP 500
+
+    @staticmethod
+    def from_args(args: argparse.Namespace) -> "LLMProfile":
+        return LLMProfile(
+            load_ms=args.load_ms,
+            prompt_tokens_per_s=args.prompt_tps,
+            eval_tokens_per_s=args.eval_tps,
+            reply_tokens=args.reply_tokens,
+            embed_ms=args.embed_ms,
+            parallel=args.parallel,
+        )
+
+
+def add_profile_args(ap: argparse.ArgumentParser) -> None:
+    """The LLMProfile knobs as CLI flags (shared by the benchmark scripts)."""
+    ap.add_argument("--load-ms", type=float, default=0.0, help="cold model load time")
+    ap.add_argument("--prompt-tps", type=float, default=2000.0, help="prompt-eval tokens/s")
+    ap.add_argument("--eval-tps", type=float, default=60.0, help="generated tokens/s")
+    ap.add_argument("--reply-tokens", type=int, default=48)
+    ap.add_argument("--embed-ms", type=float, default=3.0, help="latency per embedding request")
+    ap.add_argument("--parallel", type=int, default=4, help="concurrent requests per model")
+
+
+def count_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _message_text(messages: Sequence[Dict[str, Any]]) -> str:
+    parts = []
+    for m in messages:
+        content = m.get("content", "")
+        if isinstance(content, list):  # OpenAI multi-part content
+            content = " ".join(p.get("text", "") for p in content if isinstance(p, dict))
+        parts.append(str(content))
+    return "\n".join(parts)
+
+
+def embed_text(text: str, dim: int) -> List[float]:
+    vec = [0.0] * dim
+    for word, n in TallyCounter(w.lower() for w in WORD.findall(text)).items():
+        h = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+        vec[h % dim] += (1.0 if (h >> 63) else -1.0) * n
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+class _ModelSlots:
+    """Residency, parallelism and KV-cache bookkeeping shared by both fake APIs."""
+
+    def __init__(self, profile: LLMProfile):
+        self.profile = profile
+        self._lock = threading.Lock()
+        self._slots: Dict[str, threading.Semaphore] = {}
+        self._expires: Dict[str, float] = {}  # model -> monotonic time it unloads
+        self._keep_alive: Dict[str, float] = {}  # model -> keep_alive of its latest request
+        self._num_ctx: Dict[str, Any] = {}
+        self._kv: Dict[str, List[str]] = {}  # model -> texts cached in its slots, newest last
+        self.loads = 0
+
+    def _slot(self, model: str) -> threading.Semaphore:
+        with self._lock:
+            slot = self._slots.get(model)
+            if slot is None:
+                slot = self._slots[model] = threading.BoundedSemaphore(max(1, self.profile.parallel))
+            return slot
+
+    def acquire(self, model: str, keep_alive: Optional[float] = None, num_ctx: Any = None) -> float:
+        """
+        Wait for a slot; returns the load time (s) this request has to pay. A model
+        past its keep_alive, or asked for a different ``num_ctx``, is (re)loaded.
+        """
+        self._slot(model).acquire()
+        now = time.monotonic()
+        with self._lock:
+            cold = now > self._expires.get(model, -1.0) or self._num_ctx.get(model) != num_ctx
+            self._expires[model] = math.inf  # busy models never expire
+            self._keep_alive[model] = self.profile.keep_alive_s if keep_alive is None else keep_alive
+            self._num_ctx[model] = num_ctx
+            if cold:
+                self.loads += 1
+                self._kv.pop(model, None)
+        return self.profile.load_ms / 1000.0 if cold else 0.0
+
+    def release(self, model: str) -> None:
+        with self._lock:
+            keep_alive = self._keep_alive.get(model, self.profile.keep_alive_s)
+            self._expires[model] = math.inf if keep_alive < 0 else time.monotonic() + keep_alive
+        self._slot(model).release()
+
+    def cached_prefix(self, model: str, prompt: str) -> str:
+        """Longest prefix of ``prompt`` already in one of the model's slots (Ollama reuses its KV cache)."""
+        best = ""
+        with self._lock:
+            for text in self._kv.get(model, []):
+                n = 0
+                for a, b in zip(text, prompt):
+                    if a != b:
+                        break
+                    n += 1
+                if n > len(best):
+                    best = prompt[:n]
+        return best
+
+    def remember(self, model: str, text: str) -> None:
+        with self._lock:
+            texts = self._kv.setdefault(model, [])
+            texts.append(text)
+            del texts[: -max(1, self.profile.parallel)]
+
+    def resident(self) -> List[Tuple[str, float]]:
+        now = time.monotonic()
+        with self._lock:
+            return [(m, t - now) for m, t in self._expires.items() if t >= now]
+
+    def unload(self, model: str) -> None:
+        with self._lock:
+            self._expires.pop(model, None)
+            self._kv.pop(model, None)
+
+
+def parse_keep_alive(value: Any) -> Optional[float]:
+    """Ollama's keep_alive: seconds as a number, or a duration string like "30m" / "1h" / "300s"."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    m = re.fullmatch(r"(-?[\d.]+)\s*(ms|s|m|h)?", str(value).strip())
+    if not m:
+        return None
+    return float(m.group(1)) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[m.group(2) or "s"]
+
+
+class _FakeServer:
+    """ThreadingHTTPServer on a daemon thread; ``port=0`` picks a free port."""
+
+    def __init__(self, profile: Optional[LLMProfile] = None, host: str = "127.0.0.1", port: int = 0):
+        self.profile = profile or LLMProfile()
+        self.slots = _ModelSlots(self.profile)
+        self.requests: TallyCounter = TallyCounter()
+        self._stats_lock = threading.Lock()
+        self._calls = 0
+        self._embed_slots = threading.BoundedSemaphore(self.profile.embed_parallel) if self.profile.embed_parallel else nullcontext()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "_FakeServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "_FakeServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    def _count(self, path: str) -> bool:
+        """Tally the request; True when this chat call should fail (``error_rate``)."""
+        with self._stats_lock:
+            self.requests[path] += 1
+            self._calls += 1
+            rate = self.profile.error_rate
+            return rate > 0 and (self._calls * rate) % 1.0 < rate
+
+    def _reply_tokens(self, prompt: str) -> Iterator[str]:
+        seed = int(hashlib.md5(prompt.encode("utf-8")).hexdigest()[:8], 16)
+        for i in range(self.profile.reply_tokens):
+            yield REPLY_WORDS[(seed + i) % len(REPLY_WORDS)] + " "
+
+    def _generate(
+        self, model: str, prompt: str, stream: bool, keep_alive: Optional[float] = None, num_ctx: Any = None
+    ) -> Iterator[Tuple[str, Dict[str, float]]]:
+        """
+        Yield (token, timings) pairs with the profile's pacing: load and prompt eval
+        before the first token, then one ``1/eval_tokens_per_s`` step per token (one
+        sleep for the whole reply when not streaming). The final pair has token "".
+        Only the part of the prompt after the longest cached prefix is evaluated.
+        """
+        p = self.profile
+        t_queue = time.perf_counter()
+        load_s = self.slots.acquire(model, keep_alive, num_ctx)
+        try:
+            queued_s = time.perf_counter() - t_queue
+            cached = self.slots.cached_prefix(model, prompt)
+            prompt_tokens = max(1, count_tokens(prompt) - (count_tokens(cached) if cached else 0))
+            prompt_s = prompt_tokens / p.prompt_tokens_per_s
+            time.sleep(load_s + prompt_s)
+            step = 1.0 / p.eval_tokens_per_s
+            tokens = list(self._reply_tokens(prompt))
+            if not stream:
+                time.sleep(step * len(tokens))
+            for token in tokens:
+                if stream:
+                    time.sleep(step)
+                yield token, {}
+            self.slots.remember(model, prompt + "".join(tokens))
+            yield "", {
+                "queued_s": queued_s,
+                "load_s": load_s,
+                "prompt_eval_s": prompt_s,
+                "eval_s": step * len(tokens),
+                "prompt_tokens": prompt_tokens,
+                "eval_tokens": len(tokens),
+            }
+        finally:
+            self.slots.release(model)
+
+    def _embed(self, texts: Sequence[str]) -> List[List[float]]:
+        p = self.profile
+        with self._embed_slots:
+            time.sleep((p.embed_ms + p.embed_ms_per_text * len(texts)) / 1000.0)
+        return [embed_text(t, p.embedding_dim) for t in texts]
+
+    def _handler_class(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def _body(self) -> Dict[str, Any]:
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+            def send_json(self, payload: Any, status: int = 200) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_stream(self, content_type: str, chunks: Iterator[bytes]) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for chunk in chunks:
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+            def do_GET(self) -> None:  # noqa: N802
+                path = self.path.split("?", 1)[0]
+                server._count(path)
+                server.handle_get(self, path)
+
+            def do_POST(self) -> None:  # noqa: N802
+                path = self.path.split("?", 1)[0]
+                fail = server._count(path)
+                try:
+                    body = self._body()
+                except ValueError:
+                    self.send_json({"error": "invalid JSON"}, 400)
+                    return
+                server.handle_post(self, path, body, fail)
+
+        return Handler
+
+    def handle_get(self, h: Any, path: str) -> None:
+        h.send_json({"error": f"unknown path {path}"}, 404)
+
+    def handle_post(self, h: Any, path: str, body: Dict[str, Any], fail: bool) -> None:
+        h.send_json({"error": f"unknown path {path}"}, 404)
+
+
+class FakeOllama(_FakeServer):
+    def _models(self) -> List[Dict[str, Any]]:
+        return [
+            {"name": m, "model": m, "size": 4_000_000_000, "digest": hashlib.sha256(m.encode()).hexdigest(), "details": {}}
+            for m in self.profile.models
+        ]
+
+    def handle_get(self, h: Any, path: str) -> None:
+        if path == "/api/tags":
+            h.send_json({"models": self._models()})
+        elif path == "/api/ps":
+            h.send_json(
+                {
+                    "models": [
+                        {"name": m, "model": m, "size_vram": 4_000_000_000, "expires_in_s": round(ttl, 1)}
+                        for m, ttl in self.slots.resident()
+                    ]
+                }
+            )
+        elif path in ("/", "/api/version"):
+            h.send_json({"version": "0.0.0-fake"})
+        else:
+            super().handle_get(h, path)
+
+    @staticmethod
+    def _done(model: str, t: Dict[str, float], extra: Dict[str, Any]) -> Dict[str, Any]:
+        ns = lambda s: int(s * 1e9)  # noqa: E731
+        return {
+            "model": model,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": ns(t["queued_s"] + t["load_s"] + t["prompt_eval_s"] + t["eval_s"]),
+            "load_duration": ns(t["load_s"]),
+            "prompt_eval_count": int(t["prompt_tokens"]),
+            "prompt_eval_duration": ns(t["prompt_eval_s"]),
+            "eval_count": int(t["eval_tokens"]),
+            "eval_duration": ns(t["eval_s"]),
+            **extra,
+        }
+
+    def handle_post(self, h: Any, path: str, body: Dict[str, Any], fail: bool) -> None:
+        model = body.get("model", "")
+        if path in ("/api/chat", "/api/generate"):
+            if fail:
+                h.send_json({"error": "fake overload"}, 500)
+                return
+            chat = path == "/api/chat"
+            prompt = _message_text(body.get("messages", [])) if chat else str(body.get("prompt", ""))
+            keep_alive = parse_keep_alive(body.get("keep_alive"))
+            num_ctx = (body.get("options") or {}).get("num_ctx")
+            if keep_alive == 0:
+                self.slots.unload(model)
+            if not chat and not prompt:  # warm-up request: just load the model
+                load_s = self.slots.acquire(model, keep_alive, num_ctx)
+                time.sleep(load_s)
+                self.slots.release(model)
+                h.send_json({"model": model, "response": "", "done": True, "load_duration": int(load_s * 1e9)})
+                return
+            stream = body.get("stream", True)  # Ollama streams unless told otherwise
+
+            def wrap(token: str) -> Dict[str, Any]:
+                if chat:
+                    return {"message": {"role": "assistant", "content": token}}
+                return {"response": token}
+
+            if not stream:
+                text, timings = [], {}
+                for token, t in self._generate(model, prompt, False, keep_alive, num_ctx):
+                    text.append(token)
+                    timings = t or timings
+                h.send_json(self._done(model, timings, wrap("".join(text))))
+                return
+
+            def chunks() -> Iterator[bytes]:
+                for token, t in self._generate(model, prompt, True, keep_alive, num_ctx):
+                    if token:
+                        yield json.dumps({"model": model, "done": False, **wrap(token)}).encode() + b"\n"
+                    else:
+                        yield json.dumps(self._done(model, t, wrap(""))).encode() + b"\n"
+
+            h.send_stream("application/x-ndjson", chunks())
+        elif path == "/api/embed":
+            texts = body.get("input", [])
+            texts = [texts] if isinstance(texts, str) else list(texts)
+            h.send_json({"model": model, "embeddings": self._embed(texts)})
+        elif path == "/api/embeddings":
+            h.send_json({"embedding": self._embed([str(body.get("prompt", ""))])[0]})
+        elif path == "/api/pull":
+            h.send_json({"status": "success"})
+        else:
+            super().handle_post(h, path, body, fail)
+
+
+class FakeOpenAI(_FakeServer):
+    def handle_get(self, h: Any, path: str) -> None:
+        if path == "/v1/models":
+            h.send_json({"object": "list", "data": [{"id": m, "object": "model"} for m in self.profile.models]})
+        else:
+            super().handle_get(h, path)
+
+    def handle_post(self, h: Any, path: str, body: Dict[str, Any], fail: bool) -> None:
+        model = body.get("model", "")
+        if path == "/v1/chat/completions":
+            if fail:
+                h.send_json({"error": {"message": "fake overload", "type": "server_error"}}, 500)
+                return
+            prompt = _message_text(body.get("messages", []))
+            created = int(time.time())
+            if not body.get("stream", False):
+                text, timings = [], {}
+                for token, t in self._generate(model, prompt, stream=False):
+                    text.append(token)
+                    timings = t or timings
+                h.send_json(
+                    {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion",
+                        "created": created,
+                        "model": model,
+                        "choices": [
+                            {"index": 0, "message": {"role": "assistant", "content": "".join(text)}, "finish_reason": "stop"}
+                        ],
+                        "usage": {
+                            "prompt_tokens": int(timings["prompt_tokens"]),
+                            "completion_tokens": int(timings["eval_tokens"]),
+                            "total_tokens": int(timings["prompt_tokens"] + timings["eval_tokens"]),
+                        },
+                    }
+                )
+                return
+
+            def chunks() -> Iterator[bytes]:
+                for token, _ in self._generate(model, prompt, stream=True):
+                    delta = {"content": token} if token else {}
+                    event = {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": None if token else "stop"}],
+                    }
+                    yield b"data: " + json.dumps(event).encode() + b"\n\n"
+                yield b"data: [DONE]\n\n"
+
+            h.send_stream("text/event-stream", chunks())
+        elif path == "/v1/embeddings":
+            texts = body.get("input", [])
+            texts = [texts] if isinstance(texts, str) else list(texts)
+            data = [{"object": "embedding", "index": i, "embedding": v} for i, v in enumerate(self._embed(texts))]
+            h.send_json({"object": "list", "data": data, "model": model})
+        else:
+            super().handle_post(h, path, body, fail)
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--ollama-port", type=int, default=11434)
+    ap.add_argument("--openai-port", type=int, default=8089)
+    add_profile_args(ap)
+    args = ap.parse_args(argv)
+
+    profile = LLMProfile.from_args(args)
+    ollama = FakeOllama(profile, args.host, args.ollama_port).start()
+    openai = FakeOpenAI(profile, args.host, args.openai_port).start()
+    print(f"fake Ollama at {ollama.url}, fake OpenAI at {openai.url}/v1 (Ctrl-C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,200 @@
+"""
+Shared plumbing for the end-to-end benchmarks and the load generator.
+
+- ``bench_workspace()`` creates a scratch directory with a ``config.yaml`` derived
+  from the repo's, pointed at the fake services and at scratch databases, and
+  ``chdir``s into it: every app module reads ``./config.yaml`` when imported, so
+  app code must be imported inside the workspace.
+- ``summarize()`` turns latency samples into n/mean/p50/p95/p99/max in ms.
+- ``run_metadata()`` records the git commit, dirty flag and platform, so result
+  files from different commits can be compared with ``compare_results()``.
+"""
+from __future__ import annotations
+
+import copy
+import datetime as _dt
+import json
+import math
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import yaml
+
+ROOT = Path(__file__).resolve().parent.parent
+APP_PATHS = [ROOT, ROOT / "database", ROOT / "ingestionPipeline", ROOT / "api_Handler", ROOT / "benchmarks"]
+
+
+def add_app_paths() -> None:
+    for path in reversed(APP_PATHS):
+        if str(path) not in sys.path:
+            sys.path.insert(0, str(path))
+
+
+# ---------------------------
+# Statistics
+# ---------------------------
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Linear-interpolated percentile (``q`` in 0..100) of already sorted values."""
+    if not sorted_values:
+        return float("nan")
+    pos = (len(sorted_values) - 1) * q / 100.0
+    lo, hi = math.floor(pos), math.ceil(pos)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def summarize(samples_s: Sequence[float]) -> Dict[str, float]:
+    values = sorted(samples_s)
+    if not values:
+        return {"n": 0}
+    return {
+        "n": len(values),
+        "mean_ms": sum(values) / len(values) * 1000.0,
+        "p50_ms": percentile(values, 50) * 1000.0,
+        "p95_ms": percentile(values, 95) * 1000.0,
+        "p99_ms": percentile(values, 99) * 1000.0,
+        "max_ms": values[-1] * 1000.0,
+    }
+
+
+# ---------------------------
+# Run metadata and result files
+# ---------------------------
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def run_metadata() -> Dict[str, Any]:
+    return {
+        "commit": _git("rev-parse", "HEAD") or "unknown",
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": _dt.datetime.now(_dt.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def write_results(results: Dict[str, Any], out: Optional[str], name: str) -> Optional[Path]:
+    """Write ``results`` to ``out`` (a file, or a directory that gets ``<name>-<commit>-<time>.json``)."""
+    if not out:
+        return None
+    path = Path(out)
+    if path.suffix != ".json":
+        path.mkdir(parents=True, exist_ok=True)
+        meta = results.get("meta", {})
+        stamp = meta.get("timestamp", "").replace(":", "").replace("-", "")[:15]
+        path = path / f"{name}-{meta.get('commit', 'unknown')[:12]}-{stamp}.json"
+    path.write_text(json.dumps(results, indent=2, sort_keys=True))
+    return path
+
+
+COMPARED_SUFFIXES = ("mean_ms", "p50_ms", "p95_ms", "p99_ms", "_per_s")
+
+
+def _numeric_leaves(obj: Any, prefix: str = "") -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            out.update(_numeric_leaves(v, f"{prefix}.{k}" if prefix else str(k)))
+    elif isinstance(obj, (int, float)) and not isinstance(obj, bool):
+        out[prefix] = float(obj)
+    return out
+
+
+def compare_results(base: Dict[str, Any], new: Dict[str, Any]) -> List[Tuple[str, float, float, float]]:
+    """(metric, base, new, new/base) for every mean/percentile latency and rate present in both runs."""
+    a, b = _numeric_leaves(base.get("scenarios", {})), _numeric_leaves(new.get("scenarios", {}))
+    rows = []
+    for key in sorted(set(a) & set(b)):
+        if key.endswith(COMPARED_SUFFIXES):
+            ratio = b[key] / a[key] if a[key] else float("nan")
+            rows.append((key, a[key], b[key], ratio))
+    return rows
+
+
+def print_comparison(base: Dict[str, Any], new: Dict[str, Any]) -> None:
+    print(f"base {base['meta']['commit'][:12]}  vs  new {new['meta']['commit'][:12]}{' (dirty)' if new['meta'].get('dirty') else ''}")
+    if base.get("profile") != new.get("profile") or base.get("params") != new.get("params"):
+        print("  note: runs used different parameters or LLM profiles; ratios are not like-for-like")
+    for key, x, y, ratio in compare_results(base, new):
+        better = ratio < 1.0 if key.endswith("_ms") else ratio > 1.0
+        mark = "" if abs(ratio - 1.0) < 0.05 else (" better" if better else " WORSE")
+        print(f"  {key:<55} {x:12.2f} -> {y:12.2f}  x{ratio:5.2f}{mark}")
+
+
+# ---------------------------
+# Workspace
+# ---------------------------
+def _deep_merge(base: Dict[str, Any], overrides: Dict[str, Any]) -> Dict[str, Any]:
+    out = copy.deepcopy(base)
+    for k, v in overrides.items():
+        if isinstance(v, dict) and isinstance(out.get(k), dict):
+            out[k] = _deep_merge(out[k], v)
+        else:
+            out[k] = v
+    return out
+
+
+@contextmanager
+def bench_workspace(
+    ollama_url: str,
+    openai_url: Optional[str] = None,
+    overrides: Optional[Dict[str, Any]] = None,
+    keep: bool = False,
+) -> Iterator[Path]:
+    """Scratch cwd whose config.yaml points the app at the fake services and scratch storage."""
+    add_app_paths()
+    with open(ROOT / "config.yaml") as f:
+        base = yaml.safe_load(f)
+    ws = Path(tempfile.mkdtemp(prefix="neuranix-bench-"))
+    cfg = _deep_merge(
+        base,
+        {
+            "ollama": {"base_url": ollama_url},
+            "chromadb": {"chromadb_path": str(ws / "chroma_db")},
+            "chat_sessions_database_path": str(ws / "chatSessionCache.db"),
+            "redis": {"enabled": False},
+            "dedup": {"path": str(ws / "dedup_index.db")},
+            "admission": {"path": str(ws / "admission.db")},
+            "ingestion_queue": {"path": str(ws / "ingest_jobs.db"), "spool_dir": str(ws / "spool"), "spawn_workers": 0},
+            "tracing": {"exporter": "none"},
+            "metrics": {"enabled": False},
+        },
+    )
+    cfg = _deep_merge(cfg, overrides or {})
+    (ws / "config.yaml").write_text(yaml.safe_dump(cfg, sort_keys=False))
+
+    env_before = {k: os.environ.get(k) for k in ("OPENAI_BASE_URL", "OPENAI_API_KEY")}
+    if openai_url:
+        os.environ["OPENAI_BASE_URL"] = openai_url.rstrip("/") + "/v1"
+        os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+    cwd = os.getcwd()
+    os.chdir(ws)
+    try:
+        yield ws
+    finally:
+        os.chdir(cwd)
+        for k, v in env_before.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        if not keep:
+            shutil.rmtree(ws, ignore_errors=True)
+
+
+def init_chat_db() -> None:
+    """Create the chat-session schema in the workspace database."""
+    import database_operations
+
+    database_operations.init_db()
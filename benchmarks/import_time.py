@@ -0,0 +1,129 @@
+"""
+Startup import-time budget for the Streamlit app.
+
+Usage:
+  python benchmarks/import_time.py                      # import main, enforce the default budget
+  python benchmarks/import_time.py --budget-ms 800 --top 25
+  python benchmarks/import_time.py --module chat_api_handler --json
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter (best
+of ``--repeat`` runs), sums the self time of every imported module and fails
+with exit code 1 when the total exceeds ``--budget-ms`` or when any of the
+``--forbid`` modules is imported eagerly. The forbidden list is the heavy
+stacks that must only load on first use of a feature (ASR, PDF ingestion,
+vector DB) or through the optional ``startup.prefetch`` warm-up.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+SOURCE_DIRS = ["", "api_Handler", "database", "ingestionPipeline"]
+
+DEFAULT_BUDGET_MS = 1500.0
+DEFAULT_FORBID = [
+    "transformers",
+    "librosa",
+    "torch",
+    "langchain",
+    "langchain_chroma",
+    "langchain_ollama",
+    "chromadb",
+    "pypdfium2",
+    "aiohttp",
+    "PIL",
+]
+
+
+def _run_importtime(module: str) -> str:
+    env = dict(os.environ)
+    paths = [str(ROOT / d) for d in SOURCE_DIRS]
+    env["PYTHONPATH"] = os.pathsep.join(paths + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else []))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,  # modules read config.yaml relative to the working directory
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        tail = "\n".join(proc.stderr.strip().splitlines()[-15:])
+        raise RuntimeError(f"import {module} failed:\n{tail}")
+    return proc.stderr
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self_us, cumulative_us) rows from ``-X importtime`` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            rows.append((name.strip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+    return rows
+
+
+def measure(module: str, repeat: int) -> Dict[str, object]:
+    best = None
+    for _ in range(max(1, repeat)):
+        rows = parse_importtime(_run_importtime(module))
+        total_us = sum(r[1] for r in rows)
+        if best is None or total_us < best[0]:
+            best = (total_us, rows)
+    total_us, rows = best
+    return {"module": module, "total_ms": total_us / 1000.0, "modules": len(rows), "rows": rows}
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--module", default="main", help="module to import (default: main)")
+    ap.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="fail above this total import time")
+    ap.add_argument("--forbid", nargs="*", default=DEFAULT_FORBID, help="top-level packages that must not load at import")
+    ap.add_argument("--repeat", type=int, default=3, help="fresh interpreters to run; the fastest is reported")
+    ap.add_argument("--top", type=int, default=15, help="slowest modules (cumulative) to list")
+    ap.add_argument("--json", action="store_true", help="print results as JSON")
+    args = ap.parse_args(argv)
+
+    try:
+        result = measure(args.module, args.repeat)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    rows = result.pop("rows")
+    loaded = {name.split(".")[0] for name, _, _ in rows}
+    violations = sorted(loaded.intersection(args.forbid))
+    slowest = sorted(rows, key=lambda r: r[2], reverse=True)[: args.top]
+    over_budget = result["total_ms"] > args.budget_ms
+    result.update(
+        budget_ms=args.budget_ms,
+        over_budget=over_budget,
+        forbidden_imported=violations,
+        slowest=[{"module": n, "self_ms": s / 1000.0, "cumulative_ms": c / 1000.0} for n, s, c in slowest],
+    )
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"import {args.module}: {result['total_ms']:.1f} ms over {result['modules']} modules (budget {args.budget_ms:.0f} ms)")
+        for row in result["slowest"]:
+            print(f"  {row['cumulative_ms']:9.1f} ms  {row['self_ms']:8.1f} ms self  {row['module']}")
+        if violations:
+            print("Heavy modules imported eagerly: " + ", ".join(violations))
+        if over_budget:
+            print("Startup import time is over budget.")
+
+    return 1 if over_budget or violations else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
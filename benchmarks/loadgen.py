@@ -0,0 +1,377 @@
+"""
+Load generator for the non-UI backend: N concurrent chat sessions against local stand-ins.
+
+Usage:
+  python benchmarks/loadgen.py --sessions 40 --duration 120 --think-s 3
+  python benchmarks/loadgen.py --sessions 20 --mix text=5,rag=3,image=1,audio=1,upload=0.5 --parallel 2
+  python benchmarks/loadgen.py --sessions 50 --out benchmarks/results/ --json
+
+Each session is a thread, like a Streamlit session's script run. It sleeps an
+exponential think time, then runs one turn of a kind drawn from ``--mix``:
+
+- ``text``    load history (conversation_memory) -> ChatAPIHandler.chat -> save user + assistant
+- ``rag``     the same with ``pdf_chat=True`` (embedding + similarity_search first)
+- ``image``   chat with an image attached (vision model) -> save text + image
+- ``audio``   transcribe -> chat -> save audio + answer; ``--asr fake`` sleeps
+              ``audio_s * --asr-rtf`` instead of running Whisper
+- ``upload``  spool a synthetic PDF to the ingestion JobQueue; ``--ingest-workers``
+              threads run ``job_queue.run_worker`` against the same databases
+
+Per-stage latency comes from the tracing spans each turn opens (every turn is
+traced, sample_rate=1, into an in-memory collector), so the report splits time
+into history load, embedding, similarity search, LLM call, ASR and SQLite writes.
+Ollama/OpenAI are the fake servers from fake_services.py; ``--parallel`` and
+``--load-ms`` model Ollama's request queueing and model swaps. The report gives
+throughput, p50/p95/p99 per stage and per turn kind, error rates, ingestion job
+latency and stand-in request counts; it exits 1 if the error rate exceeds
+``--max-error-rate``.
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import logging
+import math
+import random
+import struct
+import sys
+import threading
+import time
+import wave
+from collections import defaultdict
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_services import FakeOllama, FakeOpenAI, LLMProfile, add_profile_args  # noqa: E402
+from harness import bench_workspace, init_chat_db, run_metadata, summarize, write_results  # noqa: E402
+from synthetic_pdf import make_pdf, make_text  # noqa: E402
+
+TURN_KINDS = ("text", "rag", "image", "audio", "upload")
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix: Dict[str, float] = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in TURN_KINDS:
+            raise argparse.ArgumentTypeError(f"unknown turn kind {kind!r} (choose from {', '.join(TURN_KINDS)})")
+        mix[kind] = float(weight or 1.0)
+    if not mix or sum(mix.values()) <= 0:
+        raise argparse.ArgumentTypeError("the mix needs at least one positive weight")
+    return mix
+
+
+def make_wav(seconds: float, rate: int = 16000) -> bytes:
+    """A mono 16-bit sine tone; enough for the audio path and for ``--asr real``."""
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        frames = int(seconds * rate)
+        w.writeframes(b"".join(struct.pack("<h", int(8000 * math.sin(2 * math.pi * 440 * i / rate))) for i in range(frames)))
+    return buf.getvalue()
+
+
+class StageCollector:
+    """Tracing exporter that keeps span durations per span name, in memory."""
+
+    def __init__(self) -> None:
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.failed_traces = 0
+        self._lock = threading.Lock()
+
+    def export(self, trace: Any) -> None:
+        with self._lock:
+            for span in trace.spans:
+                self.samples[span.name].append(span.duration_ns / 1e9)
+            self.failed_traces += int(trace.failed)
+
+
+class LoadTest:
+    def __init__(self, args: argparse.Namespace, ws: Path):
+        self.args = args
+        self.ws = ws
+        self.mix = dict(args.mix)
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.turns: Dict[str, int] = defaultdict(int)
+        self.errors: Dict[str, List[str]] = defaultdict(list)
+        self.job_ids: List[str] = []
+        self.skipped: Dict[str, str] = {}
+
+        from chat_api_handler import ChatAPIHandler
+        from conversation_memory import flush, load_chat_context, update_summary_async
+        import database_operations as db
+        from utils.tracing import TracingCfg, configure, span, turn
+
+        init_chat_db()
+        self.chat = ChatAPIHandler.chat
+        self.db = db
+        self.load_context, self.summarize, self.flush_summaries = load_chat_context, update_summary_async, flush
+        self.span, self.turn = span, turn
+        self.collector = StageCollector()
+        self.tracer = configure(
+            TracingCfg(sample_rate=1.0, slow_turn_ms=None, keep_errors=True, max_queue=1_000_000), exporter=self.collector
+        )
+        self.queue = None
+        self.image = bytes(random.Random(7).getrandbits(8) for _ in range(args.image_kb * 1024))
+        self.audio = make_wav(args.audio_s)
+        self.queries = [line for line in make_text(pages=4, words_per_page=300, seed=11).splitlines() if line.strip()]
+
+    # --- Setup ------------------------------------------------------
+    def seed_corpus(self) -> None:
+        """Index a few PDFs up front so RAG turns retrieve from a non-empty collection."""
+        if self.mix.get("rag", 0) <= 0 or self.args.seed_pdfs <= 0:
+            return
+        from Pdf_IngestionPipeline import get_ingestor
+
+        paths = []
+        for i in range(self.args.seed_pdfs):
+            path = self.ws / f"seed{i}.pdf"
+            path.write_bytes(make_pdf(self.args.pages, 400, seed=500 + i))
+            paths.append(str(path))
+        get_ingestor().ingest_many(paths)
+
+    def start_ingest_workers(self) -> List[threading.Thread]:
+        if self.mix.get("upload", 0) <= 0:
+            return []
+        import Pdf_IngestionPipeline  # noqa: F401  -- fail here, not inside the worker threads
+        from job_queue import JobQueue, load_queue_cfg, run_worker
+
+        self.queue = JobQueue(load_queue_cfg())
+        workers = []
+        for i in range(self.args.ingest_workers):
+            t = threading.Thread(target=run_worker, args=(self.queue, self.stop, f"loadgen-{i}"), daemon=True)
+            t.start()
+            workers.append(t)
+        return workers
+
+    # --- Turns ------------------------------------------------------
+    def _transcribe(self, audio: bytes) -> str:
+        if self.args.asr == "real":
+            from utils.audio_handler import transcribe_audio
+
+            return transcribe_audio(audio)
+        with self.span("transcribe_audio", fake=True):
+            time.sleep(self.args.audio_s * self.args.asr_rtf)
+        return "transcribed question about the uploaded documents"
+
+    def run_turn(self, kind: str, session_id: str, rng: random.Random) -> None:
+        args, db = self.args, self.db
+        query = rng.choice(self.queries)
+        if kind in ("text", "rag"):
+            history = self.load_context(session_id)
+            answer = self.chat(query, history, endpoint=args.endpoint, model=args.model, pdf_chat=kind == "rag")
+            db.save_text_message(session_id, "user", query)
+            db.save_text_message(session_id, "assistant", answer)
+            self.summarize(session_id, args.endpoint, args.model)
+        elif kind == "image":
+            answer = self.chat(query, [], image=self.image, endpoint=args.endpoint, model=args.vision_model, pdf_chat=False)
+            db.save_text_message(session_id, "user", query)
+            db.save_image_message(session_id, "user", self.image)
+            db.save_text_message(session_id, "assistant", answer)
+        elif kind == "audio":
+            text = self._transcribe(self.audio)
+            history = self.load_context(session_id)
+            answer = self.chat(text, history, endpoint=args.endpoint, model=args.model, pdf_chat=False)
+            db.save_audio_message(session_id, "user", self.audio)
+            db.save_text_message(session_id, "assistant", answer)
+            self.summarize(session_id, args.endpoint, args.model)
+        elif kind == "upload":
+            pdf = make_pdf(args.pages, 400, seed=rng.randrange(1 << 30))
+            with self.span("ingest_submit", bytes=len(pdf)):
+                job = self.queue.submit(io.BytesIO(pdf), filename=f"{session_id}.pdf")
+            with self.lock:
+                self.job_ids.append(job.job_id)
+
+    def session(self, idx: int, deadline: float) -> None:
+        rng = random.Random(self.args.seed * 100_003 + idx)
+        session_id = f"load-{idx}"
+        kinds, weights = list(self.mix), list(self.mix.values())
+        done = 0
+        time.sleep(rng.uniform(0, self.args.ramp_s))
+        while not self.stop.is_set() and time.monotonic() < deadline:
+            if self.args.turns and done >= self.args.turns:
+                break
+            if self.args.think_s > 0:
+                time.sleep(min(rng.expovariate(1.0 / self.args.think_s), max(0.0, deadline - time.monotonic())))
+                if time.monotonic() >= deadline:
+                    break
+            kind = rng.choices(kinds, weights)[0]
+            try:
+                with self.turn(f"turn.{kind}", session=session_id, kind=kind):
+                    self.run_turn(kind, session_id, rng)
+            except Exception as e:
+                with self.lock:
+                    self.errors[kind].append(repr(e))
+            with self.lock:
+                self.turns[kind] += 1
+            done += 1
+
+    # --- Run --------------------------------------------------------
+    def _prepare(self, kind: str, setup: Callable[[], Any]) -> Any:
+        """Run a turn kind's setup; drop the kind from the mix if its dependencies are missing."""
+        try:
+            return setup()
+        except ModuleNotFoundError as e:
+            self.skipped[kind] = f"missing dependency: {e.name}"
+            self.mix.pop(kind, None)
+            return None
+
+    def run(self) -> Dict[str, Any]:
+        self._prepare("rag", self.seed_corpus)
+        workers = self._prepare("upload", self.start_ingest_workers) or []
+        if not self.mix:
+            raise SystemExit("no turn kind left to run: " + json.dumps(self.skipped))
+        deadline = time.monotonic() + self.args.duration
+        threads = [threading.Thread(target=self.session, args=(i, deadline), daemon=True) for i in range(self.args.sessions)]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - t0
+        jobs = self._drain_jobs()
+        self.flush_summaries(timeout=self.args.drain_s)
+        self.stop.set()
+        for w in workers:
+            w.join(timeout=5)
+        self.tracer.flush()
+        return self._report(elapsed, jobs)
+
+    def _drain_jobs(self) -> Dict[str, Any]:
+        """Wait (up to ``--drain-s``) for submitted ingestion jobs, then summarise them."""
+        if self.queue is None or not self.job_ids:
+            return {}
+        deadline = time.monotonic() + self.args.drain_s
+        jobs = self.queue.get(self.job_ids)
+        while not all(j.finished for j in jobs) and time.monotonic() < deadline:
+            time.sleep(0.2)
+            jobs = self.queue.get(self.job_ids)
+        done = [j for j in jobs if j.status == "done"]
+        return {
+            "submitted": len(self.job_ids),
+            "done": len(done),
+            "failed": sum(j.status == "failed" for j in jobs),
+            "unfinished": sum(not j.finished for j in jobs),
+            "latency": summarize([j.updated_at - j.created_at for j in done]),
+        }
+
+    def _report(self, elapsed: float, jobs: Dict[str, Any]) -> Dict[str, Any]:
+        samples = self.collector.samples
+        total = sum(self.turns.values())
+        failed = sum(len(v) for v in self.errors.values())
+        by_kind = {}
+        for kind, n in sorted(self.turns.items()):
+            by_kind[kind] = {
+                "turns": n,
+                "errors": len(self.errors.get(kind, [])),
+                "error_rate": len(self.errors.get(kind, [])) / n if n else 0.0,
+                "turns_per_s": n / elapsed,
+                "latency": summarize(samples.get(f"turn.{kind}", [])),
+            }
+        stages = {name: summarize(values) for name, values in sorted(samples.items()) if not name.startswith("turn.")}
+        return {
+            "elapsed_s": elapsed,
+            "turns": total,
+            "turns_per_s": total / elapsed if elapsed else 0.0,
+            "error_rate": failed / total if total else 0.0,
+            "by_kind": by_kind,
+            "stages": stages,
+            "ingestion_jobs": jobs,
+            "skipped": self.skipped,
+            "error_samples": {k: v[:3] for k, v in self.errors.items()},
+            "traces_dropped": self.tracer.dropped,
+        }
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(
+        f"{report['turns']} turns in {report['elapsed_s']:.1f}s  "
+        f"({report['turns_per_s']:.2f} turns/s, error rate {report['error_rate']:.2%})"
+    )
+    header = f"  {'':<34}{'n':>7}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}"
+    print("\nper turn kind\n" + header)
+    for kind, r in report["by_kind"].items():
+        lat = r["latency"]
+        if lat.get("n"):
+            print(f"  {kind:<34}{lat['n']:>7}{lat['p50_ms']:>11.1f}{lat['p95_ms']:>11.1f}{lat['p99_ms']:>11.1f}  errors {r['errors']}")
+    print("\nper stage\n" + header)
+    for name, lat in report["stages"].items():
+        print(f"  {name:<34}{lat['n']:>7}{lat['p50_ms']:>11.1f}{lat['p95_ms']:>11.1f}{lat['p99_ms']:>11.1f}")
+    jobs = report["ingestion_jobs"]
+    if jobs:
+        lat = jobs["latency"]
+        p95 = f", p95 {lat['p95_ms'] / 1000:.1f}s" if lat.get("n") else ""
+        print(f"\ningestion jobs: {jobs['done']}/{jobs['submitted']} done, {jobs['failed']} failed, {jobs['unfinished']} unfinished{p95}")
+    for kind, reason in report["skipped"].items():
+        print(f"skipped {kind}: {reason}")
+    for kind, errs in report["error_samples"].items():
+        print(f"errors[{kind}]: {errs}")
+
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sessions", type=int, default=20)
+    ap.add_argument("--duration", type=float, default=60.0, help="seconds of load after ramp-up starts")
+    ap.add_argument("--turns", type=int, default=0, help="stop each session after this many turns (0 = until --duration)")
+    ap.add_argument("--think-s", type=float, default=3.0, help="mean think time between turns (exponential)")
+    ap.add_argument("--ramp-s", type=float, default=5.0, help="session start times are spread over this window")
+    ap.add_argument("--mix", type=parse_mix, default=parse_mix("text=6,rag=3,image=0.5,audio=0.5"))
+    ap.add_argument("--endpoint", choices=("ollama", "openai"), default="ollama")
+    ap.add_argument("--model", default="llama3.2:latest")
+    ap.add_argument("--vision-model", default="llava:latest")
+    ap.add_argument("--asr", choices=("fake", "real"), default="fake")
+    ap.add_argument("--asr-rtf", type=float, default=0.3, help="fake ASR time per second of audio")
+    ap.add_argument("--audio-s", type=float, default=5.0)
+    ap.add_argument("--image-kb", type=int, default=200)
+    ap.add_argument("--pages", type=int, default=5, help="pages per synthetic PDF")
+    ap.add_argument("--seed-pdfs", type=int, default=4, help="PDFs indexed before the run for RAG turns")
+    ap.add_argument("--ingest-workers", type=int, default=1)
+    ap.add_argument("--drain-s", type=float, default=60.0, help="wait this long for pending ingestion jobs and summaries")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of LLM calls the stand-ins fail")
+    ap.add_argument("--max-error-rate", type=float, default=0.01)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="result file (.json) or directory")
+    ap.add_argument("--json", action="store_true")
+    ap.add_argument("--verbose", action="store_true", help="keep the app's INFO logs")
+    add_profile_args(ap)
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    profile = LLMProfile.from_args(args)
+    profile.error_rate = args.error_rate
+    with FakeOllama(profile) as ollama, FakeOpenAI(profile) as openai:
+        with bench_workspace(ollama.url, openai.url, {"ingestion_queue": {"poll_interval_seconds": 0.2}}):
+            report = LoadTest(args, Path.cwd()).run()
+        report["fake_requests"] = dict(ollama.requests + openai.requests)
+        report["model_loads"] = ollama.slots.loads + openai.slots.loads
+
+    params = {k: v for k, v in vars(args).items() if k not in ("out", "json", "verbose")}
+    results = {
+        "benchmark": "loadgen",
+        "meta": run_metadata(),
+        "params": params,
+        "profile": asdict(profile),
+        "scenarios": {"loadgen": report},
+    }
+    path = write_results(results, args.out, "loadgen")
+    if args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        _print_report(report)
+        if path:
+            print(f"wrote {path}")
+    return 1 if report["error_rate"] > args.max_error_rate else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,95 @@
+"""
+Tiny dependency-free generator of text PDFs for ingestion benchmarks.
+
+    from synthetic_pdf import make_pdf, make_text
+    data = make_pdf(pages=20, words_per_page=400, seed=7)
+    text = make_text(pages=20, words_per_page=400, seed=7)
+
+Pages hold deterministic pseudo-random prose in Helvetica, with a blank line
+every few sentences so the splitters see paragraph breaks. The output is a
+valid PDF 1.4 file with a correct xref table, which pdfium parses without repair.
+"""
+from __future__ import annotations
+
+import random
+from typing import List
+
+WORDS = (
+    "vector index cache latency throughput model ollama embedding chunk query "
+    "retrieval document session context token prompt stream batch worker queue "
+    "summary memory shard replica budget metric trace span request response"
+).split()
+
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _page_lines(rng: random.Random, words: int, width: int = 90) -> List[str]:
+    lines: List[str] = []
+    line: List[str] = []
+    sentence = 0
+    for i in range(words):
+        word = rng.choice(WORDS)
+        sentence += 1
+        if sentence >= rng.randint(8, 16):
+            word += "."
+            sentence = 0
+        if sum(len(w) + 1 for w in line) + len(word) > width:
+            lines.append(" ".join(line))
+            line = []
+            if rng.random() < 0.15:
+                lines.append("")
+        line.append(word)
+    if line:
+        lines.append(" ".join(line))
+    return lines
+
+
+def make_text(pages: int = 10, words_per_page: int = 400, seed: int = 0) -> str:
+    """The same prose as :func:`make_pdf`, as plain text (pages joined by newlines)."""
+    rng = random.Random(seed)
+    return "\n".join("\n".join(_page_lines(rng, words_per_page)) for _ in range(pages))
+
+
+def make_pdf(pages: int = 10, words_per_page: int = 400, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    objects: List[bytes] = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"",  # pages tree, filled in once the kids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for _ in range(pages):
+        body = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"]
+        body += [f"({_escape(line)}) Tj T*" for line in _page_lines(rng, words_per_page)]
+        body.append("ET")
+        stream = "\n".join(body).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids),
+        len(kids),
+    )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.stdout.buffer.write(make_pdf(int(sys.argv[1]) if len(sys.argv) > 1 else 3))
@@ -1,8 +1,12 @@
 import logging
 import sqlite3
+import threading
+import time
 import streamlit as st
 from typing import Any, Dict, List, Optional, Tuple
 from utils import load_config
+from utils.metrics import SQLITE_QUERY_SECONDS
+from utils.tracing import traced
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 logger = logging.getLogger(__name__)
@@ -13,19 +17,40 @@ DB_PATH = config.get("chat_sessions_database_path", "chatSessionCache.db")
 # ---------------------------
 # Connection Management
 # ---------------------------
+_thread_local = threading.local()
+
+
+def _in_streamlit_session() -> bool:
+    if not st.runtime.exists():  # plain `python ...`, not `streamlit run`
+        return False
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    return get_script_run_ctx() is not None
+
+
 def get_db_connection() -> sqlite3.Connection:
     """
-    Return an existing Streamlit session DB connection or create a new one.
+    Return the Streamlit session's DB connection (created on first use). Callers
+    outside a Streamlit script run (API server, benchmarks) get one per thread.
     """
+    if not _in_streamlit_session():
+        conn = getattr(_thread_local, "conn", None)
+        if conn is None:
+            conn = _thread_local.conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        return conn
     if "db_conn" not in st.session_state or st.session_state.db_conn is None:
         st.session_state.db_conn = sqlite3.connect(DB_PATH, check_same_thread=False)
     return st.session_state.db_conn
 
 def close_db_connection() -> None:
-    conn: Optional[sqlite3.Connection] = st.session_state.get("db_conn")
+    if not _in_streamlit_session():
+        conn = getattr(_thread_local, "conn", None)
+        _thread_local.conn = None
+    else:
+        conn = st.session_state.get("db_conn")
+        st.session_state.db_conn = None
     if conn:
         conn.close()
-        st.session_state.db_conn = None
         logger.info("Database connection closed.")
 
 # ---------------------------
@@ -46,6 +71,18 @@ def init_db() -> None:
             );
             """
         )
+        # Rolling summary of a session's older text messages (api_Handler/conversation_memory.py);
+        # everything up to last_message_id is folded into `summary`.
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS session_summaries (
+                chat_history_id TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                last_message_id INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            """
+        )
         conn.commit()
     logger.info("Database initialized at %s", DB_PATH)
 
@@ -58,39 +95,45 @@ def _insert_message(chat_history_id: str, sender_type: str, message_type: str, t
     """
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute(
-        """
-        INSERT INTO messages (chat_history_id, sender_type, message_type, text_content, blob_content)
-        VALUES (?, ?, ?, ?, ?)
-        """,
-        (chat_history_id, sender_type, message_type, text, sqlite3.Binary(blob) if blob else None),
-    )
-    conn.commit()
+    with SQLITE_QUERY_SECONDS.time(db="chat_sessions", op="insert_message"):
+        cursor.execute(
+            """
+            INSERT INTO messages (chat_history_id, sender_type, message_type, text_content, blob_content)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (chat_history_id, sender_type, message_type, text, sqlite3.Binary(blob) if blob else None),
+        )
+        conn.commit()
     logger.debug("Inserted %s message into chat %s", message_type, chat_history_id)
 
 #  Author: UjjwalS (https://www.ujjwalsaini.dev)
+@traced()
 def save_text_message(chat_history_id: str, sender_type: str, text: str) -> None:
     _insert_message(chat_history_id, sender_type, "text", text=text)
 
 
+@traced()
 def save_image_message(chat_history_id: str, sender_type: str, image_bytes: bytes) -> None:
     _insert_message(chat_history_id, sender_type, "image", blob=image_bytes)
 
 
+@traced()
 def save_audio_message(chat_history_id: str, sender_type: str, audio_bytes: bytes) -> None:
     _insert_message(chat_history_id, sender_type, "audio", blob=audio_bytes)
 
 # ---------------------------
 # Retrieval Operations - Load all messages for a chat history.
 # ---------------------------
+@traced()
 def load_messages(chat_history_id: str) -> List[Dict[str, Any]]:
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute(
-        "SELECT message_id, sender_type, message_type, text_content, blob_content FROM messages WHERE chat_history_id = ?",
-        (chat_history_id,),
-    )
-    messages = cursor.fetchall()
+    with SQLITE_QUERY_SECONDS.time(db="chat_sessions", op="load_messages"):
+        cursor.execute(
+            "SELECT message_id, sender_type, message_type, text_content, blob_content FROM messages WHERE chat_history_id = ?",
+            (chat_history_id,),
+        )
+        messages = cursor.fetchall()
 
     chat_history = []
     for message_id, sender_type, message_type, text_content, blob_content in messages:
@@ -107,51 +150,115 @@ def load_last_k_text_messages(chat_history_id: str, k: int) -> List[Dict[str, An
     """
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute(
-        """
-        SELECT message_id, sender_type, message_type, text_content
-        FROM messages
-        WHERE chat_history_id = ? AND message_type = 'text'
-        ORDER BY message_id DESC
-        LIMIT ?
-        """,
-        (chat_history_id, k),
-    )
-    messages = cursor.fetchall()
+    with SQLITE_QUERY_SECONDS.time(db="chat_sessions", op="load_last_k"):
+        cursor.execute(
+            """
+            SELECT message_id, sender_type, message_type, text_content
+            FROM messages
+            WHERE chat_history_id = ? AND message_type = 'text'
+            ORDER BY message_id DESC
+            LIMIT ?
+            """,
+            (chat_history_id, k),
+        )
+        messages = cursor.fetchall()
 
     return [
         {"message_id": mid, "sender_type": sender, "message_type": mtype, "content": text}
         for mid, sender, mtype, text in reversed(messages)
     ]
 
+@traced()
 def load_last_k_text_messages_ollama(chat_history_id: str, k: int) -> List[Dict[str, Any]]:
     """
     Load last K text messages in Ollama-compatible format.
     """
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute(
-        """
-        SELECT message_id, sender_type, message_type, text_content
-        FROM messages
-        WHERE chat_history_id = ? AND message_type = 'text'
-        ORDER BY message_id DESC
-        LIMIT ?
-        """,
-        (chat_history_id, k),
-    )
-    messages = cursor.fetchall()
+    with SQLITE_QUERY_SECONDS.time(db="chat_sessions", op="load_last_k"):
+        cursor.execute(
+            """
+            SELECT message_id, sender_type, message_type, text_content
+            FROM messages
+            WHERE chat_history_id = ? AND message_type = 'text'
+            ORDER BY message_id DESC
+            LIMIT ?
+            """,
+            (chat_history_id, k),
+        )
+        messages = cursor.fetchall()
 
     return [{"role": sender, "content": text} for mid, sender, mtype, text in reversed(messages)]
 
+@traced()
+def load_text_messages_after(
+    chat_history_id: str, after_message_id: int, limit: int, newest: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Text messages with ``message_id > after_message_id`` in chronological order:
+    the oldest ``limit`` of them, or the newest ``limit`` when ``newest`` is set.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    with SQLITE_QUERY_SECONDS.time(db="chat_sessions", op="load_after"):
+        cursor.execute(
+            f"""
+            SELECT message_id, sender_type, text_content
+            FROM messages
+            WHERE chat_history_id = ? AND message_type = 'text' AND message_id > ?
+            ORDER BY message_id {"DESC" if newest else "ASC"}
+            LIMIT ?
+            """,
+            (chat_history_id, after_message_id, limit),
+        )
+        rows = cursor.fetchall()
+    if newest:
+        rows.reverse()
+    return [{"message_id": mid, "role": sender, "content": text} for mid, sender, text in rows]
+
+
+def load_session_summary(chat_history_id: str) -> Tuple[Optional[str], int]:
+    """(summary, last summarised message_id); (None, 0) for a session without one."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    with SQLITE_QUERY_SECONDS.time(db="chat_sessions", op="load_summary"):
+        cursor.execute(
+            "SELECT summary, last_message_id FROM session_summaries WHERE chat_history_id = ?",
+            (chat_history_id,),
+        )
+        row = cursor.fetchone()
+    return (row[0], row[1]) if row else (None, 0)
+
+
+def save_session_summary(chat_history_id: str, summary: str, last_message_id: int) -> None:
+    """Upsert a session's summary; a write covering fewer messages than the stored one is ignored."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    with SQLITE_QUERY_SECONDS.time(db="chat_sessions", op="save_summary"):
+        cursor.execute(
+            """
+            INSERT INTO session_summaries (chat_history_id, summary, last_message_id, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(chat_history_id) DO UPDATE SET
+                summary = excluded.summary,
+                last_message_id = excluded.last_message_id,
+                updated_at = excluded.updated_at
+            WHERE excluded.last_message_id > session_summaries.last_message_id
+            """,
+            (chat_history_id, summary, last_message_id, time.time()),
+        )
+        conn.commit()
+
 def get_all_chat_history_ids() -> List[str]:
     """
     Retrieve distinct chat_history_id values.
     """
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT DISTINCT chat_history_id FROM messages ORDER BY chat_history_id ASC")
-    return [row[0] for row in cursor.fetchall()]
+    with SQLITE_QUERY_SECONDS.time(db="chat_sessions", op="list_sessions"):
+        cursor.execute("SELECT DISTINCT chat_history_id FROM messages ORDER BY chat_history_id ASC")
+        rows = cursor.fetchall()
+    return [row[0] for row in rows]
 
 # ---------------------------
 # Delete Operations - Delete all messages belonging to a chat history.
@@ -159,8 +266,10 @@ def get_all_chat_history_ids() -> List[str]:
 def delete_chat_history(chat_history_id: str) -> None:
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("DELETE FROM messages WHERE chat_history_id = ?", (chat_history_id,))
-    conn.commit()
+    with SQLITE_QUERY_SECONDS.time(db="chat_sessions", op="delete_session"):
+        cursor.execute("DELETE FROM messages WHERE chat_history_id = ?", (chat_history_id,))
+        cursor.execute("DELETE FROM session_summaries WHERE chat_history_id = ?", (chat_history_id,))
+        conn.commit()
     logger.warning("Deleted all messages for chat_history_id=%s", chat_history_id)
 
 # ---------------------------
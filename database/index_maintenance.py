@@ -0,0 +1,412 @@
+"""
+Maintenance for the vector collection behind ``load_vectordb``.
+
+Nothing removed vectors before, so ``chroma_db`` only grew, and Chroma's HNSW
+index keeps deleted entries as tombstones until the collection is rebuilt. The
+operations here run from cron or a shell, without the UI:
+
+- ``delete_source``: removes a document, i.e. every entry with its
+  ``source_hash`` (chunks and summary_index entries). It also drops the
+  document's dedup signatures and its ingest jobs, so uploading it again
+  re-indexes it. A chunk that other documents were deduplicated onto is handed
+  to the first of them instead of being deleted.
+- ``expire``: deletes documents ingested more than ``ttl_seconds`` ago. The age
+  comes from the chunks' ``ingested_at``, or else from the ingest job's
+  completion time. Documents with neither are kept.
+- ``compact``: copies the live entries into a fresh collection and swaps it in
+  under the same name, dropping the tombstones. The original is renamed aside
+  and dropped only once the copy holds its name; ``load_vectordb`` finishes a
+  swap that was interrupted before it opens the collection. ``maintain`` runs ``expire`` and
+  then ``compact``, but only once the deletions since the last compaction reach
+  ``compact_deleted_fraction`` of the collection.
+- ``stats``: reports the vector count, the size on disk, the deletions since the
+  last compaction, and per source the chunk and summary counts, ingest time and
+  upload filename.
+
+    python index_maintenance.py stats [--top 20] [--json]
+    python index_maintenance.py delete <source_hash> [...]
+    python index_maintenance.py expire [--ttl-seconds 604800] [--dry-run]
+    python index_maintenance.py compact
+    python index_maintenance.py maintain                 # e.g. nightly from cron
+
+Compaction replaces the collection, which breaks the handles other processes
+hold, so it only runs while no other process has the collection open: the UI,
+the API server and the ingestion workers each hold a shared lock on
+``<chromadb_path>/collection.lock`` from their first ``load_vectordb()``.
+Otherwise ``compact`` raises ``CollectionInUse`` and ``maintain`` skips the
+compaction until a run finds them stopped; processes started meanwhile wait for
+it to finish. Deletions are counted in ``<chromadb_path>/maintenance.json``.
+
+Config (``index_maintenance`` section):
+{
+  "ttl_seconds": 0,                  # 0 = documents never expire
+  "compact_deleted_fraction": 0.2,   # maintain compacts once this share of entries was deleted
+  "batch_size": 1000                 # entries read/written per Chroma call
+}
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from dedup import DedupCfg, DedupIndex, existing_index
+from job_queue import DONE, INGEST, JobQueue, load_queue_cfg
+from summary_index import CHUNK, SUMMARY_LEVELS
+from utils import load_config
+from utils.metrics import INDEX_ENTRIES_DELETED_TOTAL
+from vectordb_handler import (
+    COMPACT_SUFFIX,
+    RETIRED_SUFFIX,
+    drop_fast_index,
+    exclusive_collection,
+    fast_index_path,
+    load_vectordb,
+    recover_compaction,
+)
+
+logger = logging.getLogger(__name__)
+
+config = load_config()
+
+STATE_FILE = "maintenance.json"
+
+
+# ---------------------------
+# Config
+# ---------------------------
+@dataclass(frozen=True)
+class MaintenanceCfg:
+    ttl_seconds: float = 0.0
+    compact_deleted_fraction: float = 0.2
+    batch_size: int = 1000
+
+    @staticmethod
+    def from_dict(d: Optional[Dict[str, Any]]) -> "MaintenanceCfg":
+        mc = d or {}
+        return MaintenanceCfg(
+            ttl_seconds=max(0.0, float(mc.get("ttl_seconds", 0.0))),
+            compact_deleted_fraction=float(mc.get("compact_deleted_fraction", 0.2)),
+            batch_size=max(1, int(mc.get("batch_size", 1000))),
+        )
+
+
+maintenance_cfg = MaintenanceCfg.from_dict(config.get("index_maintenance"))
+
+
+def _db_path() -> str:
+    return config["chromadb"].get("chromadb_path", "./chroma_db")
+
+
+# ---------------------------
+# Bookkeeping
+# ---------------------------
+def _load_state() -> Dict[str, Any]:
+    try:
+        with open(os.path.join(_db_path(), STATE_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"deleted_since_compact": 0, "last_compacted_at": None}
+
+
+def _save_state(state: Dict[str, Any]) -> None:
+    path = os.path.join(_db_path(), STATE_FILE)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def _record_deleted(n: int) -> None:
+    state = _load_state()
+    state["deleted_since_compact"] = int(state.get("deleted_since_compact", 0)) + n
+    _save_state(state)
+
+
+def _disk_bytes(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:  # removed while walking
+                pass
+    return total
+
+
+def _dedup_index() -> Optional[DedupIndex]:
+    return existing_index(DedupCfg.from_dict(config.get("dedup")))
+
+
+def _scan(collection: Any, batch_size: int) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(id, metadata) of every entry, ``batch_size`` at a time."""
+    total = collection.count()
+    for offset in range(0, total, batch_size):
+        got = collection.get(limit=batch_size, offset=offset, include=["metadatas"])
+        for vid, meta in zip(got["ids"], got["metadatas"]):
+            yield vid, meta or {}
+
+
+# ---------------------------
+# Deletion and expiry
+# ---------------------------
+def _rehome_shared(collection: Any, dedup: DedupIndex, source_hash: str, ids: Sequence[str], metas: Sequence[Dict[str, Any]]) -> Set[str]:
+    """Give chunks that other documents were deduplicated onto to one of them; returns the ids kept."""
+    kept: Set[str] = set()
+    for vid, meta in zip(ids, metas):
+        if meta.get("level", CHUNK) != CHUNK or "doc_id" not in meta:
+            continue
+        others = [(src, idx) for src, idx in dedup.sources_for(meta["doc_id"]) if src != source_hash]
+        if not others:
+            continue
+        src, idx = min(others)
+        new_id = dedup.reassign(meta["doc_id"], src, idx)
+        collection.update(ids=[vid], metadatas=[{**meta, "doc_id": new_id, "source_hash": src, "chunk_index": idx}])
+        kept.add(vid)
+    return kept
+
+
+def delete_source(
+    source_hash: str, vdb: Optional[Any] = None, cfg: MaintenanceCfg = maintenance_cfg, reason: str = "delete"
+) -> Dict[str, Any]:
+    """Remove a document from the collection, the dedup index and the job queue."""
+    vdb = vdb if vdb is not None else load_vectordb()
+    collection = vdb._collection
+    got = collection.get(where={"source_hash": source_hash}, include=["metadatas"])
+    metas = [m or {} for m in got["metadatas"]]
+    dedup = _dedup_index()
+    kept = _rehome_shared(collection, dedup, source_hash, got["ids"], metas) if dedup is not None else set()
+
+    doomed = [(vid, meta) for vid, meta in zip(got["ids"], metas) if vid not in kept]
+    for start in range(0, len(doomed), cfg.batch_size):
+        collection.delete(ids=[vid for vid, _ in doomed[start : start + cfg.batch_size]])
+    signatures = dedup.forget_source(source_hash) if dedup is not None else 0
+    jobs = JobQueue(load_queue_cfg()).forget(source_hash)
+    if doomed or kept:  # rehoming keeps the count but changes entries
+        drop_fast_index()
+    if doomed:
+        _record_deleted(len(doomed))
+        INDEX_ENTRIES_DELETED_TOTAL.inc(len(doomed), reason=reason)
+
+    summaries = sum(meta.get("level") in SUMMARY_LEVELS for _, meta in doomed)
+    result = {
+        "source_hash": source_hash,
+        "chunks": len(doomed) - summaries,
+        "summaries": summaries,
+        "reassigned": len(kept),
+        "signatures": signatures,
+        "jobs": jobs,
+    }
+    logger.info(
+        "Deleted %s: %d chunks, %d summaries (%d shared chunks reassigned)",
+        source_hash[:12], result["chunks"], summaries, len(kept),
+    )
+    return result
+
+
+def ingest_times(vdb: Optional[Any] = None, cfg: MaintenanceCfg = maintenance_cfg) -> Dict[str, Optional[float]]:
+    """Per source, when it was last ingested (None when neither its chunks nor a job say)."""
+    vdb = vdb if vdb is not None else load_vectordb()
+    times: Dict[str, Optional[float]] = {}
+    for _, meta in _scan(vdb._collection, cfg.batch_size):
+        src = meta.get("source_hash")
+        if not src:
+            continue
+        times.setdefault(src, None)
+        ts = meta.get("ingested_at")
+        if ts is not None and (times[src] is None or ts > times[src]):
+            times[src] = float(ts)
+    undated = [src for src, ts in times.items() if ts is None]
+    for job in JobQueue(load_queue_cfg()).get(undated):  # indexed before chunks carried ingested_at
+        if job.kind == INGEST and job.status == DONE:
+            times[job.job_id] = job.updated_at
+    return times
+
+
+def expire(
+    ttl_seconds: Optional[float] = None, vdb: Optional[Any] = None, cfg: MaintenanceCfg = maintenance_cfg, dry_run: bool = False
+) -> List[str]:
+    """Delete documents ingested more than ``ttl_seconds`` ago; returns their hashes."""
+    ttl = cfg.ttl_seconds if ttl_seconds is None else ttl_seconds
+    if ttl <= 0:
+        return []
+    vdb = vdb if vdb is not None else load_vectordb()
+    cutoff = time.time() - ttl
+    expired = sorted(src for src, ts in ingest_times(vdb, cfg).items() if ts is not None and ts < cutoff)
+    if not dry_run:
+        for src in expired:
+            delete_source(src, vdb, cfg, reason="expire")
+    logger.info("%s %d documents older than %.0fs", "Would expire" if dry_run else "Expired", len(expired), ttl)
+    return expired
+
+
+# ---------------------------
+# Compaction
+# ---------------------------
+class CollectionInUse(RuntimeError):
+    """Compaction refused: another process has the collection open."""
+
+
+def compact(vdb: Optional[Any] = None, cfg: MaintenanceCfg = maintenance_cfg) -> Dict[str, Any]:
+    """Rebuild the collection from its live entries and swap it in under the same name."""
+    vdb = vdb if vdb is not None else load_vectordb()
+    with exclusive_collection() as alone:
+        if not alone:
+            raise CollectionInUse(
+                f"{vdb._collection.name} is open in other processes (UI, API server, ingestion workers); stop them to compact"
+            )
+        return _compact(vdb, cfg)
+
+
+def _compact(vdb: Any, cfg: MaintenanceCfg) -> Dict[str, Any]:
+    client = vdb._client
+    name = config["chromadb"].get("collection_name", "default")  # vdb._collection may be a handle renamed by an earlier run
+    tmp_name = f"{name}{COMPACT_SUFFIX}"
+    recover_compaction(client, name)  # load_vectordb already did, unless the caller built its own store
+
+    t0 = time.perf_counter()
+    before = _disk_bytes(_db_path())
+    old = client.get_collection(name)
+    new = client.create_collection(tmp_name, metadata=old.metadata)
+    total = old.count()
+    for offset in range(0, total, cfg.batch_size):
+        got = old.get(limit=cfg.batch_size, offset=offset, include=["embeddings", "documents", "metadatas"])
+        new.add(ids=got["ids"], embeddings=got["embeddings"], documents=got["documents"], metadatas=got["metadatas"])
+    if new.count() != total:
+        client.delete_collection(tmp_name)
+        raise RuntimeError(f"Compaction copied {new.count()} of {total} entries; {name} left unchanged")
+    # Swap by renames, dropping the original last: a crash at any point leaves a state
+    # recover_compaction completes without losing either copy.
+    old.modify(name=f"{name}{RETIRED_SUFFIX}")
+    new.modify(name=name)
+    client.delete_collection(f"{name}{RETIRED_SUFFIX}")
+
+    load_vectordb.cache_clear()  # the cached store points at the deleted collection
+    drop_fast_index()
+    _save_state({"deleted_since_compact": 0, "last_compacted_at": time.time()})
+    result = {
+        "vectors": total,
+        "disk_bytes_before": before,
+        "disk_bytes_after": _disk_bytes(_db_path()),
+        "seconds": time.perf_counter() - t0,
+    }
+    logger.info("Compacted %s: %d entries, %d -> %d bytes", name, total, before, result["disk_bytes_after"])
+    return result
+
+
+def maintain(vdb: Optional[Any] = None, cfg: MaintenanceCfg = maintenance_cfg) -> Dict[str, Any]:
+    """Expire old documents, then compact if enough entries were deleted since the last compaction."""
+    vdb = vdb if vdb is not None else load_vectordb()
+    expired = expire(vdb=vdb, cfg=cfg)
+    deleted = int(_load_state().get("deleted_since_compact", 0))
+    live = vdb._collection.count()
+    due = deleted > 0 and deleted >= cfg.compact_deleted_fraction * (live + deleted)
+    result: Dict[str, Any] = {"expired": expired, "deleted_since_compact": deleted, "compacted": None}
+    if due:
+        try:
+            result["compacted"] = compact(vdb, cfg)
+        except CollectionInUse as e:
+            logger.warning("Compaction due but skipped: %s", e)
+            result["compact_skipped"] = str(e)
+    return result
+
+
+# ---------------------------
+# Stats
+# ---------------------------
+def stats(vdb: Optional[Any] = None, cfg: MaintenanceCfg = maintenance_cfg) -> Dict[str, Any]:
+    """Collection size, disk usage and per-source entry counts (largest sources first)."""
+    vdb = vdb if vdb is not None else load_vectordb()
+    collection = vdb._collection
+    per_source: Dict[str, Dict[str, Any]] = {}
+    for _, meta in _scan(collection, cfg.batch_size):
+        src = meta.get("source_hash") or ""
+        entry = per_source.setdefault(src, {"source_hash": src, "chunks": 0, "summaries": 0})
+        entry["summaries" if meta.get("level") in SUMMARY_LEVELS else "chunks"] += 1
+    times = ingest_times(vdb, cfg)
+    jobs = {job.job_id: job for job in JobQueue(load_queue_cfg()).get([s for s in per_source if s])}
+    for src, entry in per_source.items():
+        entry["ingested_at"] = times.get(src)
+        entry["filename"] = jobs[src].filename if src in jobs else None
+
+    state = _load_state()
+    return {
+        "collection": collection.name,
+        "vectors": collection.count(),
+        "sources": len(per_source),
+        "disk_bytes": _disk_bytes(_db_path()),
+        "fast_index_bytes": _disk_bytes(fast_index_path()),
+        "deleted_since_compact": int(state.get("deleted_since_compact", 0)),
+        "last_compacted_at": state.get("last_compacted_at"),
+        "per_source": sorted(per_source.values(), key=lambda e: (-(e["chunks"] + e["summaries"]), e["source_hash"])),
+    }
+
+
+def _when(ts: Optional[float]) -> str:
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(ts)) if ts else "-"
+
+
+def _print_stats(report: Dict[str, Any], top: int) -> None:
+    mb = 1024 * 1024
+    print(
+        f"{report['collection']}: {report['vectors']} vectors from {report['sources']} sources, "
+        f"{report['disk_bytes'] / mb:.1f} MB on disk (fast index {report['fast_index_bytes'] / mb:.1f} MB)"
+    )
+    print(f"deleted since last compaction: {report['deleted_since_compact']} (compacted: {_when(report['last_compacted_at'])})")
+    print(f"  {'source':<14}{'chunks':>8}{'summaries':>11}  {'ingested':<17} filename")
+    for entry in report["per_source"][:top]:
+        print(
+            f"  {entry['source_hash'][:12] or '(none)':<14}{entry['chunks']:>8}{entry['summaries']:>11}"
+            f"  {_when(entry['ingested_at']):<17} {entry['filename'] or '-'}"
+        )
+    if len(report["per_source"]) > top:
+        print(f"  ... {len(report['per_source']) - top} more")
+
+
+def main(argv: Sequence[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("stats", help="vector count, disk size and per-source counts")
+    s.add_argument("--top", type=int, default=20, help="sources listed")
+    s.add_argument("--json", action="store_true")
+    d = sub.add_parser("delete", help="remove documents by source hash")
+    d.add_argument("source_hashes", nargs="+")
+    e = sub.add_parser("expire", help="remove documents older than the TTL")
+    e.add_argument("--ttl-seconds", type=float, help="override index_maintenance.ttl_seconds")
+    e.add_argument("--dry-run", action="store_true", help="list what would be removed")
+    sub.add_parser("compact", help="rebuild the collection without its deleted entries")
+    sub.add_parser("maintain", help="expire, then compact when enough was deleted")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "stats":
+        report = stats()
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            _print_stats(report, args.top)
+    elif args.cmd == "delete":
+        for source_hash in args.source_hashes:
+            print(json.dumps(delete_source(source_hash)))
+    elif args.cmd == "expire":
+        for source_hash in expire(args.ttl_seconds, dry_run=args.dry_run):
+            print(source_hash)
+    elif args.cmd == "compact":
+        try:
+            print(json.dumps(compact()))
+        except CollectionInUse as e:
+            print(f"❌ {e}", file=sys.stderr)
+            return 1
+    else:
+        print(json.dumps(maintain()))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    sys.exit(main(sys.argv[1:]))
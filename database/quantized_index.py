@@ -0,0 +1,160 @@
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from vector_index import Hit, NumpyVectorIndex, Where, normalise_rows, top_k
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+logger = logging.getLogger(__name__)
+
+MODES = ("int8", "binary")
+BLOCK_ROWS = 8192  # bounds (and reuses) the float32 scratch buffer of the first pass
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount_rows(x: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):  # NumPy >= 2.0
+        return np.bitwise_count(x).sum(axis=-1, dtype=np.int32)
+    return _POPCOUNT[x].sum(axis=-1, dtype=np.int32)
+
+
+# ---------------------------
+# Quantisers
+# ---------------------------
+def quantize_int8(vectors: np.ndarray) -> tuple:
+    """Symmetric per-dimension scalar quantisation. Returns (codes[int8], scale[float32])."""
+    scale = np.abs(vectors).max(axis=0).astype(np.float32) / 127.0
+    scale[scale == 0] = 1.0
+    codes = np.empty(vectors.shape, dtype=np.int8)
+    for start in range(0, vectors.shape[0], BLOCK_ROWS):
+        block = np.asarray(vectors[start : start + BLOCK_ROWS], dtype=np.float32)
+        codes[start : start + BLOCK_ROWS] = np.clip(np.rint(block / scale), -127, 127)
+    return codes, scale
+
+
+def quantize_binary(vectors: np.ndarray) -> np.ndarray:
+    """Sign bits packed 8 per byte: 768 dims -> 96 bytes per vector."""
+    n, dim = vectors.shape
+    codes = np.empty((n, (dim + 7) // 8), dtype=np.uint8)
+    for start in range(0, n, BLOCK_ROWS):
+        block = np.asarray(vectors[start : start + BLOCK_ROWS])
+        codes[start : start + BLOCK_ROWS] = np.packbits(block > 0, axis=1)
+    return codes
+
+
+# ---------------------------
+# Index
+# ---------------------------
+class QuantizedVectorIndex(NumpyVectorIndex):
+    """
+    Two-stage search: a first pass over compact in-memory codes picks
+    ``k * rescore_factor`` candidates, which are rescored exactly against the
+    float32 vectors. Those stay memory-mapped on disk, so only candidate rows
+    are ever paged in.
+
+    Codes are stored inside the float32 snapshot's directory
+    (``codes_<mode>.npz``), derived from it on first load and tagged with the
+    snapshot they were derived from, so codes from another build are never reused.
+    """
+
+    def __init__(self, base: NumpyVectorIndex, mode: str, rescore_factor: int = 8):
+        super().__init__(base.path, base.vectors, base.ids, base.documents, base.metadatas)
+        if mode not in MODES:
+            raise ValueError(f"Unknown quantization mode {mode!r}; expected one of {MODES}")
+        self.mode = mode
+        self.rescore_factor = max(1, rescore_factor)
+        self.scale: Optional[np.ndarray] = None
+        self.codes = self._load_or_build_codes()
+
+    @classmethod
+    def wrap(cls, base: NumpyVectorIndex, mode: str, rescore_factor: int = 8) -> "QuantizedVectorIndex":
+        return cls(base, mode, rescore_factor)
+
+    @property
+    def _codes_path(self) -> Path:
+        return self.path / f"codes_{self.mode}.npz"
+
+    def _load_or_build_codes(self) -> np.ndarray:
+        try:
+            with np.load(self._codes_path) as saved:
+                codes = saved["codes"]
+                if str(saved["snapshot"]) == self.path.name and codes.shape[0] == len(self):
+                    if self.mode == "int8":
+                        self.scale = saved["scale"]
+                    return codes
+        except (FileNotFoundError, KeyError, ValueError, OSError):
+            pass
+        logger.info("Quantising %d vectors (%s) at %s", len(self), self.mode, self.path)
+        arrays = {"snapshot": np.array(self.path.name)}
+        if self.mode == "int8":
+            codes, self.scale = quantize_int8(self.vectors)
+            arrays["scale"] = self.scale
+        else:
+            codes = quantize_binary(self.vectors)
+        tmp = self.path / f"codes_{self.mode}.{os.getpid()}.tmp.npz"
+        np.savez(tmp, codes=codes, **arrays)
+        os.replace(tmp, self._codes_path)
+        return codes
+
+    # --- Search -----------------------------------------------------
+    def _first_pass(self, q: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        """Approximate scores (higher is better) for every query against ``rows`` (or all)."""
+        codes = self.codes if rows is None else self.codes[rows]
+        out = np.empty((q.shape[0], codes.shape[0]), dtype=np.float32)
+        if self.mode == "int8":
+            qs = (q * self.scale).astype(np.float32)
+            buf = np.empty((min(BLOCK_ROWS, codes.shape[0]), codes.shape[1]), dtype=np.float32)
+            for start in range(0, codes.shape[0], BLOCK_ROWS):
+                block = codes[start : start + BLOCK_ROWS]
+                tmp = buf[: block.shape[0]]
+                np.copyto(tmp, block, casting="unsafe")
+                np.matmul(qs, tmp.T, out=out[:, start : start + block.shape[0]])
+        else:
+            qbits = np.packbits(q > 0, axis=1)
+            for start in range(0, codes.shape[0], BLOCK_ROWS):
+                block = codes[start : start + BLOCK_ROWS]
+                for i in range(q.shape[0]):
+                    out[i, start : start + BLOCK_ROWS] = -_popcount_rows(block ^ qbits[i])
+        return out
+
+    def search_batch(self, queries: Sequence[Sequence[float]], k: int = 5, where: Optional[Where] = None) -> List[List[Hit]]:
+        if len(self) == 0 or k <= 0:
+            return [[] for _ in queries]
+        q = normalise_rows(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        mask = self.mask(where)
+        rows = None if mask is None else np.flatnonzero(mask)
+        n = len(self) if rows is None else rows.size
+        if n == 0:
+            return [[] for _ in range(q.shape[0])]
+
+        approx = self._first_pass(q, rows)
+        candidates = top_k(approx, min(n, k * self.rescore_factor))
+        if rows is not None:
+            candidates = rows[candidates]
+
+        results: List[List[Hit]] = []
+        for qi, cand in enumerate(candidates):
+            cand = np.sort(cand)  # sequential page-ins from the memory map
+            exact = np.asarray(self.vectors[cand], dtype=np.float32) @ q[qi]
+            best = top_k(exact, min(k, cand.size))
+            results.append([(int(cand[i]), float(exact[i])) for i in best])
+        return results
+
+    # --- Reporting --------------------------------------------------
+    def footprint(self) -> Dict[str, Any]:
+        """Bytes held in RAM by the first pass vs. kept on disk for rescoring."""
+        resident = self.codes.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+        return {
+            "mode": self.mode,
+            "vectors": len(self),
+            "dim": self.dim,
+            "resident_bytes": int(resident),
+            "float32_bytes": int(len(self) * self.dim * 4),
+            "codes_file_bytes": self._codes_path.stat().st_size,
+            "float32_file_bytes": (self.path / "vectors.npy").stat().st_size,
+            "bytes_per_vector": resident / max(1, len(self)),
+        }
@@ -0,0 +1,205 @@
+"""
+Batched similarity search shared by every session in the process.
+
+A RAG turn used to embed its question with one Ollama request and run one
+search; under load the embedding model sees one request per turn and queues
+them. The service instead takes many queries at once: identical texts are
+embedded once, all of them in a single ``/api/embed`` call, and each distinct
+filter is searched with one batched query (one matrix product on the NumPy fast
+path, one ``collection.query`` with several embeddings on Chroma). Results come
+back per query, in order.
+
+With ``micro_batch`` on, single lookups from concurrent sessions are queued and
+a dispatcher thread sends whatever arrived within ``window_ms`` (up to
+``max_batch`` queries) as one batch, so a burst of turns costs one embedding
+request. ``similarity_search`` has the LangChain signature, so the service drops
+in where a Chroma store or FastRetriever was used:
+
+    from retrieval_service import get_retrieval_service
+    service = get_retrieval_service()
+    docs = service.similarity_search(question, k=4)
+    per_query = service.search_many(["what is X?", "who wrote Y?"], k=4, filter=source_filter(h, dedup_index))  # dedup.source_filter
+
+Recorded: ``neuranix_retrieval_batch_size`` (queries per batch) next to the
+``kind="query"`` embedding histograms.
+
+Config (``retrieval`` section):
+{
+  "micro_batch": true,        # false: each call embeds and searches on its own thread
+  "window_ms": 5,             # how long the dispatcher waits for more queries after the first
+  "max_batch": 64,            # queries per batch
+  "timeout_seconds": 30       # a caller gives up waiting for its batch after this long
+}
+"""
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from utils import load_config
+from utils.metrics import EMBEDDING_BATCH_SECONDS, EMBEDDING_BATCH_SIZE, RETRIEVAL_BATCH_SIZE
+from utils.tracing import set_attributes, span
+
+logger = logging.getLogger(__name__)
+
+config = load_config()
+
+Where = Dict[str, Any]
+
+
+# ---------------------------
+# Config
+# ---------------------------
+@dataclass(frozen=True)
+class RetrievalCfg:
+    micro_batch: bool = True
+    window_ms: float = 5.0
+    max_batch: int = 64
+    timeout_seconds: float = 30.0
+
+    @staticmethod
+    def from_dict(d: Optional[Dict[str, Any]]) -> "RetrievalCfg":
+        rc = d or {}
+        return RetrievalCfg(
+            micro_batch=bool(rc.get("micro_batch", True)),
+            window_ms=max(0.0, float(rc.get("window_ms", 5.0))),
+            max_batch=max(1, int(rc.get("max_batch", 64))),
+            timeout_seconds=float(rc.get("timeout_seconds", 30.0)),
+        )
+
+
+# ---------------------------
+# Batched search
+# ---------------------------
+@dataclass
+class _Query:
+    text: str
+    k: int
+    filter: Optional[Where] = None
+    future: Future = field(default_factory=Future)
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+def _filter_key(where: Optional[Where]) -> str:
+    return json.dumps(where or {}, sort_keys=True, default=str)
+
+
+def _default_retriever() -> Any:
+    from vectordb_handler import get_retriever  # chromadb/langchain load on the first query
+
+    return get_retriever()
+
+
+def search_by_vectors(store: Any, vectors: Sequence[Sequence[float]], k: int, where: Optional[Where] = None) -> List[List[Any]]:
+    """Top-k documents for each query vector with one batched lookup on ``store`` (FastRetriever or Chroma)."""
+    if hasattr(store, "similarity_search_by_vectors"):
+        return store.similarity_search_by_vectors(vectors, k, where)
+    from langchain.schema.document import Document
+
+    got = store._collection.query(
+        query_embeddings=[list(v) for v in vectors],
+        n_results=k,
+        where=where or None,
+        include=["documents", "metadatas"],
+    )
+    return [
+        [Document(page_content=text or "", metadata=meta or {}) for text, meta in zip(texts, metas)]
+        for texts, metas in zip(got["documents"], got["metadatas"])
+    ]
+
+
+class RetrievalService:
+    def __init__(self, cfg: RetrievalCfg, retriever: Callable[[], Any] = _default_retriever):
+        self.cfg = cfg
+        self._retriever = retriever
+        self._queue: "queue.Queue[_Query]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def backend(self) -> str:
+        """``chroma`` or ``fast``: the store the next batch will search."""
+        return "chroma" if type(self._retriever()).__name__ == "Chroma" else "fast"
+
+    def _run(self, batch: List[_Query]) -> None:
+        """Embed the batch's distinct texts in one call, search once per filter, resolve every future."""
+        try:
+            store = self._retriever()
+            texts = list(dict.fromkeys(q.text for q in batch))
+            with span("retrieval_batch", queries=len(batch), texts=len(texts)):
+                with EMBEDDING_BATCH_SECONDS.time(kind="query"):
+                    vectors = dict(zip(texts, store.embeddings.embed_documents(texts)))
+                EMBEDDING_BATCH_SIZE.observe(len(texts), kind="query")
+                RETRIEVAL_BATCH_SIZE.observe(len(batch))
+                groups: Dict[str, List[_Query]] = {}
+                for q in batch:
+                    groups.setdefault(_filter_key(q.filter), []).append(q)
+                for group in groups.values():
+                    k = max(q.k for q in group)
+                    results = search_by_vectors(store, [vectors[q.text] for q in group], k, group[0].filter)
+                    for q, docs in zip(group, results):
+                        q.future.set_result(docs[: q.k])
+        except Exception as e:
+            logger.warning("Batched retrieval of %d queries failed: %s", len(batch), e)
+            for q in batch:
+                if not q.future.done():
+                    q.future.set_exception(e)
+
+    def _dispatch(self) -> None:
+        window = self.cfg.window_ms / 1000.0
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + window
+            while len(batch) < self.cfg.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._run(batch)
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._dispatch, name="retrieval-batcher", daemon=True)
+                self._thread.start()
+
+    def search_many(self, queries: Sequence[str], k: int = 4, filter: Optional[Where] = None) -> List[List[Any]]:
+        """Top-``k`` documents for each of ``queries``, in order."""
+        batch = [_Query(text, k, filter) for text in queries]
+        if not batch:
+            return []
+        if not self.cfg.micro_batch:
+            for i in range(0, len(batch), self.cfg.max_batch):
+                self._run(batch[i : i + self.cfg.max_batch])
+        else:
+            self._start()
+            for q in batch:
+                self._queue.put(q)
+        deadline = time.monotonic() + self.cfg.timeout_seconds
+        results = [q.future.result(timeout=max(0.0, deadline - time.monotonic())) for q in batch]
+        set_attributes(retrieval_wait_ms=round((time.monotonic() - batch[0].queued_at) * 1000.0, 1))
+        return results
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Where] = None) -> List[Any]:
+        return self.search_many([query], k, filter)[0]
+
+
+_service: Optional[RetrievalService] = None
+_service_lock = threading.Lock()
+
+
+def get_retrieval_service() -> RetrievalService:
+    """The process-wide service, built from the ``retrieval`` config section."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = RetrievalService(RetrievalCfg.from_dict(config.get("retrieval")))
+    return _service
@@ -0,0 +1,309 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: publishing is then unserialised
+    fcntl = None
+
+from utils.metrics import EMBEDDING_BATCH_SECONDS, EMBEDDING_BATCH_SIZE
+from utils.tracing import span
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.npy"
+RECORDS_FILE = "records.json"
+CURRENT_FILE = "CURRENT"  # names the published snapshot directory under the index path
+PUBLISH_LOCK = ".publish.lock"
+
+Where = Dict[str, Any]
+Hit = Tuple[int, float]
+
+
+# ---------------------------
+# Metadata filters (Chroma `where` subset)
+# ---------------------------
+_SCALAR_OPS: Dict[str, Callable[[Any, Any], bool]] = {
+    "$eq": lambda a, b: a == b,
+    "$ne": lambda a, b: a != b,
+    "$gt": lambda a, b: a is not None and a > b,
+    "$gte": lambda a, b: a is not None and a >= b,
+    "$lt": lambda a, b: a is not None and a < b,
+    "$lte": lambda a, b: a is not None and a <= b,
+    "$in": lambda a, b: a in b,
+    "$nin": lambda a, b: a not in b,
+}
+
+
+def normalise_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k best scores along the last axis, best first."""
+    n = scores.shape[-1]
+    if k >= n:
+        return np.argsort(-scores, axis=-1)
+    part = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=-1), axis=-1)
+    return np.take_along_axis(part, order, axis=-1)
+
+
+# ---------------------------
+# Index
+# ---------------------------
+class NumpyVectorIndex:
+    """
+    Exact cosine search over a contiguous, L2-normalised float32 matrix.
+
+    Each build writes a self-contained snapshot directory under ``<path>`` and
+    publishes it by atomically replacing ``<path>/CURRENT``. Vectors live in
+    ``vectors.npy`` and are memory-mapped read-only, so the OS page cache holds
+    them and several processes share one copy. Ids, documents, metadatas and the
+    caller's ``info`` live in ``records.json``. Intended for per-session and
+    medium collections where one mat-vec beats an HNSW walk.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        vectors: np.ndarray,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+        info: Optional[Dict[str, Any]] = None,
+    ):
+        self.path = path
+        self.vectors = vectors
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.info = info or {}
+        self._columns: Dict[str, np.ndarray] = {}
+        self._masks: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1]
+
+    # --- Persistence ----------------------------------------------
+    @classmethod
+    def load(cls, path: str | Path) -> "NumpyVectorIndex":
+        path = Path(path)
+        return cls._load_snapshot(path / (path / CURRENT_FILE).read_text(encoding="utf-8").strip())
+
+    @classmethod
+    def _load_snapshot(cls, snapshot: Path) -> "NumpyVectorIndex":
+        vectors = np.load(snapshot / VECTORS_FILE, mmap_mode="r")
+        records = json.loads((snapshot / RECORDS_FILE).read_text(encoding="utf-8"))
+        if len(records["ids"]) != vectors.shape[0]:
+            raise ValueError(f"Index at {snapshot} is inconsistent ({len(records['ids'])} records, {vectors.shape[0]} vectors)")
+        return cls(snapshot, vectors, records["ids"], records["documents"], records["metadatas"], records.get("info"))
+
+    @classmethod
+    def build(
+        cls,
+        path: str | Path,
+        batches: Iterable[Tuple[List[str], Sequence[Sequence[float]], List[str], List[Dict[str, Any]]]],
+        total: int,
+        dim: int,
+        info: Optional[Dict[str, Any]] = None,
+    ) -> "NumpyVectorIndex":
+        """
+        Stream ``(ids, embeddings, documents, metadatas)`` batches into a new index.
+
+        Vectors are normalised batch by batch straight into the memory map, so
+        building never holds more than one batch of raw embeddings in memory.
+        The snapshot goes into a directory no other builder can name and is
+        published by swapping ``CURRENT``, so concurrent builders (API workers,
+        the UI, ingestion workers) never see each other's half-written files;
+        the last one to finish wins. Superseded snapshots are pruned afterwards.
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        name = f"{os.getpid()}-{uuid.uuid4().hex}"
+        staging = path / f".{name}.tmp"
+        staging.mkdir()
+        try:
+            out = np.lib.format.open_memmap(staging / VECTORS_FILE, mode="w+", dtype=np.float32, shape=(total, dim))
+            ids: List[str] = []
+            documents: List[str] = []
+            metadatas: List[Dict[str, Any]] = []
+            row = 0
+            for batch_ids, embeddings, batch_docs, batch_metas in batches:
+                n = len(batch_ids)
+                out[row : row + n] = normalise_rows(np.asarray(embeddings, dtype=np.float32))
+                ids.extend(batch_ids)
+                documents.extend(d or "" for d in batch_docs)
+                metadatas.extend(m or {} for m in batch_metas)
+                row += n
+            if row != total:
+                raise ValueError(f"Expected {total} vectors, received {row}")
+            out.flush()
+            del out
+            records = {"ids": ids, "documents": documents, "metadatas": metadatas, "info": info or {}}
+            (staging / RECORDS_FILE).write_text(json.dumps(records), encoding="utf-8")
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        with open(path / PUBLISH_LOCK, "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            os.rename(staging, path / name)
+            current = path / f".{CURRENT_FILE}.{name}.tmp"
+            current.write_text(name, encoding="utf-8")
+            os.replace(current, path / CURRENT_FILE)
+            # Map ours while still holding the lock: the next publisher prunes it.
+            index = cls._load_snapshot(path / name)
+            cls._prune(path, keep=name)
+        logger.info("Built vector index at %s (%d x %d)", path / name, total, dim)
+        return index
+
+    @staticmethod
+    def _prune(path: Path, keep: str) -> None:
+        """Remove published snapshots other than ``keep`` (staging dirs start with a dot); open memory maps stay valid."""
+        for entry in path.iterdir():
+            if entry.is_dir() and entry.name != keep and not entry.name.startswith("."):
+                shutil.rmtree(entry, ignore_errors=True)
+
+    @classmethod
+    def from_chroma(
+        cls, collection: Any, path: str | Path, batch_size: int = 5000, info: Optional[Dict[str, Any]] = None
+    ) -> "NumpyVectorIndex":
+        """Snapshot a chromadb collection into a memory-mapped index."""
+        total = collection.count()
+        if total == 0:
+            raise ValueError("Collection is empty")
+        dim = len(collection.get(limit=1, include=["embeddings"])["embeddings"][0])
+
+        def _batches():
+            for offset in range(0, total, batch_size):
+                got = collection.get(limit=batch_size, offset=offset, include=["embeddings", "documents", "metadatas"])
+                yield got["ids"], got["embeddings"], got["documents"], got["metadatas"]
+
+        return cls.build(path, _batches(), total, dim, info)
+
+    # --- Filtering --------------------------------------------------
+    def _column(self, key: str) -> np.ndarray:
+        col = self._columns.get(key)
+        if col is None:
+            col = np.empty(len(self.metadatas), dtype=object)
+            col[:] = [m.get(key) for m in self.metadatas]
+            self._columns[key] = col
+        return col
+
+    def _eval(self, where: Where) -> np.ndarray:
+        masks = []
+        for key, cond in where.items():
+            if key == "$and":
+                masks.append(np.logical_and.reduce([self._eval(c) for c in cond]))
+            elif key == "$or":
+                masks.append(np.logical_or.reduce([self._eval(c) for c in cond]))
+            else:
+                col = self._column(key)
+                op, operand = next(iter(cond.items())) if isinstance(cond, dict) else ("$eq", cond)
+                fn = _SCALAR_OPS[op]
+                masks.append(np.fromiter((fn(v, operand) for v in col), dtype=bool, count=len(col)))
+        return np.logical_and.reduce(masks) if masks else np.ones(len(self), dtype=bool)
+
+    def mask(self, where: Optional[Where]) -> Optional[np.ndarray]:
+        """Boolean row mask for a Chroma-style ``where`` filter; memoised per filter."""
+        if not where:
+            return None
+        key = json.dumps(where, sort_keys=True, default=str)
+        with self._lock:
+            cached = self._masks.get(key)
+            if cached is None:
+                cached = self._eval(where)
+                self._masks[key] = cached
+            return cached
+
+    # --- Search -----------------------------------------------------
+    def search(self, query: Sequence[float], k: int = 5, where: Optional[Where] = None) -> List[Hit]:
+        """Top-k (row, cosine) for one query vector."""
+        return self.search_batch([query], k, where)[0]
+
+    def search_batch(self, queries: Sequence[Sequence[float]], k: int = 5, where: Optional[Where] = None) -> List[List[Hit]]:
+        """Top-k for many queries with a single matrix product."""
+        if len(self) == 0 or k <= 0:
+            return [[] for _ in queries]
+        q = normalise_rows(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        mask = self.mask(where)
+        if mask is None:
+            scores = q @ self.vectors.T
+            rows = np.arange(len(self))
+        else:
+            rows = np.flatnonzero(mask)
+            if rows.size == 0:
+                return [[] for _ in range(q.shape[0])]
+            scores = q @ self.vectors[rows].T
+        top = top_k(scores, min(k, rows.size))
+        picked = np.take_along_axis(scores, top, axis=-1)
+        return [
+            [(int(rows[i]), float(s)) for i, s in zip(idx_row, score_row)]
+            for idx_row, score_row in zip(top, picked)
+        ]
+
+    def record(self, row: int) -> Tuple[str, str, Dict[str, Any]]:
+        return self.ids[row], self.documents[row], self.metadatas[row]
+
+
+# ---------------------------
+# LangChain-shaped adapter
+# ---------------------------
+class FastRetriever:
+    """
+    Drop-in for the parts of the LangChain ``Chroma`` API the app uses for
+    retrieval (``similarity_search``), backed by a NumpyVectorIndex.
+    """
+
+    def __init__(self, index: NumpyVectorIndex, embeddings: Any):
+        self.index = index
+        self.embeddings = embeddings
+
+    def _documents(self, hits: List[Hit]) -> List[Any]:
+        from langchain.schema.document import Document
+
+        docs = []
+        for row, _ in hits:
+            _, text, meta = self.index.record(row)
+            docs.append(Document(page_content=text, metadata=meta))
+        return docs
+
+    def similarity_search_by_vector(self, embedding: Sequence[float], k: int = 4, filter: Optional[Where] = None) -> List[Any]:
+        return self._documents(self.index.search(embedding, k, filter))
+
+    def similarity_search_by_vectors(
+        self, embeddings: Sequence[Sequence[float]], k: int = 4, filter: Optional[Where] = None
+    ) -> List[List[Any]]:
+        return [self._documents(hits) for hits in self.index.search_batch(embeddings, k, filter)]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Where] = None) -> List[Any]:
+        with span("embed_query"), EMBEDDING_BATCH_SECONDS.time(kind="query"):
+            vector = self.embeddings.embed_query(query)
+        EMBEDDING_BATCH_SIZE.observe(1, kind="query")
+        with span("index_search", rows=len(self.index)):
+            return self.similarity_search_by_vector(vector, k, filter)
+
+    def similarity_search_batch(self, queries: Sequence[str], k: int = 4, filter: Optional[Where] = None) -> List[List[Any]]:
+        with EMBEDDING_BATCH_SECONDS.time(kind="query"):
+            vectors = self.embeddings.embed_documents(list(queries))
+        EMBEDDING_BATCH_SIZE.observe(len(queries), kind="query")
+        return self.similarity_search_by_vectors(vectors, k, filter)
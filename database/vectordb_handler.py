@@ -1,22 +1,131 @@
 import logging
+import os
+import shutil
+import sqlite3
+import threading
 import chromadb
+from contextlib import contextmanager
 from functools import lru_cache
-from typing import Optional
-from utils import load_config
+from typing import Any, Iterator, Optional, Set, Union
+from utils import load_config, ollama_model_params
 from langchain_chroma import Chroma
 from langchain_ollama import OllamaEmbeddings
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 logger = logging.getLogger(__name__)
 
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, so compaction can't tell whether other processes hold the collection
+    fcntl = None
+
 config = load_config()
 
+HOLDERS_LOCK = "collection.lock"
+RECOVERY_LOCK = "compaction_recovery.lock"
+COMPACT_SUFFIX = "__compact"  # the copy a compaction builds
+RETIRED_SUFFIX = "__retired"  # the original, renamed aside until the copy has taken its name
+_holder_file: Optional[Any] = None
+
+
+def _hold_collection() -> None:
+    """
+    Take a shared lock on ``<chromadb_path>/collection.lock`` for the rest of the
+    process's life; compaction replaces the collection only while it can lock it
+    exclusively. A process starting during a compaction waits for it here.
+    """
+    global _holder_file
+    if _holder_file is not None or fcntl is None:
+        return
+    db_path = config["chromadb"].get("chromadb_path", "./chroma_db")
+    os.makedirs(db_path, exist_ok=True)
+    f = open(os.path.join(db_path, HOLDERS_LOCK), "a")
+    try:
+        fcntl.flock(f, fcntl.LOCK_SH | fcntl.LOCK_NB)
+    except OSError:
+        logger.info("Waiting for a compaction of the vector collection to finish")
+        fcntl.flock(f, fcntl.LOCK_SH)
+    _holder_file = f
+
+
+@contextmanager
+def exclusive_collection() -> Iterator[bool]:
+    """Yield True while no other process holds the collection (new ones wait), else False."""
+    if fcntl is None:
+        yield True
+        return
+    _hold_collection()
+    try:
+        fcntl.flock(_holder_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        fcntl.flock(_holder_file, fcntl.LOCK_SH)  # a failed upgrade may have dropped the shared lock
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        fcntl.flock(_holder_file, fcntl.LOCK_SH)
+
+
+def collection_names(client: Any) -> Set[str]:
+    return {getattr(c, "name", c) for c in client.list_collections()}  # names or Collection objects, by version
+
+
+def recover_compaction(client: Any, name: str) -> None:
+    """
+    Finish or undo a compaction that stopped part-way (see ``index_maintenance.compact``).
+    Must run on a raw client before anything calls ``get_or_create_collection(name)``,
+    which would otherwise create an empty live collection next to the real data.
+
+    A compaction copies ``name`` into ``name__compact``, renames ``name`` to
+    ``name__retired``, renames the copy to ``name`` and then drops the retired one,
+    so the copy is only discarded while the original still holds its name.
+    """
+    tmp_name, retired_name = f"{name}{COMPACT_SUFFIX}", f"{name}{RETIRED_SUFFIX}"
+    names = collection_names(client)
+    if tmp_name not in names and retired_name not in names:
+        return
+    logger.warning("Recovering from an interrupted compaction of %s", name)
+    if tmp_name in names:
+        copy_complete = retired_name in names  # the original is only moved aside once the copy was verified
+        live_empty = name in names and client.get_collection(name).count() == 0
+        if live_empty and (copy_complete or client.get_collection(tmp_name).count() > 0):
+            # Created empty by a process that opened the store mid-swap (or before this recovery existed).
+            client.delete_collection(name)
+            names.discard(name)
+            copy_complete = True
+        if name not in names:
+            client.get_collection(tmp_name).modify(name=name)
+        elif copy_complete:
+            raise RuntimeError(f"{name} and {tmp_name} both hold data; resolve the interrupted compaction by hand")
+        else:
+            client.delete_collection(tmp_name)  # a half-written copy; the original never moved
+    elif name not in names:
+        client.get_collection(retired_name).modify(name=name)  # nothing to swap in: put the original back
+        return
+    if retired_name in names:
+        client.delete_collection(retired_name)
+
+
+def _recover_compaction(client: Any, name: str) -> None:
+    """``recover_compaction`` serialised across processes opening the store at the same time."""
+    if fcntl is None:
+        recover_compaction(client, name)
+        return
+    db_path = config["chromadb"].get("chromadb_path", "./chroma_db")
+    with open(os.path.join(db_path, RECOVERY_LOCK), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        recover_compaction(client, name)
+
+
 def get_ollama_embeddings() -> OllamaEmbeddings:
     try:
         model = config["ollama"]["embedding_model"]
         base_url = config["ollama"].get("base_url", "http://localhost:11434")
         logger.info("Loading Ollama embeddings (model=%s, base_url=%s)", model, base_url)
-        return OllamaEmbeddings(model=model, base_url=base_url)
+        # keep_alive stops Ollama unloading the embedding model between RAG turns
+        keep_alive = ollama_model_params(model).get("keep_alive")
+        return OllamaEmbeddings(model=model, base_url=base_url, keep_alive=keep_alive)
     except Exception as e:
         logger.error("Failed to initialize Ollama embeddings: %s", e)
         raise
@@ -31,8 +140,10 @@ def load_vectordb(embeddings: Optional[OllamaEmbeddings] = None) -> Chroma:
         collection_name = config["chromadb"].get("collection_name", "default")
 
         logger.info("Connecting to ChromaDB at %s (collection=%s)", db_path, collection_name)
+        _hold_collection()
 
         persistent_client = chromadb.PersistentClient(path=db_path)
+        _recover_compaction(persistent_client, collection_name)  # before Chroma() creates an empty collection
 
         langchain_chroma = Chroma(
             client=persistent_client,
@@ -47,3 +158,123 @@ def load_vectordb(embeddings: Optional[OllamaEmbeddings] = None) -> Chroma:
         logger.error("Failed to load vector DB: %s", e)
         raise
 
+
+# ---------------------------
+# NumPy fast path for small/medium collections
+# ---------------------------
+_fast_lock = threading.Lock()
+_fast_retriever: Optional[Any] = None
+_fast_generation = -1
+_generation_local = threading.local()
+
+GENERATION_DB = "index_generation.db"
+
+
+def _generation_conn() -> sqlite3.Connection:
+    conn = getattr(_generation_local, "conn", None)
+    if conn is None:
+        db_path = config["chromadb"].get("chromadb_path", "./chroma_db")
+        os.makedirs(db_path, exist_ok=True)
+        conn = sqlite3.connect(os.path.join(db_path, GENERATION_DB), timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS generation (collection TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        _generation_local.conn = conn
+    return conn
+
+
+def collection_generation() -> int:
+    """Write generation of the collection, shared by every process that uses it."""
+    name = config["chromadb"].get("collection_name", "default")
+    row = _generation_conn().execute("SELECT value FROM generation WHERE collection = ?", (name,)).fetchone()
+    return int(row[0]) if row else 0
+
+
+def invalidate_fast_retriever() -> None:
+    """
+    Call after every write to the collection (adds, deletes, metadata updates).
+    Bumps the shared write generation, so fast-path snapshots in every process,
+    and the one on disk, are rebuilt before their next lookup.
+    """
+    global _fast_retriever
+    name = config["chromadb"].get("collection_name", "default")
+    _generation_conn().execute(
+        "INSERT INTO generation (collection, value) VALUES (?, 1) "
+        "ON CONFLICT(collection) DO UPDATE SET value = value + 1",
+        (name,),
+    )
+    with _fast_lock:
+        _fast_retriever = None
+
+
+def fast_index_path() -> str:
+    """Where the fast path keeps its snapshot of the collection."""
+    fast_cfg = config["chromadb"].get("fast_path", {}) or {}
+    db_path = config["chromadb"].get("chromadb_path", "./chroma_db")
+    collection_name = config["chromadb"].get("collection_name", "default")
+    return fast_cfg.get("path") or os.path.join(db_path, "fast_index", collection_name)
+
+
+def drop_fast_index() -> None:
+    """``invalidate_fast_retriever`` that also deletes the snapshot from disk (reclaims the space)."""
+    invalidate_fast_retriever()
+    with _fast_lock:
+        shutil.rmtree(fast_index_path(), ignore_errors=True)
+
+
+def load_fast_retriever() -> Optional[Any]:
+    """
+    Return a FastRetriever over a memory-mapped snapshot of the collection, or None
+    when the fast path is disabled, NumPy is missing, or the collection is too large.
+    The snapshot records the collection's write generation it was built at and is
+    rebuilt once any process has written since (or its size no longer matches). With
+    ``quantization`` set, the first pass runs on int8/binary codes held in memory and
+    only the candidates are rescored against the float32 snapshot on disk.
+    """
+    global _fast_retriever, _fast_generation
+    fast_cfg = config["chromadb"].get("fast_path", {}) or {}
+    if not fast_cfg.get("enabled", False):
+        return None
+    try:
+        from vector_index import FastRetriever, NumpyVectorIndex
+    except ImportError as e:
+        logger.warning("Fast retrieval path unavailable (%s); using Chroma.", e)
+        return None
+
+    vector_db = load_vectordb()
+    collection = vector_db._collection
+    count = collection.count()
+    if count == 0 or count > int(fast_cfg.get("max_vectors", 50_000)):
+        return None
+
+    # Read before building: a write that lands mid-build leaves the snapshot one generation behind.
+    generation = collection_generation()
+    with _fast_lock:
+        if _fast_retriever is not None and _fast_generation == generation and len(_fast_retriever.index) == count:
+            return _fast_retriever
+        index_path = fast_index_path()
+        try:
+            index = NumpyVectorIndex.load(index_path)
+            if len(index) != count or index.info.get("generation") != generation:
+                index = None
+        except (FileNotFoundError, ValueError):
+            index = None
+        if index is None:
+            index = NumpyVectorIndex.from_chroma(collection, index_path, info={"generation": generation})
+        mode = fast_cfg.get("quantization", "none")
+        if mode and mode != "none":
+            from quantized_index import QuantizedVectorIndex
+
+            index = QuantizedVectorIndex.wrap(index, mode, int(fast_cfg.get("rescore_factor", 8)))
+        _fast_retriever = FastRetriever(index, vector_db.embeddings)
+        _fast_generation = generation
+        return _fast_retriever
+
+
+def get_retriever() -> Union[Chroma, Any]:
+    """Object exposing ``similarity_search``: the NumPy fast path when it applies, else Chroma."""
+    try:
+        fast = load_fast_retriever()
+    except Exception as e:
+        logger.warning("Fast retrieval path failed (%s); using Chroma.", e)
+        fast = None
+    return fast or load_vectordb()
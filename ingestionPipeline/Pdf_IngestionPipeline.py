@@ -3,15 +3,27 @@ PDF Ingestion Pipeline — production‑ready
 
 Adds:
 - Structured logging (JSON‑friendly) and timing
-- Redis caching for PDF text + chunking (idempotent via SHA‑256)
+- Redis caching for PDF text + chunking (idempotent via SHA‑256), shared with the UI
+  through `utils.cache_handler` (circuit breaker + local LRU fallback). Each document is
+  one compressed blob: text + chunk offsets (see `chunk_codec`)
 - Concurrency for multi‑PDF extraction
+- Zero‑copy inputs: paths go straight to pdfium, uploads/mmaps are passed as memoryviews,
+  and hashing streams in 1 MiB blocks
 - Robust config handling with sensible defaults
 - Deterministic document IDs + metadata
-- Batch adds to the vector DB with basic retry/backoff
+- Batch adds to the vector DB with basic retry/backoff; adds are keyed by `doc_id`, so a
+  retried batch or job overwrites what a failed attempt already stored
 - CLI entry point for local use
+- Near-duplicate chunks (boilerplate headers, footers, disclaimers) are dropped before
+  embedding via a persistent MinHash/LSH index (see `dedup`); its refs table records every
+  source that repeats a stored chunk, so `dedup.source_filter` finds a document's chunks
+- The single ingestion engine: the Streamlit upload path, this CLI, bulk_ingest and
+  workers all go through `get_ingestor()`; `utils.pdf_handler` only re-exports it
+- Optional hierarchical index: with `summary_index.enabled`, each embedded document
+  gets a background job that adds section and document summaries (see `summary_index`)
 
 Assumptions:
-- `vectordb_handler.load_vectordb()` returns a client with `.add_documents(list[Document])`
+- `vectordb_handler.load_vectordb()` returns a client with `.add_documents(list[Document], ids=...)`
 - `utils.load_config()` provides a dict, optional keys shown below
 - `utils.timeit` exists; we also add our own `@log_timed` to instrument internals
 
@@ -20,7 +32,10 @@ Optional config keys (examples):
   "pdf_text_splitter": {
     "chunk_size": 1000,
     "overlap": 100,
-    "separators": ["\n\n", "\n", " ", ""]
+    "separators": ["\n\n", "\n", " ", ""],
+    "engine": "native",          # native (offset-based, see text_chunker) | langchain
+    "length": "chars",           # chars | tokens (needs tiktoken)
+    "encoding": "cl100k_base"
   },
   "redis": {
     "enabled": true,
@@ -28,7 +43,16 @@ Optional config keys (examples):
     "port": 6379,
     "db": 0,
     "password": null,
-    "ttl_seconds": 604800
+    "ssl": false,
+    "ttl_seconds": 604800,
+    "socket_timeout": 0.5,
+    "health_check_interval": 5.0,
+    "local_max_bytes": 67108864
+  },
+  "dedup": {
+    "enabled": true,
+    "path": "./chatTracking/dedup_index.db",
+    "threshold": 0.85
   },
   "ingestion": {
     "max_workers": 4,
@@ -39,28 +63,36 @@ Optional config keys (examples):
 }
 """
 from __future__ import annotations
+import ctypes
 import hashlib
 import io
-import json
 import logging
+import mmap
 import os
 import sys
+import threading
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
-from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Sequence, Tuple
+from typing import Any, BinaryIO, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
 import pypdfium2
 from langchain.schema.document import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 
-try:
-    import redis  # type: ignore
-except Exception:  # pragma: no cover - optional dependency
-    redis = None
-
-from vectordb_handler import load_vectordb
+from vectordb_handler import invalidate_fast_retriever, load_vectordb
 from utils import load_config, timeit  # noqa: F401  (kept for backward compat)
+from utils.cache_handler import RedisCfg, ResilientCache, get_shared_cache
+from utils.metrics import (
+    CACHE_REQUESTS_TOTAL,
+    EMBEDDING_BATCH_SECONDS,
+    EMBEDDING_BATCH_SIZE,
+    INGEST_ITEMS_TOTAL,
+    INGEST_STAGE_SECONDS,
+)
+import chunk_codec
+import summary_index
+import text_chunker
+from dedup import DedupCfg, DedupIndex
 
 # -------------------------
 # Logging setup
@@ -82,15 +114,16 @@ logger = logging.getLogger(__name__)
 #  Copyright : © 2025 UjjwalS. All rights reserved.
 # ==================================================================
 def log_timed(fn):
-    """Simple timing decorator that logs duration in milliseconds."""
+    """Timing decorator: logs duration in milliseconds and records it as an ingestion stage."""
 
     def _wrap(*args, **kwargs):
         t0 = time.perf_counter()
         try:
             return fn(*args, **kwargs)
         finally:
-            dt_ms = (time.perf_counter() - t0) * 1000.0
-            logger.info("timing", extra={"fn": fn.__name__, "duration_ms": round(dt_ms, 2)})
+            dt = time.perf_counter() - t0
+            INGEST_STAGE_SECONDS.observe(dt, stage=fn.__name__)
+            logger.info("timing", extra={"fn": fn.__name__, "duration_ms": round(dt * 1000.0, 2)})
 
     return _wrap
 
@@ -103,16 +136,9 @@ class SplitterCfg:
     chunk_size: int = 1000
     overlap: int = 100
     separators: Optional[List[str]] = None
-
-
-@dataclass
-class RedisCfg:
-    enabled: bool = False
-    host: str = "localhost"
-    port: int = 6379
-    db: int = 0
-    password: Optional[str] = None
-    ttl_seconds: int = 7 * 24 * 3600
+    engine: str = "native"
+    length: str = "chars"
+    encoding: str = "cl100k_base"
 
 
 @dataclass
@@ -128,6 +154,7 @@ class AppCfg:
     splitter: SplitterCfg
     redis: RedisCfg
     ingestion: IngestionCfg
+    dedup: DedupCfg
 
     @staticmethod
     def from_dict(d: Dict[str, Any]) -> "AppCfg":
@@ -139,21 +166,18 @@ class AppCfg:
                 chunk_size=int(ps.get("chunk_size", 1000)),
                 overlap=int(ps.get("overlap", 100)),
                 separators=ps.get("separators"),
+                engine=str(ps.get("engine", "native")),
+                length=str(ps.get("length", "chars")),
+                encoding=str(ps.get("encoding", "cl100k_base")),
             ),
-            redis=RedisCfg(
-                enabled=bool(rc.get("enabled", False)),
-                host=str(rc.get("host", "localhost")),
-                port=int(rc.get("port", 6379)),
-                db=int(rc.get("db", 0)),
-                password=rc.get("password"),
-                ttl_seconds=int(rc.get("ttl_seconds", 7 * 24 * 3600)),
-            ),
+            redis=RedisCfg.from_dict(rc),
             ingestion=IngestionCfg(
                 max_workers=int(ic.get("max_workers", max(2, os.cpu_count() or 2))),
                 batch_size=int(ic.get("batch_size", 512)),
                 max_retries=int(ic.get("max_retries", 3)),
                 backoff_seconds=float(ic.get("backoff_seconds", 1.0)),
             ),
+            dedup=DedupCfg.from_dict(d.get("dedup")),
         )
 
 # ==================================================================
@@ -165,56 +189,86 @@ class AppCfg:
 # -------------------------
 # Redis helper
 # -------------------------
-class RedisCache:
-    def __init__(self, cfg: RedisCfg):
-        self.cfg = cfg
-        self.client = None
-        if cfg.enabled:
-            if redis is None:
-                logger.warning("Redis not installed, disabling caching.")
-            else:
-                try:
-                    self.client = redis.Redis(
-                        host=cfg.host, port=cfg.port, db=cfg.db, password=cfg.password, socket_timeout=5
-                    )
-                    # quick ping to confirm
-                    self.client.ping()
-                    logger.info("Redis cache enabled.")
-                except Exception as e:  # pragma: no cover
-                    logger.warning("Redis unavailable, caching disabled: %s", repr(e))
-                    self.client = None
-
-    def get(self, key: str) -> Optional[bytes]:
-        if not self.client:
-            return None
-        try:
-            return self.client.get(key)
-        except Exception as e:  # pragma: no cover
-            logger.warning("Redis GET failed: %s", repr(e))
-            return None
-
-    def set(self, key: str, value: bytes, ttl: Optional[int] = None) -> None:
-        if not self.client:
-            return
-        try:
-            self.client.set(key, value, ex=ttl or self.cfg.ttl_seconds)
-        except Exception as e:  # pragma: no cover
-            logger.warning("Redis SET failed: %s", repr(e))
+# The pipeline shares the UI's cache abstraction; the old name is kept for callers.
+RedisCache = ResilientCache
 
 
 # -------------------------
 # Core utilities
 # -------------------------
 
+HASH_BLOCK = 1024 * 1024
+
+# Anything the pipeline accepts as "a PDF": a filesystem path, raw bytes, a buffer
+# (bytearray/memoryview/mmap), or a file-like object such as Streamlit's UploadedFile.
+PdfInput = Union[str, "os.PathLike[str]", bytes, bytearray, memoryview, mmap.mmap, BinaryIO, io.BytesIO]
+# What extraction/hashing consume: a path (pdfium opens it itself) or a view over memory.
+PdfSource = Union[str, memoryview]
+# progress(stage, done, total) with stage in "extract" | "chunk" | "embed"; used by job_queue.
+ProgressFn = Callable[[str, int, int], None]
+
+
 def sha256_bytes(data: bytes) -> str:
     return hashlib.sha256(data).hexdigest()
 
 
+def as_pdf_source(handle: PdfInput) -> PdfSource:
+    """
+    Normalise an input without copying it: paths stay paths, in-memory buffers
+    become memoryviews (``BytesIO.getbuffer()`` for uploads), and real files are
+    memory-mapped copy-on-write so pdfium can read them in place.
+    """
+    if isinstance(handle, (str, os.PathLike)):
+        return os.fspath(handle)
+    if isinstance(handle, (bytes, bytearray, memoryview, mmap.mmap)):
+        return memoryview(handle)
+    if hasattr(handle, "getbuffer"):
+        return handle.getbuffer()
+    if hasattr(handle, "fileno"):
+        try:
+            return memoryview(mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_COPY))
+        except (OSError, ValueError, io.UnsupportedOperation):
+            pass
+    return memoryview(ensure_bytes(handle))
+
+
+def sha256_source(src: PdfSource) -> str:
+    """SHA‑256 computed incrementally in 1 MiB blocks; never materialises the whole file."""
+    h = hashlib.sha256()
+    if isinstance(src, str):
+        buf = bytearray(HASH_BLOCK)
+        view = memoryview(buf)
+        with open(src, "rb", buffering=0) as f:
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                h.update(view[:n])
+    else:
+        for start in range(0, len(src), HASH_BLOCK):
+            h.update(src[start : start + HASH_BLOCK])
+    return h.hexdigest()
+
+
+def source_size(src: PdfSource) -> int:
+    return os.path.getsize(src) if isinstance(src, str) else src.nbytes
+
+
+def _pdfium_input(src: PdfSource) -> Any:
+    """Hand pdfium the source without a copy whenever the buffer allows it."""
+    if isinstance(src, str):
+        return src
+    if isinstance(src.obj, bytes) and src.nbytes == len(src.obj):
+        return src.obj
+    if not src.readonly:
+        return (ctypes.c_char * src.nbytes).from_buffer(src)
+    return src.tobytes()  # read-only foreign buffer: the one case that still copies
+
+
 @log_timed
-def extract_text_from_pdf_bytes(pdf_bytes: bytes) -> str:
-    """Extract UTF‑8 text from a PDF byte string using pypdfium2."""
-    # pypdfium2 accepts various inputs, including file paths and binary buffers
-    with pypdfium2.PdfDocument(pdf_bytes) as pdf:
+def extract_text_from_pdf(src: PdfSource) -> str:
+    """Extract UTF‑8 text from a path or in-memory PDF using pypdfium2."""
+    with pypdfium2.PdfDocument(_pdfium_input(src)) as pdf:
         out: List[str] = []
         for page_number in range(len(pdf)):
             page = pdf.get_page(page_number)
@@ -223,7 +277,13 @@ def extract_text_from_pdf_bytes(pdf_bytes: bytes) -> str:
         return "\n".join(out)
 
 
+def extract_text_from_pdf_bytes(pdf_bytes: bytes) -> str:
+    """Backwards‑compatible name for :func:`extract_text_from_pdf`."""
+    return extract_text_from_pdf(as_pdf_source(pdf_bytes))
+
+
 def ensure_bytes(handle: BinaryIO | bytes | bytearray | io.BytesIO) -> bytes:
+    """Copying fallback for exotic file-likes; the pipeline itself uses :func:`as_pdf_source`."""
     if isinstance(handle, (bytes, bytearray)):
         return bytes(handle)
     if isinstance(handle, io.BytesIO):
@@ -249,13 +309,40 @@ def ensure_bytes(handle: BinaryIO | bytes | bytearray | io.BytesIO) -> bytes:
 
 
 class TextChunker:
+    """
+    ``engine: native`` computes chunk offsets in one pass (``text_chunker``) and returns a
+    lazy ChunkView whose spans go straight into the cache blob; ``engine: langchain``
+    keeps RecursiveCharacterTextSplitter. Both produce identical chunks.
+    """
+
     def __init__(self, cfg: SplitterCfg):
-        self.splitter = RecursiveCharacterTextSplitter(
-            chunk_size=cfg.chunk_size, chunk_overlap=cfg.overlap, separators=cfg.separators
+        length_function = None
+        length = cfg.length
+        if length == "tokens":
+            try:
+                length_function = text_chunker.tiktoken_length(cfg.encoding)
+            except ImportError:
+                logger.warning("tiktoken not installed; chunk sizes fall back to characters")
+                length = "chars"
+        self.native = cfg.engine != "langchain"
+        if self.native:
+            self.splitter = text_chunker.NativeChunker(cfg.chunk_size, cfg.overlap, cfg.separators, length_function)
+        else:
+            from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+            kwargs = {"length_function": length_function} if length_function is not None else {}
+            self.splitter = RecursiveCharacterTextSplitter(
+                chunk_size=cfg.chunk_size, chunk_overlap=cfg.overlap, separators=cfg.separators, **kwargs
+            )
+        # Cached chunk offsets are only valid for the settings that produced them.
+        self.fingerprint = chunk_codec.splitter_fingerprint(
+            cfg.chunk_size, cfg.overlap, cfg.separators, length, cfg.encoding if length == "tokens" else None
         )
 
     @log_timed
-    def split(self, text: str) -> List[str]:
+    def split(self, text: str) -> Sequence[str]:
+        if self.native:
+            return chunk_codec.ChunkView(text, self.splitter.spans(text))
         return self.splitter.split_text(text)
 
 
@@ -263,78 +350,74 @@ class TextChunker:
 # Ingestion pipeline
 # -------------------------
 class PDFIngestor:
-    def __init__(self, cfg: AppCfg):
+    def __init__(self, cfg: AppCfg, vdb: Optional[Any] = None):
         self.cfg = cfg
-        self.cache = RedisCache(cfg.redis)
+        self.cache = get_shared_cache(cfg.redis)
         self.chunker = TextChunker(cfg.splitter)
-        self.vdb = load_vectordb()
+        self.vdb = vdb if vdb is not None else load_vectordb()
+        self.dedup = DedupIndex(cfg.dedup) if cfg.dedup.enabled else None
+        self._dedup_lock = threading.Lock()
 
     # Cache keys
     @staticmethod
-    def _text_key(doc_hash: str) -> str:
-        return f"pdf:text:{doc_hash}"
+    def _doc_key(doc_hash: str) -> str:
+        return f"pdf:doc:{doc_hash}"
 
-    @staticmethod
-    def _chunks_key(doc_hash: str) -> str:
-        return f"pdf:chunks:{doc_hash}"
-
-    def _load_text_cached(self, doc_hash: str) -> Optional[str]:
-        raw = self.cache.get(self._text_key(doc_hash))
+    def _load_doc_cached(self, doc_hash: str, known_text: Optional[str] = None) -> Optional[chunk_codec.CachedDocument]:
+        raw = self.cache.get(self._doc_key(doc_hash))
         if raw is None:
             return None
-        try:
-            return raw.decode("utf-8")
-        except Exception:
-            return None
+        return chunk_codec.decode(raw, known_text)
 
-    def _store_text_cached(self, doc_hash: str, text: str) -> None:
-        self.cache.set(self._text_key(doc_hash), text.encode("utf-8"))
+    def _load_docs_cached(self, doc_hashes: Sequence[str]) -> List[Optional[chunk_codec.CachedDocument]]:
+        """Batch variant of ``_load_doc_cached``: one MGET for the whole batch."""
+        raws = self.cache.get_many([self._doc_key(h) for h in doc_hashes])
+        return [chunk_codec.decode(raw) if raw is not None else None for raw in raws]
 
-    def _load_chunks_cached(self, doc_hash: str) -> Optional[List[str]]:
-        raw = self.cache.get(self._chunks_key(doc_hash))
-        if raw is None:
-            return None
-        try:
-            return json.loads(raw.decode("utf-8"))
-        except Exception:
-            return None
+    def _encode_doc(self, text: str, chunks: Optional[Sequence[str]] = None) -> bytes:
+        if chunks is None:
+            return chunk_codec.encode(text)
+        return chunk_codec.encode_chunks(text, chunks, self.chunker.fingerprint)
 
-    def _store_chunks_cached(self, doc_hash: str, chunks: List[str]) -> None:
-        try:
-            payload = json.dumps(chunks).encode("utf-8")
-        except Exception:
-            # Fallback: join with unit‑separator if JSON fails (very unlikely)
-            payload = "\u001f".join(chunks).encode("utf-8")
-        self.cache.set(self._chunks_key(doc_hash), payload)
+    def _store_doc_cached(self, doc_hash: str, text: str, chunks: Optional[Sequence[str]] = None) -> None:
+        self.cache.set(self._doc_key(doc_hash), self._encode_doc(text, chunks))
 
     @log_timed
-    def extract_text(self, item: BinaryIO | bytes | bytearray | io.BytesIO) -> Tuple[str, str]:
+    def extract_text(self, item: PdfInput) -> Tuple[str, str]:
         """Return (doc_hash, text). Uses cache when enabled."""
-        b = ensure_bytes(item)
-        doc_hash = sha256_bytes(b)
-        cached = self._load_text_cached(doc_hash)
+        src = as_pdf_source(item)
+        doc_hash = sha256_source(src)
+        cached = self._load_doc_cached(doc_hash)
         if cached is not None:
+            CACHE_REQUESTS_TOTAL.inc(cache="pdf_text", result="hit")
             logger.info("cache_hit", extra={"stage": "text", "doc_hash": doc_hash})
-            return doc_hash, cached
-        text = extract_text_from_pdf_bytes(b)
-        self._store_text_cached(doc_hash, text)
-        logger.info("cache_store", extra={"stage": "text", "doc_hash": doc_hash, "bytes": len(b)})
+            return doc_hash, cached.text
+        CACHE_REQUESTS_TOTAL.inc(cache="pdf_text", result="miss")
+        text = extract_text_from_pdf(src)
+        self._store_doc_cached(doc_hash, text)
+        logger.info("cache_store", extra={"stage": "text", "doc_hash": doc_hash, "bytes": source_size(src)})
         return doc_hash, text
 
     @log_timed
-    def chunk_text(self, doc_hash: str, text: str) -> List[str]:
-        cached = self._load_chunks_cached(doc_hash)
-        if cached is not None:
-            logger.info("cache_hit", extra={"stage": "chunks", "doc_hash": doc_hash, "count": len(cached)})
-            return cached
+    def chunk_text(self, doc_hash: str, text: str) -> Sequence[str]:
+        """Return chunks for ``text``; cache hits are lazy views sliced from ``text`` itself."""
+        cached = self._load_doc_cached(doc_hash, known_text=text)
+        chunks = cached.chunks(self.chunker.fingerprint) if cached is not None else None
+        if chunks is not None:
+            CACHE_REQUESTS_TOTAL.inc(cache="pdf_chunks", result="hit")
+            logger.info("cache_hit", extra={"stage": "chunks", "doc_hash": doc_hash, "count": len(chunks)})
+            return chunks
+        CACHE_REQUESTS_TOTAL.inc(cache="pdf_chunks", result="miss")
         chunks = self.chunker.split(text)
-        self._store_chunks_cached(doc_hash, chunks)
+        # Overwrites the text-only entry: text and chunk offsets share one compressed blob.
+        self._store_doc_cached(doc_hash, text, chunks)
         logger.info("cache_store", extra={"stage": "chunks", "doc_hash": doc_hash, "count": len(chunks)})
         return chunks
 
     def _make_documents(self, doc_hash: str, chunks: Sequence[str]) -> List[Document]:
         # Deterministic document IDs: doc_hash + chunk index
         docs: List[Document] = []
+        ingested_at = time.time()  # read by index_maintenance's TTL expiry
         for i, chunk in enumerate(chunks):
             docs.append(
                 Document(
@@ -344,6 +427,8 @@ class PDFIngestor:
                         "source_hash": doc_hash,
                         "chunk_index": i,
                         "num_chunks": len(chunks),
+                        "level": summary_index.CHUNK,
+                        "ingested_at": ingested_at,
                     },
                 )
             )
@@ -354,7 +439,7 @@ class PDFIngestor:
         time.sleep(base * (2 ** (attempt - 1)))
 
     @log_timed
-    def add_documents(self, documents: List[Document]) -> None:
+    def add_documents(self, documents: List[Document], progress: Optional[ProgressFn] = None) -> None:
         if not documents:
             return
         batch_size = max(1, self.cfg.ingestion.batch_size)
@@ -365,8 +450,12 @@ class PDFIngestor:
             while True:
                 attempt += 1
                 try:
-                    self.vdb.add_documents(batch)
+                    with EMBEDDING_BATCH_SECONDS.time(kind="ingest"):
+                        self.vdb.add_documents(batch, ids=[d.metadata["doc_id"] for d in batch])
+                    EMBEDDING_BATCH_SIZE.observe(len(batch), kind="ingest")
                     logger.info("vdb_add_ok", extra={"batch": len(batch), "offset": i})
+                    if progress is not None:
+                        progress("embed", i + len(batch), len(documents))
                     break
                 except Exception as e:
                     logger.warning(
@@ -375,33 +464,99 @@ class PDFIngestor:
                     if attempt > max_retries:
                         raise
                     self._backoff_sleep(attempt)
+        invalidate_fast_retriever()
 
     @log_timed
-    def ingest_many(self, pdf_items: Sequence[BinaryIO | bytes | bytearray | io.BytesIO]) -> int:
-        """High‑level API: extract + chunk + add to vector DB. Returns document count."""
+    def ingest_many(
+        self,
+        pdf_items: Sequence[PdfInput],
+        progress: Optional[ProgressFn] = None,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> int:
+        """
+        High‑level API: extract + chunk + add to vector DB. Returns document count.
+        ``labels`` (doc_hash -> filename) name the follow-up summarize jobs, if enabled.
+        """
         if not pdf_items:
             logger.info("no_input")
             return 0
 
         max_workers = max(1, self.cfg.ingestion.max_workers)
-        results: List[Tuple[str, str]] = []
 
-        # 1) Extract text concurrently per PDF
+        # 1) Hash every input and resolve all cache hits for the batch in one round-trip
+        payloads: Dict[str, PdfSource] = {}
+        for item in pdf_items:
+            src = as_pdf_source(item)
+            payloads.setdefault(sha256_source(src), src)
+        doc_hashes = list(payloads)
+        chunked: Dict[str, Sequence[str]] = {}
+        texts: Dict[str, str] = {}
+        misses: List[str] = []
+        for doc_hash, cached in zip(doc_hashes, self._load_docs_cached(doc_hashes)):
+            chunks = cached.chunks(self.chunker.fingerprint) if cached is not None else None
+            if chunks is not None:
+                chunked[doc_hash] = chunks
+            elif cached is not None:
+                texts[doc_hash] = cached.text
+            else:
+                misses.append(doc_hash)
+        logger.info(
+            "cache_lookup",
+            extra={"pdfs": len(doc_hashes), "chunk_hits": len(chunked), "text_hits": len(texts), "misses": len(misses)},
+        )
+        CACHE_REQUESTS_TOTAL.inc(len(chunked), cache="pdf_doc", result="hit")
+        CACHE_REQUESTS_TOTAL.inc(len(texts), cache="pdf_doc", result="partial")
+        CACHE_REQUESTS_TOTAL.inc(len(misses), cache="pdf_doc", result="miss")
+
+        # 2) Extract text concurrently, only for PDFs the cache knew nothing about
         with ThreadPoolExecutor(max_workers=max_workers) as ex:
-            futures = {ex.submit(self.extract_text, item): item for item in pdf_items}
-            for fut in as_completed(futures):
-                doc_hash, text = fut.result()
-                results.append((doc_hash, text))
+            futures = {ex.submit(extract_text_from_pdf, payloads[h]): h for h in misses}
+            for done, fut in enumerate(as_completed(futures), start=1):
+                texts[futures[fut]] = fut.result()
+                INGEST_ITEMS_TOTAL.inc(stage="extract", unit="pdfs")
+                INGEST_ITEMS_TOTAL.inc(source_size(payloads[futures[fut]]), stage="extract", unit="bytes")
+                if progress is not None:
+                    progress("extract", done, len(misses))
+
+        # 3) Chunk the rest and write every new entry back in one pipelined round-trip
+        to_store: Dict[str, bytes] = {}
+        for doc_hash, text in texts.items():
+            chunks = self.chunker.split(text)
+            chunked[doc_hash] = chunks
+            INGEST_ITEMS_TOTAL.inc(len(chunks), stage="chunk", unit="chunks")
+            to_store[self._doc_key(doc_hash)] = self._encode_doc(text, chunks)
+        self.cache.set_many(to_store)
+        if progress is not None:
+            progress("chunk", len(doc_hashes), len(doc_hashes))
 
-        # 2) Chunk + build docs (sequential; usually fast vs extraction)
         all_docs: List[Document] = []
-        for doc_hash, text in results:
-            chunks = self.chunk_text(doc_hash, text)
-            all_docs.extend(self._make_documents(doc_hash, chunks))
-
-        # 3) Add to vector DB in batches with retry
-        self.add_documents(all_docs)
-        logger.info("ingestion_done", extra={"docs": len(all_docs), "pdfs": len(results)})
+        for doc_hash in doc_hashes:
+            all_docs.extend(self._make_documents(doc_hash, chunked[doc_hash]))
+
+        # 4) Drop near-duplicates, add the rest to the vector DB in batches with retry
+        if self.dedup is None:
+            self.add_documents(all_docs, progress)
+            unique = len(all_docs)
+        else:
+            # Staged LSH entries are per-index state: one ingest at a time decides and commits.
+            with self._dedup_lock:
+                keep, dups = self.dedup.partition(all_docs)
+                try:
+                    self.add_documents(keep, progress)
+                except Exception:
+                    self.dedup.rollback()
+                    raise
+                self.dedup.commit()
+            unique = len(keep)
+            logger.info(
+                "dedup",
+                extra={"chunks": len(all_docs), "duplicates": len(dups), "ratio": round(len(dups) / max(1, len(all_docs)), 4)},
+            )
+        paths = {h: os.path.basename(src) for h, src in payloads.items() if isinstance(src, str)}
+        summary_index.schedule(doc_hashes, {**paths, **(labels or {})})
+        INGEST_ITEMS_TOTAL.inc(unique, stage="embed", unit="chunks")
+        INGEST_ITEMS_TOTAL.inc(len(all_docs) - unique, stage="dedup", unit="chunks")
+        logger.info("ingestion_done", extra={"docs": len(all_docs), "embedded": unique, "pdfs": len(doc_hashes)})
         return len(all_docs)
 
 # ==================================================================
@@ -413,15 +568,25 @@ class PDFIngestor:
 # -------------------------
 # Public functional API — backwards compatible names
 # -------------------------
-_cfg = AppCfg.from_dict(load_config())
-_ingestor = PDFIngestor(_cfg)
+_ingestor: Optional[PDFIngestor] = None
+_ingestor_lock = threading.Lock()
+
 
+def get_ingestor() -> PDFIngestor:
+    """Process-wide ingestor, built on first use (the splitter and vector DB client are reused)."""
+    global _ingestor
+    if _ingestor is None:
+        with _ingestor_lock:
+            if _ingestor is None:
+                _ingestor = PDFIngestor(AppCfg.from_dict(load_config()))
+    return _ingestor
 
-def get_pdf_texts(pdfs_bytes_list: Sequence[BinaryIO | bytes | bytearray | io.BytesIO]) -> List[str]:
+
+def get_pdf_texts(pdfs_bytes_list: Sequence[PdfInput]) -> List[str]:
     """Backwards‑compatible wrapper: returns a list of extracted texts."""
     out: List[str] = []
     for item in pdfs_bytes_list:
-        _, text = _ingestor.extract_text(item)
+        _, text = get_ingestor().extract_text(item)
         out.append(text)
     return out
 
@@ -430,23 +595,24 @@ def get_text_chunks(text: str) -> List[str]:
     """Backwards‑compatible wrapper: chunk a single text string using configured splitter."""
     # Use a per‑text pseudo hash to allow chunk caching even when called directly
     doc_hash = sha256_bytes(text.encode("utf-8"))
-    return _ingestor.chunk_text(doc_hash, text)
+    return list(get_ingestor().chunk_text(doc_hash, text))
 
 
 def get_document_chunks(text_list: Sequence[str]) -> List[Document]:
     """Backwards‑compatible wrapper: convert texts to Document chunks with metadata."""
+    ingestor = get_ingestor()
     docs: List[Document] = []
     for text in text_list:
         h = sha256_bytes(text.encode("utf-8"))
-        chunks = _ingestor.chunk_text(h, text)
-        docs.extend(_ingestor._make_documents(h, chunks))
+        chunks = ingestor.chunk_text(h, text)
+        docs.extend(ingestor._make_documents(h, chunks))
     return docs
 
 
 @log_timed
-def add_documents_to_db(pdfs_bytes: Sequence[BinaryIO | bytes | bytearray | io.BytesIO]) -> int:
+def add_documents_to_db(pdfs_bytes: Sequence[PdfInput]) -> int:
     """Backwards‑compatible wrapper: ingest and push to DB. Returns number of Document chunks added."""
-    return _ingestor.ingest_many(pdfs_bytes)
+    return get_ingestor().ingest_many(pdfs_bytes)
 
 
 # -------------------------
@@ -454,7 +620,11 @@ def add_documents_to_db(pdfs_bytes: Sequence[BinaryIO | bytes | bytearray | io.B
 # -------------------------
 CLI_HELP = """
 Usage:
-  python pdf_ingestion_plus.py file1.pdf [file2.pdf ...]
+  python Pdf_IngestionPipeline.py file1.pdf [file2.pdf ...]
+  python Pdf_IngestionPipeline.py DIR_OR_ARCHIVE [...]   # delegates to bulk_ingest.py
+
+  For large corpora use bulk_ingest.py directly: lazy directory/zip/tar walking,
+  bounded memory, a resumable SQLite checkpoint, throughput and ETA.
 
 Environment:
   LOG_LEVEL=INFO|DEBUG|WARNING|ERROR (default INFO)
@@ -470,11 +640,12 @@ def _cli(argv: Sequence[str]) -> int:
         print(CLI_HELP)
         return 0
     filepaths = argv[1:]
-    pdf_items: List[bytes] = []
-    for fp in filepaths:
-        with open(fp, "rb") as f:
-            pdf_items.append(f.read())
-    count = add_documents_to_db(pdf_items)
+    if any(not fp.lower().endswith(".pdf") or os.path.isdir(fp) for fp in filepaths):
+        import bulk_ingest
+
+        return bulk_ingest.main(filepaths)
+    # Paths go straight to pdfium: nothing is read into Python memory up front.
+    count = add_documents_to_db(filepaths)
     print(f"✅ Added {count} document chunks to the vector DB from {len(filepaths)} file(s).")
     return 0
 
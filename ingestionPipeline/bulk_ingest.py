@@ -0,0 +1,362 @@
+"""
+Bulk offline ingestion — directories and archives, resumable.
+
+    python bulk_ingest.py /data/manuals /data/batch-07.zip /data/scans.tar.gz
+    python bulk_ingest.py --checkpoint ingest.db --batch-files 32 --batch-mb 128 /data/manuals
+
+- Walks directories and zip/tar(.gz/.bz2/.xz) archives lazily; only the files of the
+  current window (plus the one that closes it) are ever held in memory
+  (``--batch-files`` / ``--batch-mb``).
+- Every file's outcome is recorded in a SQLite checkpoint keyed by its source id
+  (path, or ``archive!member``) plus size/mtime (and CRC-32 for zip members), so a
+  rerun skips finished files without decompressing them and retries failed ones. Identical content under another name is skipped by SHA-256.
+- A failing window is retried file by file so one corrupt PDF can't sink its batch.
+- Plain files are handed to the pipeline as paths (pdfium maps them itself) and hashed
+  in 1 MiB blocks, so they are never copied into Python memory.
+- Progress lines report files, MB/s and an ETA whenever the total is known up front.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import logging
+import os
+import sqlite3
+import sys
+import tarfile
+import time
+import zipfile
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional, Sequence, Union
+
+logger = logging.getLogger(__name__)
+
+ZIP_SUFFIXES = (".zip",)
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+HASH_BLOCK = 1024 * 1024
+
+# A file path (plain PDFs) or the bytes of an archive member.
+Payload = Union[str, bytes]
+
+
+# -------------------------
+# Sources
+# -------------------------
+@dataclass
+class PdfSource:
+    source_id: str
+    size: int
+    mtime: float
+    read: Callable[[], Payload]
+    crc: Optional[int] = None  # CRC-32 of zip members: a rewrite with the same size and mtime still reruns
+
+
+# Checkpoint lookup, asked before a member's bytes are read.
+Skip = Callable[[PdfSource], bool]
+
+
+def _never(src: PdfSource) -> bool:
+    return False
+
+
+def _is_pdf(name: str) -> bool:
+    return name.lower().endswith(".pdf")
+
+
+def _unread() -> Payload:
+    raise RuntimeError("archive member was skipped and never read")
+
+
+def _iter_zip(path: str, skip: Skip) -> Iterator[PdfSource]:
+    with zipfile.ZipFile(path) as zf:
+        for info in zf.infolist():
+            if info.is_dir() or not _is_pdf(info.filename):
+                continue
+            mtime = time.mktime(info.date_time + (0, 0, -1))
+            src = PdfSource(f"{path}!{info.filename}", info.file_size, mtime, _unread, crc=info.CRC)
+            if skip(src):
+                continue
+            # Pending members are read as they are reached: a window may outlive the open archive.
+            data = zf.read(info)
+            src.read = lambda d=data: d
+            yield src
+
+
+def _iter_tar(path: str, skip: Skip) -> Iterator[PdfSource]:
+    # Stream mode ("r|*") never seeks, so compressed tarballs are read exactly once.
+    with tarfile.open(path, mode="r|*") as tf:
+        for member in tf:
+            if not member.isfile() or not _is_pdf(member.name):
+                continue
+            src = PdfSource(f"{path}!{member.name}", member.size, float(member.mtime), _unread)
+            if skip(src):
+                continue  # the stream passes over the member without extracting it
+            data = tf.extractfile(member).read()  # must be consumed before advancing the stream
+            src.read = lambda d=data: d
+            yield src
+
+
+def _iter_file(path: str, skip: Skip) -> Iterator[PdfSource]:
+    st = os.stat(path)
+    src = PdfSource(path, st.st_size, st.st_mtime, lambda p=path: p)
+    if not skip(src):
+        yield src
+
+
+def _iter_path(path: str, skip: Skip) -> Iterator[PdfSource]:
+    lower = path.lower()
+    if lower.endswith(ZIP_SUFFIXES):
+        yield from _iter_zip(path, skip)
+    elif lower.endswith(TAR_SUFFIXES):
+        yield from _iter_tar(path, skip)
+    elif _is_pdf(path):
+        yield from _iter_file(path, skip)
+
+
+def iter_sources(paths: Sequence[str], skip: Skip = _never) -> Iterator[PdfSource]:
+    """
+    Lazily yield every PDF under ``paths`` (files, directories, zip/tar archives).
+    ``skip`` sees each source's identity (id, size, mtime, zip CRC) before any archive
+    member is read; members it accepts are never decompressed.
+    """
+    for root in paths:
+        if os.path.isdir(root):
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    yield from _iter_path(os.path.join(dirpath, name), skip)
+        else:
+            yield from _iter_path(root, skip)
+
+
+def count_sources(paths: Sequence[str]) -> Optional[int]:
+    """Cheap up-front count for the ETA; None when a tar archive would need a full read."""
+    total = 0
+    for root in paths:
+        candidates = (
+            (os.path.join(d, n) for d, _, names in os.walk(root) for n in names) if os.path.isdir(root) else [root]
+        )
+        for path in candidates:
+            lower = path.lower()
+            if lower.endswith(TAR_SUFFIXES):
+                return None
+            if lower.endswith(ZIP_SUFFIXES):
+                with zipfile.ZipFile(path) as zf:
+                    total += sum(1 for i in zf.infolist() if not i.is_dir() and _is_pdf(i.filename))
+            elif _is_pdf(path):
+                total += 1
+    return total
+
+
+def _sha256(payload: Payload) -> str:
+    if isinstance(payload, bytes):
+        return hashlib.sha256(payload).hexdigest()
+    h = hashlib.sha256()
+    buf = bytearray(HASH_BLOCK)
+    view = memoryview(buf)
+    with open(payload, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+    return h.hexdigest()
+
+
+# -------------------------
+# Checkpoint
+# -------------------------
+class Checkpoint:
+    """Per-file completion log in SQLite; safe to kill at any point."""
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                source_id TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                doc_hash TEXT,
+                status TEXT NOT NULL,
+                chunks INTEGER,
+                error TEXT,
+                updated_at REAL NOT NULL,
+                crc INTEGER
+            )
+            """
+        )
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(files)")}
+        if "crc" not in columns:  # checkpoints written before zip members were keyed by CRC
+            self.conn.execute("ALTER TABLE files ADD COLUMN crc INTEGER")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_files_hash ON files(doc_hash, status)")
+        self.conn.commit()
+
+    def is_done(self, src: PdfSource) -> bool:
+        row = self.conn.execute(
+            "SELECT size, mtime, status, crc FROM files WHERE source_id = ?", (src.source_id,)
+        ).fetchone()
+        return (
+            row is not None
+            and row[2] in ("done", "duplicate")
+            and row[0] == src.size
+            and row[1] == src.mtime
+            and row[3] == src.crc
+        )
+
+    def hash_done(self, doc_hash: str) -> bool:
+        row = self.conn.execute(
+            "SELECT 1 FROM files WHERE doc_hash = ? AND status = 'done' LIMIT 1", (doc_hash,)
+        ).fetchone()
+        return row is not None
+
+    def record(self, src: PdfSource, doc_hash: Optional[str], status: str, chunks: Optional[int] = None, error: Optional[str] = None) -> None:
+        self.conn.execute(
+            """
+            INSERT OR REPLACE INTO files (source_id, size, mtime, doc_hash, status, chunks, error, updated_at, crc)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (src.source_id, src.size, src.mtime, doc_hash, status, chunks, error, time.time(), src.crc),
+        )
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def summary(self) -> dict:
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM files GROUP BY status").fetchall())
+
+
+# -------------------------
+# Progress
+# -------------------------
+class Progress:
+    def __init__(self, total: Optional[int], every: float = 5.0):
+        self.total = total
+        self.every = every
+        self.start = time.perf_counter()
+        self.last = 0.0
+        self.files = 0
+        self.skipped = 0
+        self.bytes = 0
+        self.chunks = 0
+
+    def update(self, files: int = 0, skipped: int = 0, nbytes: int = 0, chunks: int = 0, force: bool = False) -> None:
+        self.files += files
+        self.skipped += skipped
+        self.bytes += nbytes
+        self.chunks += chunks
+        now = time.perf_counter()
+        if force or now - self.last >= self.every:
+            self.last = now
+            print(self.line(), flush=True)
+
+    def line(self) -> str:
+        elapsed = max(1e-6, time.perf_counter() - self.start)
+        rate = self.files / elapsed
+        seen = self.files + self.skipped
+        line = (
+            f"[{seen}{'/' + str(self.total) if self.total is not None else ''}] "
+            f"ingested={self.files} skipped={self.skipped} chunks={self.chunks} "
+            f"{self.bytes / 1048576 / elapsed:.2f} MB/s {rate:.2f} files/s"
+        )
+        if self.total is not None and rate > 0:
+            eta = (self.total - seen) / rate
+            line += f" ETA {time.strftime('%H:%M:%S', time.gmtime(max(0.0, eta)))}"
+        return line
+
+
+# -------------------------
+# Driver
+# -------------------------
+def _windows(sources: Iterator[PdfSource], max_files: int, max_bytes: int) -> Iterator[List[PdfSource]]:
+    window: List[PdfSource] = []
+    size = 0
+    for src in sources:
+        if window and (len(window) >= max_files or size + src.size > max_bytes):
+            yield window
+            window, size = [], 0
+        window.append(src)
+        size += src.size
+    if window:
+        yield window
+
+
+def run(
+    paths: Sequence[str],
+    checkpoint_path: str,
+    batch_files: int = 16,
+    batch_mb: int = 128,
+    count: bool = True,
+    ingest: Optional[Callable[[List[Payload]], int]] = None,
+) -> dict:
+    if ingest is None:
+        from Pdf_IngestionPipeline import add_documents_to_db as ingest
+
+    ckpt = Checkpoint(checkpoint_path)
+    progress = Progress(count_sources(paths) if count else None)
+
+    def _done(src: PdfSource) -> bool:
+        if ckpt.is_done(src):
+            progress.update(skipped=1)
+            return True
+        return False
+
+    for window in _windows(iter_sources(paths, skip=_done), batch_files, batch_mb * 1024 * 1024):
+        payloads: List[Payload] = []
+        fresh: List[PdfSource] = []
+        hashes: List[str] = []
+        for src in window:
+            try:
+                data = src.read()
+                doc_hash = _sha256(data)
+            except Exception as e:
+                ckpt.record(src, None, "failed", error=f"read: {e!r}")
+                continue
+            if ckpt.hash_done(doc_hash) or doc_hash in hashes:
+                ckpt.record(src, doc_hash, "duplicate", chunks=0)
+                progress.update(skipped=1)
+                continue
+            payloads.append(data)
+            fresh.append(src)
+            hashes.append(doc_hash)
+
+        if payloads:
+            try:
+                chunks = ingest(payloads)
+                for src, doc_hash in zip(fresh, hashes):
+                    ckpt.record(src, doc_hash, "done")
+                progress.update(files=len(fresh), nbytes=sum(src.size for src in fresh), chunks=chunks)
+            except Exception as e:
+                logger.warning("Window of %d files failed (%r); retrying one by one", len(fresh), e)
+                for src, doc_hash, data in zip(fresh, hashes, payloads):
+                    try:
+                        n = ingest([data])
+                        ckpt.record(src, doc_hash, "done", chunks=n)
+                        progress.update(files=1, nbytes=src.size, chunks=n)
+                    except Exception as e1:
+                        logger.error("Failed to ingest %s: %r", src.source_id, e1)
+                        ckpt.record(src, doc_hash, "failed", error=repr(e1))
+        del payloads
+        ckpt.commit()
+
+    progress.update(force=True)
+    return ckpt.summary()
+
+
+def main(argv: Sequence[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("paths", nargs="+", help="PDF files, directories, or zip/tar archives")
+    ap.add_argument("--checkpoint", default="bulk_ingest_checkpoint.db", help="SQLite checkpoint file")
+    ap.add_argument("--batch-files", type=int, default=16, help="max files per ingestion window")
+    ap.add_argument("--batch-mb", type=int, default=128, help="max input MB per ingestion window")
+    ap.add_argument("--no-count", action="store_true", help="skip the up-front count (no ETA)")
+    args = ap.parse_args(argv)
+
+    summary = run(args.paths, args.checkpoint, args.batch_files, args.batch_mb, count=not args.no_count)
+    print("✅ Bulk ingestion finished: " + ", ".join(f"{k}={v}" for k, v in sorted(summary.items())))
+    return 1 if summary.get("failed") else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,250 @@
+"""
+Compact cache format for an extracted PDF and its chunks.
+
+One Redis value per document instead of a text key plus a JSON chunk list:
+
+    header  <4s B B H I I I>   magic, version, codec, reserved, fingerprint, text_len, n_spans
+    spans   <I> + n_spans*2*<I> byte length, then (start, end) pairs as little-endian uint32
+    payload compressed UTF-8 of ``text + extras``
+
+Chunk boundaries are character offsets into the decompressed text. A chunk that
+is not a verbatim substring of the text (rare; splitters strip whitespace but do
+not rewrite) is appended after the text as an "extra" and addressed the same way.
+``n_spans == NO_CHUNKS`` marks a text-only entry. ``fingerprint`` identifies the
+splitter settings the spans were produced with, so a config change reads as a
+chunk miss while the text is still reused.
+
+Compression uses zstd or lz4 when installed and falls back to zlib.
+"""
+from __future__ import annotations
+
+import struct
+import sys
+import zlib
+from array import array
+from typing import Iterator, Optional, Sequence, Tuple, overload
+
+try:
+    import zstandard  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    lz4_frame = None
+
+MAGIC = b"NXC1"
+VERSION = 1
+NO_CHUNKS = 0xFFFFFFFF
+HEADER = struct.Struct("<4sBBHIII")
+SPAN_LEN = struct.Struct("<I")
+
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODEC_LZ4 = 3
+
+
+def default_codec() -> int:
+    if zstandard is not None:
+        return CODEC_ZSTD
+    if lz4_frame is not None:
+        return CODEC_LZ4
+    return CODEC_ZLIB
+
+
+def _compress(codec: int, data: bytes) -> bytes:
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    if codec == CODEC_LZ4:
+        return lz4_frame.compress(data)
+    return zlib.compress(data, 6)
+
+
+def _codec_available(codec: int) -> bool:
+    if codec == CODEC_ZSTD:
+        return zstandard is not None
+    if codec == CODEC_LZ4:
+        return lz4_frame is not None
+    return codec == CODEC_ZLIB
+
+
+def _decompress(codec: int, data: bytes | memoryview) -> bytes:
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == CODEC_LZ4:
+        return lz4_frame.decompress(data)
+    return zlib.decompress(data)
+
+
+def _spans_to_bytes(spans: array) -> bytes:
+    if sys.byteorder != "little":  # pragma: no cover
+        spans = array("I", spans)
+        spans.byteswap()
+    return spans.tobytes()
+
+
+def _spans_from_bytes(raw: bytes | memoryview) -> array:
+    spans = array("I")
+    spans.frombytes(raw)
+    if sys.byteorder != "little":  # pragma: no cover
+        spans.byteswap()
+    return spans
+
+
+def splitter_fingerprint(*parts: object) -> int:
+    """Stable 32-bit id for the splitter settings that produced a set of spans."""
+    return zlib.crc32(repr(parts).encode("utf-8"))
+
+
+def locate_spans(text: str, chunks: Sequence[str]) -> Tuple[array, str]:
+    """
+    Map chunks to (start, end) offsets into ``text``.
+
+    Chunks are searched forward from the previous chunk's start so overlapping
+    chunks resolve in order. Returns the flat span array and the "extras" string
+    holding any chunk that could not be found verbatim.
+    """
+    spans = array("I")
+    extras = []
+    extras_len = 0
+    cursor = 0
+    for chunk in chunks:
+        pos = text.find(chunk, cursor)
+        if pos < 0:
+            pos = text.find(chunk)
+        if pos >= 0:
+            spans.extend((pos, pos + len(chunk)))
+            cursor = pos
+        else:
+            start = len(text) + extras_len
+            extras.append(chunk)
+            extras_len += len(chunk)
+            spans.extend((start, start + len(chunk)))
+    return spans, "".join(extras)
+
+
+def encode(
+    text: str,
+    spans: Optional[array] = None,
+    extras: str = "",
+    fingerprint: int = 0,
+    codec: Optional[int] = None,
+) -> bytes:
+    """Serialise ``text`` (+ optional flat span array) into a single blob."""
+    codec = codec or default_codec()
+    n_spans = NO_CHUNKS if spans is None else len(spans) // 2
+    span_bytes = b"" if spans is None else _spans_to_bytes(spans)
+    payload = _compress(codec, (text + extras).encode("utf-8"))
+    return b"".join(
+        (
+            HEADER.pack(MAGIC, VERSION, codec, 0, fingerprint, len(text), n_spans),
+            SPAN_LEN.pack(len(span_bytes)),
+            span_bytes,
+            payload,
+        )
+    )
+
+
+def encode_chunks(text: str, chunks: Sequence[str], fingerprint: int = 0, codec: Optional[int] = None) -> bytes:
+    if isinstance(chunks, ChunkView) and chunks._buffer is text:
+        # Offsets already known (native chunker): no substring search needed.
+        return encode(text, chunks._spans, "", fingerprint, codec)
+    spans, extras = locate_spans(text, chunks)
+    return encode(text, spans, extras, fingerprint, codec)
+
+
+class ChunkView(Sequence[str]):
+    """Read-only sequence that slices chunks out of the document text on access."""
+
+    __slots__ = ("_buffer", "_spans")
+
+    def __init__(self, buffer: str, spans: array):
+        self._buffer = buffer
+        self._spans = spans
+
+    def __len__(self) -> int:
+        return len(self._spans) // 2
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("chunk index out of range")
+        return self._buffer[self._spans[2 * index] : self._spans[2 * index + 1]]
+
+    def __iter__(self) -> Iterator[str]:
+        buf, spans = self._buffer, self._spans
+        for i in range(0, len(spans), 2):
+            yield buf[spans[i] : spans[i + 1]]
+
+
+class CachedDocument:
+    """
+    Parsed view of a cache blob. Only the header and span table are read up
+    front; the payload is decompressed on first access to ``text``/``chunks``,
+    and not at all when the caller already has the text.
+    """
+
+    def __init__(self, raw: bytes, known_text: Optional[str] = None):
+        view = memoryview(raw)
+        if len(view) < HEADER.size + SPAN_LEN.size:
+            raise ValueError("truncated cache entry")
+        magic, version, codec, _, fingerprint, text_len, n_spans = HEADER.unpack_from(view, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a chunk cache entry")
+        if not _codec_available(codec):
+            raise ValueError(f"cache entry uses codec {codec}, which is not installed")
+        (span_bytes,) = SPAN_LEN.unpack_from(view, HEADER.size)
+        offset = HEADER.size + SPAN_LEN.size
+        self.codec = codec
+        self.fingerprint = fingerprint
+        self.text_len = text_len
+        self._spans = None if n_spans == NO_CHUNKS else _spans_from_bytes(view[offset : offset + span_bytes])
+        self._payload = view[offset + span_bytes :]
+        self._buffer: Optional[str] = None
+        # Reuse caller-supplied text when there are no extras to append to it.
+        if known_text is not None and len(known_text) == text_len and not self._has_extras():
+            self._buffer = known_text
+
+    def _has_extras(self) -> bool:
+        return bool(self._spans) and max(self._spans[1::2]) > self.text_len
+
+    def _decoded(self) -> str:
+        if self._buffer is None:
+            self._buffer = _decompress(self.codec, self._payload).decode("utf-8")
+        return self._buffer
+
+    @property
+    def has_chunks(self) -> bool:
+        return self._spans is not None
+
+    @property
+    def text(self) -> str:
+        buf = self._decoded()
+        return buf if len(buf) == self.text_len else buf[: self.text_len]
+
+    def chunks(self, fingerprint: Optional[int] = None) -> Optional[ChunkView]:
+        """Chunks as a lazy view, or None if absent or produced by a different splitter."""
+        if self._spans is None:
+            return None
+        if fingerprint is not None and fingerprint != self.fingerprint:
+            return None
+        return ChunkView(self._decoded(), self._spans)
+
+
+def decode(raw: bytes, known_text: Optional[str] = None) -> Optional[CachedDocument]:
+    """Parse a blob written by :func:`encode`; returns None for anything unreadable."""
+    try:
+        return CachedDocument(raw, known_text)
+    except (ValueError, struct.error):
+        return None
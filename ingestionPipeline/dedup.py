@@ -0,0 +1,342 @@
+"""
+Near-duplicate chunk detection across the whole collection (MinHash + LSH).
+
+Headers, footers, disclaimers and tables of contents repeat across PDFs. Each chunk
+gets a MinHash signature over its word shingles. Signatures are banded into an LSH
+index persisted in SQLite, so a chunk is compared only against chunks that share
+at least one band bucket, and a candidate counts as a duplicate when the estimated
+Jaccard similarity reaches ``threshold``. Duplicates are not embedded; a row in
+``refs`` records that the source also contains the canonical chunk, so one stored
+chunk serves every document that repeats it. The stored chunk keeps its first
+document's ``source_hash`` only, so filter with ``source_filter(h, index)``
+rather than ``{"source_hash": h}`` to get all of a document's chunks; it adds
+the canonical ids from ``refs`` as a ``doc_id $in`` clause.
+
+    python dedup.py stats
+
+Usage from the pipeline::
+
+    keep, dups = index.partition(documents)   # nothing persisted yet
+    vector_db.add_documents(keep, ids=[d.metadata["doc_id"] for d in keep])
+    index.commit()                            # or index.rollback() if the add failed
+
+Config (``dedup`` section):
+{
+  "enabled": true,
+  "path": "./chatTracking/dedup_index.db",
+  "threshold": 0.85,     # estimated Jaccard needed to drop a chunk
+  "num_perm": 128,       # signature length
+  "bands": 16,           # LSH bands (num_perm / bands rows each)
+  "shingle_words": 5
+}
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_MAX_HASH = (1 << 32) - 1
+_WORD = re.compile(r"\w+")
+
+
+@dataclass
+class DedupCfg:
+    enabled: bool = False
+    path: str = "./chatTracking/dedup_index.db"
+    threshold: float = 0.85
+    num_perm: int = 128
+    bands: int = 16
+    shingle_words: int = 5
+
+    @staticmethod
+    def from_dict(d: Optional[Dict[str, Any]]) -> "DedupCfg":
+        d = d or {}
+        cfg = DedupCfg(
+            enabled=bool(d.get("enabled", False)),
+            path=str(d.get("path", DedupCfg.path)),
+            threshold=float(d.get("threshold", DedupCfg.threshold)),
+            num_perm=int(d.get("num_perm", DedupCfg.num_perm)),
+            bands=int(d.get("bands", DedupCfg.bands)),
+            shingle_words=int(d.get("shingle_words", DedupCfg.shingle_words)),
+        )
+        if cfg.num_perm % cfg.bands:
+            raise ValueError(f"dedup.num_perm ({cfg.num_perm}) must be a multiple of dedup.bands ({cfg.bands})")
+        return cfg
+
+
+# ---------------------------
+# MinHash
+# ---------------------------
+class MinHasher:
+    """Universal-hash MinHash over word shingles; permutations are seeded, so signatures are stable."""
+
+    def __init__(self, num_perm: int = 128, shingle_words: int = 5, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.shingle_words = shingle_words
+        self.a = rng.randint(1, _MAX_HASH, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, _MAX_HASH, size=num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> np.ndarray:
+        words = _WORD.findall(text.lower())
+        w = self.shingle_words
+        if len(words) <= w:
+            grams = [" ".join(words)] if words else []
+        else:
+            grams = [" ".join(words[i : i + w]) for i in range(len(words) - w + 1)]
+        return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in set(grams)), dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        x = self.shingles(text)
+        if x.size == 0:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        # (a*x + b) mod p never overflows: a, b, x < 2**32 and p = 2**61 - 1. The low 32
+        # bits are taken before the min; the raw residue is tiny for small x and would win.
+        hashed = ((np.outer(self.a, x) + self.b[:, None]) % _MERSENNE) & np.uint64(_MAX_HASH)
+        return hashed.min(axis=1).astype(np.uint32)
+
+
+def jaccard_estimate(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.count_nonzero(a == b)) / a.size
+
+
+# ---------------------------
+# Persistent LSH index
+# ---------------------------
+class DedupIndex:
+    """SQLite-backed LSH over chunk signatures; safe to share between processes."""
+
+    def __init__(self, cfg: DedupCfg):
+        self.cfg = cfg
+        self.hasher = MinHasher(cfg.num_perm, cfg.shingle_words)
+        self.rows = cfg.num_perm // cfg.bands
+        self._local = threading.local()
+        self._pending: Dict[str, Tuple[str, np.ndarray]] = {}
+        self._pending_buckets: Dict[int, List[str]] = {}
+        self._pending_refs: List[Tuple[str, int, str, str]] = []
+        self._pending_stats = [0, 0]  # chunks seen, duplicates
+        os.makedirs(os.path.dirname(os.path.abspath(cfg.path)), exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                chunk_id TEXT PRIMARY KEY,
+                source_hash TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks(source_hash);
+            CREATE TABLE IF NOT EXISTS buckets (
+                bucket INTEGER NOT NULL,
+                chunk_id TEXT NOT NULL,
+                PRIMARY KEY (bucket, chunk_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS refs (
+                source_hash TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                canonical_id TEXT NOT NULL,
+                PRIMARY KEY (source_hash, chunk_index)
+            );
+            CREATE INDEX IF NOT EXISTS idx_refs_canonical ON refs(canonical_id);
+            CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            """
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.cfg.path, timeout=30)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _bucket_keys(self, sig: np.ndarray) -> List[int]:
+        keys = []
+        raw = sig.tobytes()
+        width = self.rows * 4
+        for band in range(self.cfg.bands):
+            digest = hashlib.blake2b(raw[band * width : (band + 1) * width], digest_size=7, person=band.to_bytes(2, "little"))
+            keys.append(int.from_bytes(digest.digest(), "little"))  # 56 bits: fits a SQLite INTEGER
+        return keys
+
+    def _candidates(self, keys: List[int]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        for key in keys:
+            for chunk_id in self._pending_buckets.get(key, ()):
+                found[chunk_id] = self._pending[chunk_id][1]
+        marks = ",".join("?" * len(keys))
+        rows = self._conn().execute(
+            f"SELECT c.chunk_id, c.signature FROM chunks c WHERE c.chunk_id IN "
+            f"(SELECT DISTINCT chunk_id FROM buckets WHERE bucket IN ({marks}))",
+            keys,
+        ).fetchall()
+        for chunk_id, blob in rows:
+            found.setdefault(chunk_id, np.frombuffer(blob, dtype=np.uint32))
+        return found
+
+    def partition(self, documents: Sequence[Any]) -> Tuple[List[Any], List[Tuple[Any, str]]]:
+        """
+        Split Documents (with ``doc_id``/``source_hash``/``chunk_index`` metadata) into
+        the ones to embed and ``(duplicate, canonical_id)`` pairs. Decisions are staged
+        in memory until :meth:`commit`.
+        """
+        keep: List[Any] = []
+        dups: List[Tuple[Any, str]] = []
+        for doc in documents:
+            meta = doc.metadata
+            doc_id = meta["doc_id"]
+            sig = self.hasher.signature(doc.page_content)
+            keys = self._bucket_keys(sig)
+            canonical = None
+            best = self.cfg.threshold
+            for cand_id, cand_sig in self._candidates(keys).items():
+                score = jaccard_estimate(sig, cand_sig)
+                if cand_id == doc_id or score >= best:
+                    canonical, best = cand_id, score
+                    if cand_id == doc_id:
+                        break  # this very chunk is already indexed
+            self._pending_stats[0] += 1
+            if canonical is None:
+                keep.append(doc)
+                self._pending[doc_id] = (meta["source_hash"], sig)
+                for key in keys:
+                    self._pending_buckets.setdefault(key, []).append(doc_id)
+            else:
+                dups.append((doc, canonical))
+                self._pending_stats[1] += 1
+                if canonical != doc_id:
+                    self._pending_refs.append((meta["source_hash"], int(meta["chunk_index"]), canonical, doc_id))
+        return keep, dups
+
+    def commit(self) -> None:
+        """Persist the signatures and references staged by :meth:`partition`."""
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunks (chunk_id, source_hash, signature, created_at) VALUES (?, ?, ?, ?)",
+                [(cid, src, sig.tobytes(), now) for cid, (src, sig) in self._pending.items()],
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO buckets (bucket, chunk_id) VALUES (?, ?)",
+                [(key, cid) for key, ids in self._pending_buckets.items() for cid in ids],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO refs (source_hash, chunk_index, canonical_id) VALUES (?, ?, ?)",
+                [(src, idx, canonical) for src, idx, canonical, _ in self._pending_refs],
+            )
+            conn.executemany(
+                "INSERT INTO stats (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = value + excluded.value",
+                [("chunks_seen", self._pending_stats[0]), ("duplicates", self._pending_stats[1])],
+            )
+        self.rollback()
+
+    def rollback(self) -> None:
+        self._pending.clear()
+        self._pending_buckets.clear()
+        self._pending_refs.clear()
+        self._pending_stats = [0, 0]
+
+    # --- Lookups / maintenance ---------------------------------------
+    def sources_for(self, canonical_id: str) -> List[Tuple[str, int]]:
+        """Other (source_hash, chunk_index) locations whose chunk was deduplicated onto this one."""
+        return self._conn().execute(
+            "SELECT source_hash, chunk_index FROM refs WHERE canonical_id = ?", (canonical_id,)
+        ).fetchall()
+
+    def refs_for(self, source_hash: str) -> List[Tuple[int, str]]:
+        """(chunk_index, canonical_id) of the document's chunks that are stored under another chunk."""
+        return self._conn().execute(
+            "SELECT chunk_index, canonical_id FROM refs WHERE source_hash = ? ORDER BY chunk_index", (source_hash,)
+        ).fetchall()
+
+    def reassign(self, chunk_id: str, source_hash: str, chunk_index: int) -> str:
+        """
+        Hand a canonical chunk to a document that was deduplicated onto it, as
+        ``<source_hash>:<chunk_index>``; call before forgetting the chunk's own
+        source. Returns the chunk's new id.
+        """
+        new_id = f"{source_hash}:{chunk_index}"
+        conn = self._conn()
+        with conn:
+            conn.execute("UPDATE chunks SET chunk_id = ?, source_hash = ? WHERE chunk_id = ?", (new_id, source_hash, chunk_id))
+            conn.execute("UPDATE buckets SET chunk_id = ? WHERE chunk_id = ?", (new_id, chunk_id))
+            conn.execute("DELETE FROM refs WHERE source_hash = ? AND chunk_index = ?", (source_hash, chunk_index))
+            conn.execute("UPDATE refs SET canonical_id = ? WHERE canonical_id = ?", (new_id, chunk_id))
+        return new_id
+
+    def forget_source(self, source_hash: str) -> int:
+        """Drop a document's signatures and references (call when its vectors are deleted)."""
+        conn = self._conn()
+        with conn:
+            ids = [r[0] for r in conn.execute("SELECT chunk_id FROM chunks WHERE source_hash = ?", (source_hash,))]
+            for start in range(0, len(ids), 500):
+                part = ids[start : start + 500]
+                marks = ",".join("?" * len(part))
+                conn.execute(f"DELETE FROM buckets WHERE chunk_id IN ({marks})", part)
+                conn.execute(f"DELETE FROM refs WHERE canonical_id IN ({marks})", part)
+            conn.execute("DELETE FROM chunks WHERE source_hash = ?", (source_hash,))
+            conn.execute("DELETE FROM refs WHERE source_hash = ?", (source_hash,))
+        return len(ids)
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        counters = dict(conn.execute("SELECT key, value FROM stats").fetchall())
+        seen = counters.get("chunks_seen", 0)
+        dups = counters.get("duplicates", 0)
+        return {
+            "unique_chunks": conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0],
+            "references": conn.execute("SELECT COUNT(*) FROM refs").fetchone()[0],
+            "chunks_seen": seen,
+            "duplicates": dups,
+            "dedup_ratio": dups / seen if seen else 0.0,
+        }
+
+
+def source_filter(source_hash: str, index: Optional[DedupIndex] = None) -> Dict[str, Any]:
+    """
+    Chroma-style ``where`` for every chunk of a document, including the ones
+    stored under another source (resolved through ``index``'s refs).
+    """
+    shared = sorted({canonical for _, canonical in index.refs_for(source_hash)}) if index is not None else []
+    if not shared:
+        return {"source_hash": source_hash}
+    return {"$or": [{"source_hash": source_hash}, {"doc_id": {"$in": shared}}]}
+
+
+def existing_index(cfg: DedupCfg) -> Optional[DedupIndex]:
+    """The dedup index when one is in use (enabled now, or left behind by earlier ingests)."""
+    return DedupIndex(cfg) if cfg.enabled or os.path.exists(cfg.path) else None
+
+
+def main(argv: Sequence[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("cmd", choices=["stats"])
+    ap.parse_args(argv)
+
+    from utils import load_config
+
+    index = DedupIndex(DedupCfg.from_dict(load_config().get("dedup")))
+    for key, value in index.stats().items():
+        print(f"{key}: {value:.3f}" if isinstance(value, float) else f"{key}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
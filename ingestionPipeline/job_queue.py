@@ -0,0 +1,461 @@
+"""
+Background ingestion queue — uploads are spooled and indexed by worker processes.
+
+    python job_queue.py worker [--workers 2]     # run workers outside the UI process
+    python job_queue.py status [--limit 20]
+
+- ``JobQueue.submit`` writes the upload to a spool directory (``<sha256>.pdf``) and
+  inserts a job row in SQLite. Jobs are idempotent by document hash: submitting the
+  same PDF again, from any session or rerun, returns the existing job, and content
+  that is already indexed is never ingested twice.
+- Workers claim jobs with ``BEGIN IMMEDIATE`` and hold a lease; a job whose worker
+  died is reclaimed once the lease expires. Failures, and crashes that let the lease
+  lapse, are retried up to ``max_attempts`` before the job is marked failed and its
+  spooled upload removed.
+- Workers run ``PDFIngestor.ingest_many`` and report progress per stage, which the
+  UI polls with ``JobQueue.get``; nothing on the Streamlit thread waits for ingestion.
+- ``summarize`` jobs (``submit_summaries``, see summary_index.py) build a document's
+  summary entries after it is indexed; workers take them only when no ingest job waits.
+
+Config (``ingestion_queue`` section):
+{
+  "path": "./chatTracking/ingest_jobs.db",
+  "spool_dir": "./chatTracking/ingest_spool",
+  "spawn_workers": 1,        # worker processes the UI starts; 0 = external workers only
+  "poll_interval_seconds": 1.0,
+  "lease_seconds": 600,
+  "max_attempts": 3
+}
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+HASH_BLOCK = 1024 * 1024
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+INGEST = "ingest"
+SUMMARIZE = "summarize"
+
+# Share of the progress bar given to each pipeline stage (see PDFIngestor.ingest_many).
+STAGE_SPAN = {"extract": (0.0, 0.2), "chunk": (0.2, 0.3), "embed": (0.3, 1.0), "summarize": (0.0, 1.0)}
+
+
+@dataclass
+class QueueCfg:
+    path: str = "./chatTracking/ingest_jobs.db"
+    spool_dir: str = "./chatTracking/ingest_spool"
+    spawn_workers: int = 1
+    poll_interval_seconds: float = 1.0
+    lease_seconds: float = 600.0
+    max_attempts: int = 3
+
+    @staticmethod
+    def from_dict(d: Optional[Dict[str, Any]]) -> "QueueCfg":
+        d = d or {}
+        return QueueCfg(
+            path=str(d.get("path", QueueCfg.path)),
+            spool_dir=str(d.get("spool_dir", QueueCfg.spool_dir)),
+            spawn_workers=int(d.get("spawn_workers", QueueCfg.spawn_workers)),
+            poll_interval_seconds=float(d.get("poll_interval_seconds", QueueCfg.poll_interval_seconds)),
+            lease_seconds=float(d.get("lease_seconds", QueueCfg.lease_seconds)),
+            max_attempts=int(d.get("max_attempts", QueueCfg.max_attempts)),
+        )
+
+
+@dataclass
+class Job:
+    job_id: str
+    filename: str
+    status: str
+    stage: Optional[str]
+    progress: float
+    chunks: Optional[int]
+    error: Optional[str]
+    attempts: int
+    created_at: float
+    updated_at: float
+    kind: str = INGEST
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+
+_JOB_COLUMNS = "job_id, filename, status, stage, progress, chunks, error, attempts, created_at, updated_at, kind"
+
+
+def _sha256_buffer(view: memoryview) -> str:
+    h = hashlib.sha256()
+    for start in range(0, len(view), HASH_BLOCK):
+        h.update(view[start : start + HASH_BLOCK])
+    return h.hexdigest()
+
+
+def _as_buffer(upload: Any) -> memoryview:
+    """Zero-copy view over bytes, a BytesIO/UploadedFile, or anything with read()."""
+    if isinstance(upload, (bytes, bytearray, memoryview)):
+        return memoryview(upload)
+    if hasattr(upload, "getbuffer"):
+        return upload.getbuffer()
+    return memoryview(upload.read())
+
+
+class JobQueue:
+    """SQLite-backed job table plus an on-disk spool; safe across processes."""
+
+    def __init__(self, cfg: QueueCfg):
+        self.cfg = cfg
+        os.makedirs(os.path.dirname(os.path.abspath(cfg.path)), exist_ok=True)
+        os.makedirs(cfg.spool_dir, exist_ok=True)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,  -- the document's SHA-256
+                    filename TEXT NOT NULL,
+                    spool_path TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    progress REAL NOT NULL DEFAULT 0,
+                    chunks INTEGER,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    worker TEXT,
+                    lease_until REAL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "kind" not in columns:  # queues created before summarize jobs existed
+                conn.execute("ALTER TABLE jobs ADD COLUMN kind TEXT NOT NULL DEFAULT 'ingest'")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; Streamlit serves sessions from several threads.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.cfg.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    # --- Producer side ----------------------------------------------
+    def submit(self, upload: Any, filename: str = "upload.pdf") -> Job:
+        """Spool an upload and enqueue it; returns the existing job for known content."""
+        view = _as_buffer(upload)
+        job_id = _sha256_buffer(view)
+        existing = self.get([job_id])
+        if existing and existing[0].status != FAILED:
+            return existing[0]
+
+        spool_path = os.path.join(self.cfg.spool_dir, f"{job_id}.pdf")
+        if not os.path.exists(spool_path):
+            tmp = f"{spool_path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(view)
+            os.replace(tmp, spool_path)
+
+        now = time.time()
+        self._conn().execute(
+            """
+            INSERT INTO jobs (job_id, filename, spool_path, status, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(job_id) DO UPDATE SET
+                status = excluded.status, stage = NULL, progress = 0, error = NULL,
+                attempts = 0, updated_at = excluded.updated_at
+            WHERE jobs.status = 'failed'
+            """,
+            (job_id, filename, spool_path, QUEUED, now, now),
+        )
+        logger.info("Queued ingestion job %s (%s)", job_id[:12], filename)
+        return self.get([job_id])[0]
+
+    def submit_summaries(self, doc_hash: str, filename: str) -> Job:
+        """Enqueue a ``summarize`` job for an indexed document; idempotent like ``submit``."""
+        job_id = f"{SUMMARIZE}:{doc_hash}"
+        now = time.time()
+        self._conn().execute(
+            """
+            INSERT INTO jobs (job_id, filename, spool_path, status, created_at, updated_at, kind)
+            VALUES (?, ?, '', ?, ?, ?, ?)
+            ON CONFLICT(job_id) DO UPDATE SET
+                status = excluded.status, stage = NULL, progress = 0, error = NULL,
+                attempts = 0, updated_at = excluded.updated_at
+            WHERE jobs.status = 'failed'
+            """,
+            (job_id, filename, QUEUED, now, now, SUMMARIZE),
+        )
+        return self.get([job_id])[0]
+
+    def get(self, job_ids: Sequence[str]) -> List[Job]:
+        if not job_ids:
+            return []
+        marks = ",".join("?" * len(job_ids))
+        rows = self._conn().execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE job_id IN ({marks})", list(job_ids)).fetchall()
+        by_id = {row[0]: Job(*row) for row in rows}
+        return [by_id[j] for j in job_ids if j in by_id]
+
+    def recent(self, limit: int = 20) -> List[Job]:
+        rows = self._conn().execute(
+            f"SELECT {_JOB_COLUMNS} FROM jobs ORDER BY updated_at DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [Job(*row) for row in rows]
+
+    def forget(self, doc_hash: str) -> int:
+        """Drop a document's ingest and summarize jobs (and spooled upload), so submitting it again re-indexes it."""
+        job_ids = [doc_hash, f"{SUMMARIZE}:{doc_hash}"]
+        for job in self.get(job_ids):
+            if job.kind == INGEST:
+                try:
+                    os.remove(os.path.join(self.cfg.spool_dir, f"{doc_hash}.pdf"))
+                except OSError:
+                    pass
+        cur = self._conn().execute("DELETE FROM jobs WHERE job_id IN (?, ?)", job_ids)
+        return cur.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    # --- Worker side -------------------------------------------------
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """Atomically take the oldest queued job (ingest jobs first), or one whose lease has expired."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # A job whose worker keeps dying (a PDF that crashes the process) has used its attempts too.
+            exhausted = conn.execute(
+                "SELECT job_id, spool_path, attempts FROM jobs WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                (now, self.cfg.max_attempts),
+            ).fetchall()
+            for job_id, _, attempts in exhausted:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, lease_until = NULL, updated_at = ? WHERE job_id = ?",
+                    (f"worker lost its lease on each of {attempts} attempts", now, job_id),
+                )
+                logger.error("Job %s failed: worker lost its lease on each of %d attempts", job_id[:22], attempts)
+            row = conn.execute(
+                """
+                SELECT job_id, spool_path, attempts, kind, filename FROM jobs
+                WHERE status = 'queued' OR (status = 'running' AND lease_until < ?)
+                ORDER BY kind != 'ingest', created_at LIMIT 1
+                """,
+                (now,),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                self._drop_spool([path for _, path, _ in exhausted])
+                return None
+            conn.execute(
+                """
+                UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1,
+                    lease_until = ?, stage = NULL, progress = 0, updated_at = ?
+                WHERE job_id = ?
+                """,
+                (worker, now + self.cfg.lease_seconds, now, row[0]),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._drop_spool([path for _, path, _ in exhausted])
+        return {"job_id": row[0], "spool_path": row[1], "attempts": row[2] + 1, "kind": row[3], "filename": row[4]}
+
+    def _drop_spool(self, spool_paths: Sequence[str]) -> None:
+        for path in spool_paths:
+            if not path:  # summarize jobs have no upload
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def report(self, job_id: str, stage: str, progress: float) -> None:
+        now = time.time()
+        self._conn().execute(
+            "UPDATE jobs SET stage = ?, progress = ?, lease_until = ?, updated_at = ? WHERE job_id = ?",
+            (stage, progress, now + self.cfg.lease_seconds, now, job_id),
+        )
+
+    def complete(self, job_id: str, chunks: int) -> None:
+        self._conn().execute(
+            "UPDATE jobs SET status = 'done', stage = NULL, progress = 1, chunks = ?, error = NULL, "
+            "lease_until = NULL, updated_at = ? WHERE job_id = ?",
+            (chunks, time.time(), job_id),
+        )
+
+    def fail(self, job_id: str, error: str, attempts: int) -> None:
+        status = FAILED if attempts >= self.cfg.max_attempts else QUEUED
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, error = ?, lease_until = NULL, updated_at = ? WHERE job_id = ?",
+            (status, error, time.time(), job_id),
+        )
+        if status == FAILED:  # resubmitting the upload spools it again
+            row = self._conn().execute("SELECT spool_path FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            self._drop_spool([row[0]] if row else [])
+
+
+# -------------------------
+# Workers
+# -------------------------
+def run_worker(queue: JobQueue, stop: Optional[threading.Event] = None, worker: Optional[str] = None) -> None:
+    """Claim and ingest jobs until ``stop`` is set."""
+    from Pdf_IngestionPipeline import get_ingestor
+
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    ingestor = get_ingestor()
+    logger.info("Ingestion worker %s started", worker)
+    while stop is None or not stop.is_set():
+        job = queue.claim(worker)
+        if job is None:
+            time.sleep(queue.cfg.poll_interval_seconds)
+            continue
+        job_id = job["job_id"]
+
+        def _progress(stage: str, done: int, total: int, _job_id: str = job_id) -> None:
+            lo, hi = STAGE_SPAN.get(stage, (0.0, 1.0))
+            queue.report(_job_id, stage, lo + (hi - lo) * (done / max(1, total)))
+
+        if job["kind"] == SUMMARIZE:
+            from summary_index import build_summaries
+
+            try:
+                entries = build_summaries(job_id.split(":", 1)[1], ingestor.vdb, progress=_progress)
+            except Exception as e:
+                logger.exception("Summarize job %s failed (attempt %d)", job_id[:22], job["attempts"])
+                queue.fail(job_id, repr(e), job["attempts"])
+                continue
+            queue.complete(job_id, entries)
+            logger.info("Summarize job %s done (%d entries)", job_id[:22], entries)
+            continue
+
+        try:
+            chunks = ingestor.ingest_many([job["spool_path"]], progress=_progress, labels={job_id: job["filename"]})
+        except Exception as e:
+            logger.exception("Ingestion job %s failed (attempt %d)", job_id[:12], job["attempts"])
+            queue.fail(job_id, repr(e), job["attempts"])
+            continue
+        queue.complete(job_id, chunks)
+        try:
+            os.remove(job["spool_path"])
+        except OSError:
+            pass
+        logger.info("Ingestion job %s done (%d chunks)", job_id[:12], chunks)
+
+
+def _start_worker_metrics(attempts: int) -> None:
+    """Expose this worker's metrics on the first free port from ``metrics.worker_port``."""
+    from utils import load_config
+    from utils.metrics import MetricsCfg, start_http_server
+
+    metrics_cfg = MetricsCfg.from_dict(load_config().get("metrics"))
+    if metrics_cfg.enabled:
+        start_http_server(metrics_cfg.host, metrics_cfg.worker_port, attempts=attempts)
+
+
+def _worker_main(cfg: QueueCfg, siblings: int = 1) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    _start_worker_metrics(siblings)
+    run_worker(JobQueue(cfg))
+
+
+_spawn_lock: Optional[Any] = None  # held for the process lifetime by the process that spawned
+
+
+def _claim_spawn_lock(cfg: QueueCfg) -> bool:
+    """True for the first process on this host to ask; the lock is freed when that process exits."""
+    global _spawn_lock
+    if _spawn_lock is not None:
+        return True
+    try:
+        import fcntl
+    except ImportError:  # no flock (Windows): every caller spawns
+        return True
+    f = open(f"{os.path.abspath(cfg.path)}.spawn.lock", "a")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return False
+    _spawn_lock = f
+    return True
+
+
+def spawn_workers(cfg: QueueCfg, count: Optional[int] = None, once: bool = False) -> List[multiprocessing.Process]:
+    """
+    Start daemon worker processes (spawned, so they never inherit Streamlit's threads).
+    With ``once``, only the first process to call it on this host spawns (a file lock
+    next to the queue), so sibling server processes such as uvicorn workers share them.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    procs = []
+    count = cfg.spawn_workers if count is None else count
+    if once and count > 0 and not _claim_spawn_lock(cfg):
+        logger.info("Ingestion workers already spawned by a sibling process")
+        return procs
+    for _ in range(count):
+        proc = ctx.Process(target=_worker_main, args=(cfg, count), name="neuranix-ingest", daemon=True)
+        proc.start()
+        procs.append(proc)
+    return procs
+
+
+def load_queue_cfg() -> QueueCfg:
+    from utils import load_config
+
+    return QueueCfg.from_dict(load_config().get("ingestion_queue"))
+
+
+def main(argv: Sequence[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    w = sub.add_parser("worker", help="run ingestion workers in the foreground")
+    w.add_argument("--workers", type=int, default=1)
+    s = sub.add_parser("status", help="show recent jobs")
+    s.add_argument("--limit", type=int, default=20)
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    cfg = load_queue_cfg()
+    if args.cmd == "status":
+        queue = JobQueue(cfg)
+        print(", ".join(f"{k}={v}" for k, v in sorted(queue.counts().items())) or "no jobs")
+        for job in queue.recent(args.limit):
+            count = f"{job.chunks or 0:>6} {'chunks' if job.kind == INGEST else 'entries'}"
+            print(f"{job.job_id.split(':')[-1][:12]}  {job.kind:<9} {job.status:<8} {job.progress:6.1%}  {count}  {job.filename}")
+        return 0
+
+    if args.workers <= 1:
+        _start_worker_metrics(1)
+        run_worker(JobQueue(cfg))
+        return 0
+    procs = spawn_workers(cfg, args.workers)
+    for proc in procs:
+        proc.join()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,360 @@
+"""
+Hierarchical summaries: overview questions answered from summaries, not random chunks.
+
+A similarity search for "summarise this PDF" returns a handful of chunks that merely
+share words with the question. With ``summary_index.enabled``, every document the
+ingestor embeds also gets a ``summarize`` job in the ingestion queue (job_queue.py),
+run by the same workers after the ingest jobs:
+
+- consecutive runs of ``section_chunks`` chunks are summarised into one *section*
+  entry each, then the section summaries are folded into one *document* entry;
+- both are embedded into the same collection next to the chunks, with metadata
+  ``level`` = ``section`` | ``document`` (chunks carry ``level`` = ``chunk``),
+  ``source_hash`` and, for sections, the chunk range they cover;
+- the LLM calls run at ``bulk`` admission priority, behind chat turns and summaries.
+
+At query time ``retrieve`` routes broad questions ("summarise", "overview", "what is
+this document about", "key points", ...) to the summary entries and everything else
+to the chunks, as before. A broad question gets the best-matching document overview,
+up to ``summary_k`` of its sections and the next-best overviews: a few short
+summaries instead of ``number_of_retrieved_documents`` full chunks. While no
+document has summaries yet it falls back to the chunks. The chunk route filters on
+``level`` = ``chunk`` in the store; chunks ingested before chunks carried ``level``
+are tagged by ``migrate`` (``enqueue --all`` runs it first, and a build tags the
+chunks of the document it summarises).
+
+    python summary_index.py build <source_hash> [...]     # (re)build now, no queue
+    python summary_index.py enqueue --all                 # migrate, then backfill documents ingested earlier
+    python summary_index.py migrate                       # only tag legacy chunks with level=chunk
+    python summary_index.py route "what is this report about?"
+
+Config (``summary_index`` section):
+{
+  "enabled": false,
+  "endpoint": "ollama",
+  "model": "llama3.2:latest",
+  "section_chunks": 8,        # chunks per section summary
+  "section_words": 120,
+  "document_words": 250,
+  "max_input_tokens": 3000,   # section summaries folded per call; more take several rounds
+  "route": "auto",            # auto | chunks | summaries
+  "summary_k": 3              # overviews, and sections of the best match, for a broad question
+}
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import re
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from utils import load_config
+from utils.metrics import INGEST_ITEMS_TOTAL, INGEST_STAGE_SECONDS
+from utils.prompt_templates import document_summary_prompt_template, section_summary_prompt_template
+from utils.tracing import set_attributes, span
+
+logger = logging.getLogger(__name__)
+
+config = load_config()
+
+CHUNK, SECTION, DOCUMENT = "chunk", "section", "document"
+SUMMARY_LEVELS = [DOCUMENT, SECTION]
+
+# Questions about a document as a whole rather than a detail in it.
+BROAD_QUESTION = re.compile(
+    r"\b("
+    r"summar(y|ies|ise|ize|ising|izing)|overview|overall|gist|tl;?dr|outline|synopsis|abstract|high[- ]level"
+    r"|(key|main|major) (points?|ideas?|topics?|themes?|takeaways?|findings?|arguments?|conclusions?)"
+    r"|what (is|are) (this|the|these|those) (document|pdf|paper|file|report|book|article)s? about"
+    r")\b",
+    re.IGNORECASE,
+)
+
+
+# ---------------------------
+# Config
+# ---------------------------
+@dataclass(frozen=True)
+class SummaryIndexCfg:
+    enabled: bool = False
+    endpoint: str = "ollama"
+    model: str = "llama3.2:latest"
+    section_chunks: int = 8
+    section_words: int = 120
+    document_words: int = 250
+    max_input_tokens: int = 3000
+    route: str = "auto"
+    summary_k: int = 3
+
+    @staticmethod
+    def from_dict(d: Optional[Dict[str, Any]]) -> "SummaryIndexCfg":
+        sc = d or {}
+        route = str(sc.get("route", "auto"))
+        if route not in ("auto", "chunks", "summaries"):
+            raise ValueError(f"summary_index.route must be auto, chunks or summaries, not {route!r}")
+        return SummaryIndexCfg(
+            enabled=bool(sc.get("enabled", False)),
+            endpoint=str(sc.get("endpoint", "ollama")),
+            model=str(sc.get("model", "llama3.2:latest")),
+            section_chunks=max(1, int(sc.get("section_chunks", 8))),
+            section_words=int(sc.get("section_words", 120)),
+            document_words=int(sc.get("document_words", 250)),
+            max_input_tokens=int(sc.get("max_input_tokens", 3000)),
+            route=route,
+            summary_k=max(1, int(sc.get("summary_k", 3))),
+        )
+
+
+summary_cfg = SummaryIndexCfg.from_dict(config.get("summary_index"))
+
+
+def _count_tokens(text: str) -> int:
+    return len(text) // 4 + 1  # budgeting only; an estimate is enough
+
+
+# ---------------------------
+# Building (ingestion workers)
+# ---------------------------
+def _summarize(prompt: str, cfg: SummaryIndexCfg) -> str:
+    from admission import BULK, priority
+    from chat_api_handler import OllamaChatAPIHandler, OpenAIChatAPIHandler
+
+    handler = OpenAIChatAPIHandler if cfg.endpoint == "openai" else OllamaChatAPIHandler
+    with priority(BULK):
+        summary = handler.api_call([{"role": "user", "content": prompt}], cfg.model).strip()
+    if summary.startswith("OLLAMA ERROR"):
+        raise RuntimeError(summary)
+    return summary
+
+
+def tag_legacy_chunks(collection: Any, where: Optional[Dict[str, Any]] = None, batch_size: int = 1000) -> int:
+    """Add ``level`` = ``chunk`` to entries stored without a level; returns how many were tagged."""
+    tagged = 0
+    offset = 0
+    while True:
+        got = collection.get(where=where, limit=batch_size, offset=offset, include=["metadatas"])
+        untagged = [(vid, meta or {}) for vid, meta in zip(got["ids"], got["metadatas"]) if "level" not in (meta or {})]
+        if untagged:
+            collection.update(ids=[vid for vid, _ in untagged], metadatas=[{**meta, "level": CHUNK} for _, meta in untagged])
+            tagged += len(untagged)
+        if len(got["ids"]) < batch_size:
+            return tagged
+        offset += batch_size
+
+
+def document_chunks(vdb: Any, source_hash: str) -> List[Tuple[int, str]]:
+    """
+    The document's chunks as (chunk_index, text), in document order. Chunks dedup
+    folded onto another document's copy are looked up through the dedup refs.
+    """
+    from dedup import DedupCfg, existing_index
+
+    collection = vdb._collection
+    got = collection.get(where={"source_hash": source_hash}, include=["documents", "metadatas"])
+    chunks = {
+        int(meta.get("chunk_index", 0)): text
+        for text, meta in zip(got["documents"], got["metadatas"])
+        if (meta or {}).get("level", CHUNK) == CHUNK and text
+    }
+    dedup = existing_index(DedupCfg.from_dict(config.get("dedup")))
+    refs = [(idx, canonical) for idx, canonical in (dedup.refs_for(source_hash) if dedup else []) if idx not in chunks]
+    canonical_ids = sorted({canonical for _, canonical in refs})
+    shared: Dict[str, str] = {}
+    for start in range(0, len(canonical_ids), 500):
+        got = collection.get(where={"doc_id": {"$in": canonical_ids[start : start + 500]}}, include=["documents", "metadatas"])
+        shared.update({meta["doc_id"]: text for text, meta in zip(got["documents"], got["metadatas"]) if meta and text})
+    chunks.update({idx: shared[canonical] for idx, canonical in refs if canonical in shared})
+    return sorted(chunks.items())
+
+
+def _fold(summaries: List[str], cfg: SummaryIndexCfg) -> str:
+    """Reduce section summaries to one document summary, ``max_input_tokens`` of input per call."""
+    while True:
+        groups: List[List[str]] = [[]]
+        tokens = 0
+        for text in summaries:
+            cost = _count_tokens(text)
+            if groups[-1] and tokens + cost > cfg.max_input_tokens:
+                groups.append([])
+                tokens = 0
+            groups[-1].append(text)
+            tokens += cost
+        folded = [
+            _summarize(
+                document_summary_prompt_template.format(
+                    max_words=cfg.document_words, sections="\n\n".join(f"- {s}" for s in group)
+                ),
+                cfg,
+            )
+            for group in groups
+        ]
+        if len(folded) == 1:
+            return folded[0]
+        summaries = folded
+
+
+def build_summaries(
+    source_hash: str,
+    vdb: Optional[Any] = None,
+    cfg: SummaryIndexCfg = summary_cfg,
+    progress: Optional[Callable[[str, int, int], None]] = None,
+) -> int:
+    """(Re)build a document's section and document summaries; returns the entries written."""
+    from langchain.schema.document import Document
+    from vectordb_handler import drop_fast_index, load_vectordb
+
+    vdb = vdb if vdb is not None else load_vectordb()
+    t0 = time.perf_counter()
+    tag_legacy_chunks(vdb._collection, where={"source_hash": source_hash})  # the chunk route filters on level
+    chunks = document_chunks(vdb, source_hash)
+    if not chunks:
+        logger.info("No chunks stored for %s; nothing to summarise", source_hash[:12])
+        return 0
+
+    sections = [chunks[i : i + cfg.section_chunks] for i in range(0, len(chunks), cfg.section_chunks)]
+    docs: List[Document] = []
+    with span("summary_index.build", source=source_hash[:12], chunks=len(chunks), sections=len(sections)):
+        for idx, group in enumerate(sections):
+            text = "\n".join(chunk for _, chunk in group)
+            summary = _summarize(section_summary_prompt_template.format(max_words=cfg.section_words, text=text), cfg)
+            docs.append(
+                Document(
+                    page_content=summary,
+                    metadata={
+                        "doc_id": f"{source_hash}:section:{idx}",
+                        "source_hash": source_hash,
+                        "level": SECTION,
+                        "section_index": idx,
+                        "num_sections": len(sections),
+                        "chunk_start": group[0][0],
+                        "chunk_end": group[-1][0],
+                    },
+                )
+            )
+            if progress is not None:
+                progress("summarize", idx + 1, len(sections) + 1)
+        overview = docs[0].page_content if len(docs) == 1 else _fold([d.page_content for d in docs], cfg)
+        docs.append(
+            Document(
+                page_content=overview,
+                metadata={
+                    "doc_id": f"{source_hash}:document",
+                    "source_hash": source_hash,
+                    "level": DOCUMENT,
+                    "num_sections": len(sections),
+                },
+            )
+        )
+
+    # Replace rather than append, so a rebuild never leaves two overviews behind.
+    vdb._collection.delete(where={"$and": [{"source_hash": source_hash}, {"level": {"$in": SUMMARY_LEVELS}}]})
+    vdb.add_documents(docs, ids=[d.metadata["doc_id"] for d in docs])
+    drop_fast_index()  # bumps the write generation: a rebuild often leaves the entry count unchanged
+    if progress is not None:
+        progress("summarize", len(sections) + 1, len(sections) + 1)
+    INGEST_STAGE_SECONDS.observe(time.perf_counter() - t0, stage="summarize")
+    INGEST_ITEMS_TOTAL.inc(len(docs), stage="summarize", unit="summaries")
+    logger.info("Summarised %s: %d sections + 1 document entry", source_hash[:12], len(sections))
+    return len(docs)
+
+
+def schedule(doc_hashes: Sequence[str], labels: Optional[Dict[str, str]] = None, cfg: SummaryIndexCfg = summary_cfg) -> int:
+    """Queue a ``summarize`` job per document (a no-op unless enabled); returns the jobs queued."""
+    if not cfg.enabled or not doc_hashes:
+        return 0
+    from job_queue import JobQueue, load_queue_cfg
+
+    queue = JobQueue(load_queue_cfg())
+    for doc_hash in doc_hashes:
+        queue.submit_summaries(doc_hash, (labels or {}).get(doc_hash, doc_hash[:12]))
+    return len(doc_hashes)
+
+
+# ---------------------------
+# Retrieval routing
+# ---------------------------
+def is_broad_question(question: str) -> bool:
+    return BROAD_QUESTION.search(question) is not None
+
+
+def route_for(question: str, cfg: SummaryIndexCfg = summary_cfg) -> str:
+    if not cfg.enabled:
+        return "chunks"
+    if cfg.route != "auto":
+        return cfg.route
+    return "summaries" if is_broad_question(question) else "chunks"
+
+
+def retrieve(vector_db: Any, question: str, k: int, cfg: SummaryIndexCfg = summary_cfg) -> List[Any]:
+    """Context documents for ``question``: summaries for broad questions, chunks otherwise."""
+    route = route_for(question, cfg)
+    if route == "summaries":
+        overviews = vector_db.similarity_search(question, k=cfg.summary_k, filter={"level": DOCUMENT})
+        if overviews:
+            # The best-matching document's overview, then its most relevant sections in reading order.
+            best = overviews[0].metadata.get("source_hash")
+            sections = vector_db.similarity_search(
+                question, k=cfg.summary_k, filter={"$and": [{"level": SECTION}, {"source_hash": best}]}
+            )
+            sections.sort(key=lambda d: d.metadata.get("section_index", 0))
+            docs = overviews[:1] + sections + overviews[1:]
+            set_attributes(route="summaries", docs=len(docs))
+            return docs
+    if not cfg.enabled:
+        return vector_db.similarity_search(question, k=k)
+    # Summaries share the collection: filter in the store, so k chunks come back however many summaries match.
+    chunks = vector_db.similarity_search(question, k=k, filter={"level": CHUNK})
+    set_attributes(route="chunks", docs=len(chunks))
+    return chunks
+
+
+def main(argv: Sequence[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="(re)build summaries for documents now")
+    b.add_argument("source_hashes", nargs="+")
+    e = sub.add_parser("enqueue", help="queue summarize jobs for the workers")
+    e.add_argument("source_hashes", nargs="*")
+    e.add_argument("--all", action="store_true", help="every document in the collection")
+    r = sub.add_parser("route", help="show where a question would be routed")
+    r.add_argument("question")
+    sub.add_parser("migrate", help="tag chunks stored without a level as level=chunk")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    if args.cmd == "route":
+        print(route_for(args.question, SummaryIndexCfg.from_dict({**(config.get("summary_index") or {}), "enabled": True})))
+        return 0
+    if args.cmd == "build":
+        for source_hash in args.source_hashes:
+            print(f"{source_hash[:12]}  {build_summaries(source_hash)} summary entries")
+        return 0
+
+    if args.cmd == "migrate" or args.all:
+        from vectordb_handler import invalidate_fast_retriever, load_vectordb
+
+        tagged = tag_legacy_chunks(load_vectordb()._collection)
+        if tagged:
+            invalidate_fast_retriever()
+        print(f"Tagged {tagged} legacy chunk(s) with level={CHUNK}")
+        if args.cmd == "migrate":
+            return 0
+
+    hashes = list(args.source_hashes)
+    if args.all:
+        from vectordb_handler import load_vectordb
+
+        metas = load_vectordb()._collection.get(include=["metadatas"])["metadatas"]
+        hashes += sorted({m["source_hash"] for m in metas if m and m.get("source_hash")} - set(hashes))
+    if not hashes:
+        ap.error("give source hashes or --all")
+    queued = schedule(hashes, cfg=SummaryIndexCfg.from_dict({**(config.get("summary_index") or {}), "enabled": True}))
+    print(f"Queued {queued} summarize job(s); run `python job_queue.py worker` if no worker is running.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,205 @@
+"""
+Offset-based recursive text chunker.
+
+Produces the same chunks as LangChain's ``RecursiveCharacterTextSplitter``
+(``keep_separator=True``, ``strip_whitespace=True``) for the same ``chunk_size``,
+``chunk_overlap``, ``separators`` and length function, but works on
+``(start, end)`` offsets into the original text:
+
+- separators are located with ``str.find`` over offset ranges; pieces are never
+  materialised, re-joined or re-split as strings;
+- merging with overlap is a sliding window over piece offsets; with character sizing
+  the window edges are found by bisecting the separator positions, so the Python
+  work per chunk is constant instead of proportional to the number of pieces;
+- ``spans()`` returns a flat ``array('I')`` of (start, end) pairs that
+  ``chunk_codec`` stores directly, and ``iter_spans()`` / ``iter_chunks()``
+  stream chunks as they are emitted; a string is only sliced when a chunk is
+  actually read.
+
+Because the separator stays attached to the following piece, every chunk is a
+contiguous slice of the text, which is what makes the offset representation exact.
+With a token length function (``tiktoken_length``) sizes are counted in tokens,
+exactly like ``RecursiveCharacterTextSplitter.from_tiktoken_encoder``.
+"""
+from __future__ import annotations
+
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+Span = Tuple[int, int]
+LengthFn = Callable[[str], int]
+
+
+def tiktoken_length(encoding_name: str = "cl100k_base") -> LengthFn:
+    """Token-count length function; raises ImportError when tiktoken is not installed."""
+    import tiktoken  # type: ignore
+
+    encoding = tiktoken.get_encoding(encoding_name)
+    return lambda s: len(encoding.encode(s, disallowed_special=()))
+
+
+class NativeChunker:
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 100,
+        separators: Optional[Sequence[str]] = None,
+        length_function: Optional[LengthFn] = None,
+    ):
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) is larger than chunk_size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = list(separators) if separators else list(DEFAULT_SEPARATORS)
+        self.length_function = length_function
+        self._patterns = {sep: re.compile(re.escape(sep)) for sep in self.separators if sep}
+
+    # --- Public API -------------------------------------------------
+    def iter_spans(self, text: str) -> Iterator[Span]:
+        """Yield (start, end) offsets of each chunk, in order."""
+        if self.length_function is None:
+            return self._split_chars(text, 0, len(text), self.separators)
+        return self._split(text, 0, len(text), self.separators)
+
+    def iter_chunks(self, text: str) -> Iterator[str]:
+        for start, end in self.iter_spans(text):
+            yield text[start:end]
+
+    def spans(self, text: str) -> array:
+        """Flat ``array('I')`` of start/end pairs, the layout ``chunk_codec`` stores."""
+        out = array("I")
+        for start, end in self.iter_spans(text):
+            out.append(start)
+            out.append(end)
+        return out
+
+    def split_text(self, text: str) -> List[str]:
+        """Drop-in for ``RecursiveCharacterTextSplitter.split_text``."""
+        return list(self.iter_chunks(text))
+
+    # --- Internals --------------------------------------------------
+    def _length(self, text: str, start: int, end: int) -> int:
+        if self.length_function is None:
+            return end - start
+        return self.length_function(text[start:end])
+
+    @staticmethod
+    def _pieces(text: str, start: int, end: int, separator: str) -> Iterator[Span]:
+        """Split [start, end) on ``separator``, keeping it at the start of the next piece."""
+        if separator == "":
+            for i in range(start, end):
+                yield i, i + 1
+            return
+        step = len(separator)
+        prev = start
+        pos = text.find(separator, start, end)
+        while pos != -1:
+            if pos > prev:
+                yield prev, pos
+            prev = pos
+            pos = text.find(separator, pos + step, end)
+        if end > prev:
+            yield prev, end
+
+    @staticmethod
+    def _strip(text: str, start: int, end: int) -> Optional[Span]:
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return (start, end) if start < end else None
+
+    def _merge(self, text: str, pieces: List[Tuple[int, int, int]]) -> Iterator[Span]:
+        """Greedy merge of adjacent pieces into chunks, carrying up to ``chunk_overlap`` back."""
+        size, overlap = self.chunk_size, self.chunk_overlap
+        window: deque = deque()
+        total = 0
+        for start, end, length in pieces:
+            if total + length > size and window:
+                span = self._strip(text, window[0][0], window[-1][1])
+                if span is not None:
+                    yield span
+                while total > overlap or (total + length > size and total > 0):
+                    total -= window.popleft()[2]
+            window.append((start, end, length))
+            total += length
+        if window:
+            span = self._strip(text, window[0][0], window[-1][1])
+            if span is not None:
+                yield span
+
+    @staticmethod
+    def _pick_separator(text: str, start: int, end: int, separators: Sequence[str]) -> Tuple[str, Sequence[str]]:
+        """First separator present in [start, end) and the finer ones left for oversized pieces."""
+        for i, candidate in enumerate(separators):
+            if candidate == "":
+                return candidate, ()
+            if text.find(candidate, start, end) != -1:
+                return candidate, separators[i + 1 :]
+        return separators[-1], ()
+
+    def _split(self, text: str, start: int, end: int, separators: Sequence[str]) -> Iterator[Span]:
+        separator, remaining = self._pick_separator(text, start, end, separators)
+
+        good: List[Tuple[int, int, int]] = []
+        for s, e in self._pieces(text, start, end, separator):
+            length = self._length(text, s, e)
+            if length < self.chunk_size:
+                good.append((s, e, length))
+                continue
+            if good:
+                yield from self._merge(text, good)
+                good = []
+            if remaining:
+                yield from self._split(text, s, e, remaining)
+            else:
+                yield s, e  # unsplittable piece, emitted as-is (LangChain does not strip these)
+        if good:
+            yield from self._merge(text, good)
+
+    def _split_chars(self, text: str, start: int, end: int, separators: Sequence[str]) -> Iterator[Span]:
+        """
+        ``_split`` specialised to character lengths, where a window's size is just
+        ``end - start``. Piece boundaries are collected once; each chunk's end is the
+        last boundary within ``chunk_size`` (bisect) and the overlap carried into the
+        next chunk is the first boundary past the overlap threshold (bisect).
+        """
+        separator, remaining = self._pick_separator(text, start, end, separators)
+        if separator == "":
+            bounds = list(range(start, end + 1))
+        else:
+            # finditer scans left to right without overlaps, exactly like the piece split.
+            bounds = [start]
+            bounds.extend(m.start() for m in self._patterns[separator].finditer(text, start, end))
+            if len(bounds) > 1 and bounds[1] == start:
+                del bounds[1]
+            if end > bounds[-1]:
+                bounds.append(end)
+        size, overlap, strip = self.chunk_size, self.chunk_overlap, self._strip
+        last = len(bounds) - 1  # number of pieces
+
+        i = 0
+        while i < last:
+            if bounds[i + 1] - bounds[i] >= size:  # oversized piece: split finer or emit as-is
+                if remaining:
+                    yield from self._split_chars(text, bounds[i], bounds[i + 1], remaining)
+                else:
+                    yield bounds[i], bounds[i + 1]
+                i += 1
+                continue
+            ws = i
+            while True:
+                j = bisect_right(bounds, bounds[ws] + size, ws + 1, last + 1) - 1
+                span = strip(text, bounds[ws], bounds[j])
+                if span is not None:
+                    yield span
+                if j == last or bounds[j + 1] - bounds[j] >= size:
+                    i = j
+                    break
+                threshold = max(bounds[j] - overlap, bounds[j + 1] - size)
+                ws = bisect_left(bounds, threshold, ws, j)
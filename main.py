@@ -1,22 +1,28 @@
+import logging
 import os
 import sqlite3
-import redis
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from PIL import Image
+from typing import Callable, Dict, List, Optional
 import streamlit as st
 from streamlit_mic_recorder import mic_recorder
+from admission import Overloaded
 from chat_api_handler import ChatAPIHandler
+from conversation_memory import load_chat_context, update_summary_async
+from job_queue import Job, JobQueue, QueueCfg, spawn_workers
 from utils import (
     get_timestamp, load_config, get_avatar,
     list_openai_models, list_ollama_models, command
 )
-from utils.audio_handler import transcribe_audio
-from utils.pdf_handler import add_documents_to_db
 from utils.html_templates import css
+from utils.cache_handler import RedisCfg, TieredCache, get_shared_cache
+from utils.metrics import MetricsCfg, start_http_server
+from utils.tracing import turn
 from database_operations import (
     save_text_message, save_image_message, save_audio_message,
     load_messages, get_all_chat_history_ids,
-    delete_chat_history, load_last_k_text_messages_ollama
+    delete_chat_history
 )
 
 # ==================================================================
@@ -26,26 +32,145 @@ from database_operations import (
 #  Copyright : © 2025 UjjwalS. All rights reserved.
 # ==================================================================
 config = load_config()
+logger = logging.getLogger(__name__)
+
+# Redis (local or cloud) is optional: the shared cache falls back to an in-process LRU
+# and health-checks the server on a background thread. See the `redis` config section.
+redis_cfg = RedisCfg.from_dict(config.get("redis"))
+
+@st.cache_resource
+def get_model_cache() -> TieredCache:
+    """One tiered model-listing cache per server process, shared across reruns and sessions."""
+    cache_cfg = config.get("model_cache", {})
+    return TieredCache(
+        namespace="neuranix:models",
+        backend=get_shared_cache(redis_cfg),
+        fresh_ttl=cache_cfg.get("fresh_ttl_seconds", 300),
+        stale_ttl=cache_cfg.get("stale_ttl_seconds", 24 * 3600),
+        local_ttl=cache_cfg.get("local_ttl_seconds", 30),
+    )
 
-# For Redis LocalHost
-# redis_client = redis.Redis(
-#     host=os.getenv("REDIS_HOST", "localhost"),
-#     port=int(os.getenv("REDIS_PORT", 6379)),
-#     db=0,
-#     decode_responses=True
-# )
-
-# For Redis Cloud
-redis_client = redis.Redis(
-    host=os.getenv("REDIS_HOST", "redis-12345.c15.us-east-1-2.ec2.cloud.redislabs.com"),
-    port=int(os.getenv("REDIS_PORT", 12345)),
-    password=os.getenv("REDIS_PASSWORD"), 
-    ssl=True,
-    decode_responses=True
-)
+MODEL_LISTERS = {
+    "ollama": list_ollama_models,
+    "openai": list_openai_models,
+}
+
+# ---------------------------
+# Lazy Feature Imports
+# ---------------------------
+# ASR (transformers/librosa) and the vector DB (langchain/chromadb) are imported on first use,
+# and PDF ingestion only ever runs in the job-queue workers, so a cold server renders its
+# first page without loading any of those stacks. Budget enforced by benchmarks/import_time.py.
+def transcribe_audio(audio_bytes: bytes) -> str:
+    from utils.audio_handler import transcribe_audio as _transcribe_audio
+    return _transcribe_audio(audio_bytes)
+
+
+def _prefetch_vectordb() -> None:
+    from vectordb_handler import load_vectordb
+    load_vectordb()
+
+
+def _prefetch_asr() -> None:
+    from utils.audio_handler import get_asr_pipeline
+    get_asr_pipeline()
+
+
+PREFETCHERS: Dict[str, Callable[[], None]] = {
+    "vectordb": _prefetch_vectordb,
+    "asr": _prefetch_asr,
+}
+
+
+@st.cache_resource(show_spinner=False)
+def start_prefetch() -> Optional[threading.Thread]:
+    """Warm the features enabled under `startup.prefetch` on a daemon thread, once per process."""
+    prefetch_cfg = config.get("startup", {}).get("prefetch") or {}
+    targets = [name for name in PREFETCHERS if prefetch_cfg.get(name, False)]
+    if not targets:
+        return None
+
+    def _run():
+        for name in targets:
+            try:
+                PREFETCHERS[name]()
+                logger.info("Prefetched %s", name)
+            except Exception as e:
+                logger.warning("Prefetch of %s failed (%s); it will load on first use.", name, e)
 
-logo_long_image = Image.open("assets/logo_long_image.png")
-logo_short_image = Image.open("assets/logo_short_image.png")
+    thread = threading.Thread(target=_run, name="neuranix-prefetch", daemon=True)
+    thread.start()
+    return thread
+
+# ---------------------------
+# Metrics
+# ---------------------------
+# Prometheus text on :<metrics.port>/metrics (routed by nginx at /metrics); see utils/metrics.py.
+metrics_cfg = MetricsCfg.from_dict(config.get("metrics"))
+
+
+@st.cache_resource(show_spinner=False)
+def start_metrics_server():
+    """Serve this process's metrics registry once per server process."""
+    if not metrics_cfg.enabled:
+        return None
+    return start_http_server(metrics_cfg.host, metrics_cfg.port)
+
+# ---------------------------
+# Background PDF Ingestion
+# ---------------------------
+# Uploads are spooled to a SQLite job queue and indexed by worker processes running the
+# PDFIngestor pipeline; sessions only poll job status, so chat keeps working meanwhile.
+queue_cfg = QueueCfg.from_dict(config.get("ingestion_queue"))
+INGEST_POLL_SECONDS = float((config.get("ingestion_queue") or {}).get("ui_poll_seconds", 2.0))
+
+
+@st.cache_resource(show_spinner=False)
+def get_ingest_queue() -> JobQueue:
+    """One queue handle per server process; starts `spawn_workers` worker processes once."""
+    queue = JobQueue(queue_cfg)
+    spawn_workers(queue_cfg)
+    return queue
+
+
+def submit_pdfs(uploaded_pdfs) -> None:
+    queue = get_ingest_queue()
+    tracked = st.session_state.setdefault("ingest_jobs", [])
+    for pdf in uploaded_pdfs:
+        job = queue.submit(pdf, filename=pdf.name)
+        if job.job_id not in tracked:
+            tracked.append(job.job_id)
+
+
+def render_jobs(jobs: List[Job]) -> None:
+    for job in jobs:
+        if job.status == "done":
+            st.caption(f"✅ {job.filename} — {job.chunks or 0} chunks indexed")
+        elif job.status == "failed":
+            st.caption(f"❌ {job.filename} — {job.error}")
+        else:
+            label = job.stage or job.status
+            st.progress(job.progress, text=f"{job.filename} ({label})")
+
+
+@st.fragment(run_every=INGEST_POLL_SECONDS)
+def live_ingestion_status():
+    jobs = get_ingest_queue().get(st.session_state.ingest_jobs)
+    render_jobs(jobs)
+    if all(job.finished for job in jobs):
+        st.rerun()  # full rerun: the finished list renders statically and polling stops
+
+
+def ingestion_status():
+    job_ids = st.session_state.get("ingest_jobs", [])
+    if not job_ids:
+        return
+    jobs = get_ingest_queue().get(job_ids)
+    with st.sidebar.expander("PDF Ingestion", expanded=True):
+        if all(job.finished for job in jobs):
+            render_jobs(jobs)
+        else:
+            live_ingestion_status()
 
 # ---------------------------
 # Sidebar Footer
@@ -83,36 +208,56 @@ def get_session_key():
     return st.session_state.session_key
 
 
+def summarize_session():
+    """Fold older turns into the session's rolling summary in the background (conversation_memory)."""
+    update_summary_async(get_session_key(), st.session_state.endpoint_to_use, st.session_state.get("model_to_use"))
+
+
+@contextmanager
+def overload_notice():
+    """Show a turn refused by admission control as a warning the user can act on, not a traceback."""
+    try:
+        yield
+    except Overloaded as e:
+        st.warning(f"The model is busy right now: {e}")
+
+
+def warm_up_selected_model():
+    """Preload the selected model once per session and model switch, off the script thread."""
+    selected = (st.session_state.endpoint_to_use, st.session_state.get("model_to_use"))
+    if not selected[1] or st.session_state.model_tracker == selected:
+        return
+    st.session_state.model_tracker = selected
+
+    def _run():
+        try:
+            ChatAPIHandler.warm_up(*selected)
+        except Exception as e:
+            logger.warning("Warm-up of %s failed (%s); the first turn will load it.", selected[1], e)
+
+    threading.Thread(target=_run, name="neuranix-warmup", daemon=True).start()
+
+
 def delete_chat_session_history():
     delete_chat_history(st.session_state.session_key)
     st.session_state.session_index_tracker = "new_session"
 
 #  Author: UjjwalS (https://www.ujjwalsaini.dev)
 def clear_cache():
-    """Clear Redis cache."""
-    redis_client.flushdb()
+    """Revalidate the active provider's model listing in the background (never a FLUSHDB)."""
+    endpoint = st.session_state.get("endpoint_to_use", "ollama")
+    get_model_cache().revalidate(endpoint, MODEL_LISTERS[endpoint])
 
 
 def list_model_options():
     endpoint = st.session_state.endpoint_to_use
-    cache_key = f"models:{endpoint}"
+    options = get_model_cache().get_or_load(endpoint, MODEL_LISTERS[endpoint])
 
-    if redis_client.exists(cache_key):
-        return redis_client.lrange(cache_key, 0, -1)
-
-    if endpoint == "ollama":
-        ollama_options = list_ollama_models()
-        if not ollama_options:
-            st.warning("No Ollama models found. Visit https://ollama.com/library and pull one with /pull <model_name>")
-        if ollama_options:
-            redis_client.rpush(cache_key, *ollama_options)
-        return ollama_options
-
-    elif endpoint == "openai":
-        openai_options = list_openai_models()
-        if openai_options:
-            redis_client.rpush(cache_key, *openai_options)
-        return openai_options
+    if endpoint == "ollama" and not options:
+        st.warning("No Ollama models found. Visit https://ollama.com/library and pull one with /pull <model_name>")
+    elif endpoint == "openai" and not options:
+        st.warning("No OpenAI models available. Check OPENAI_API_KEY and connectivity.")
+    return options
 
 
 def update_model_options():
@@ -130,6 +275,8 @@ def main():
     )
     #  Author: UjjwalS (https://www.ujjwalsaini.dev)
     st.write(css, unsafe_allow_html=True)
+    start_prefetch()
+    start_metrics_server()
 
     st.title("Neura-Nix: Multimodal Assistant")
 
@@ -187,6 +334,7 @@ def main():
     api_col, model_col = st.sidebar.columns(2)
     api_col.selectbox("Provider", ["ollama", "openai"], key="endpoint_to_use", on_change=update_model_options)
     model_col.selectbox("Model", st.session_state.model_options, key="model_to_use")
+    warm_up_selected_model()
 
     pdf_toggle_col, voice_rec_col = st.sidebar.columns(2)
     pdf_toggle_col.toggle("Enable PDF Chat", key="pdf_chat", value=False, on_change=clear_cache)
@@ -211,58 +359,64 @@ def main():
     # Process Uploaded Files
     # ---------------------------
     if uploaded_pdf:
-        with st.spinner("Processing PDF..."):
-            add_documents_to_db(uploaded_pdf)
-            st.session_state.pdf_uploader_key += 2
+        submit_pdfs(uploaded_pdf)
+        st.session_state.pdf_uploader_key += 2
+    ingestion_status()
 
+    # Each turn is one trace (utils/tracing.py): transcription, retrieval, LLM and SQLite nest under it.
     if voice_recording:
-        transcribed_audio = transcribe_audio(voice_recording["bytes"])
-        llm_answer = ChatAPIHandler.chat(
-            user_input=transcribed_audio,
-            chat_history=load_last_k_text_messages_ollama(get_session_key(), config["chat_config"]["chat_memory_length"])
-        )
-        save_audio_message(get_session_key(), "user", voice_recording["bytes"])
-        save_text_message(get_session_key(), "assistant", llm_answer)
+        with overload_notice(), turn("chat_turn", session=get_session_key(), kind="voice"):
+            transcribed_audio = transcribe_audio(voice_recording["bytes"])
+            llm_answer = ChatAPIHandler.chat(
+                user_input=transcribed_audio,
+                chat_history=load_chat_context(get_session_key())
+            )
+            save_audio_message(get_session_key(), "user", voice_recording["bytes"])
+            save_text_message(get_session_key(), "assistant", llm_answer)
+            summarize_session()
 
     if user_input:
-        if user_input.startswith("/"):
-            response = command(user_input)
-            save_text_message(get_session_key(), "user", user_input)
-            save_text_message(get_session_key(), "assistant", response)
-            user_input = None
-
-        elif uploaded_image:
-            with st.spinner("Processing image..."):
+        kind = "command" if user_input.startswith("/") else "image" if uploaded_image else "audio" if uploaded_audio else "text"
+        with overload_notice(), turn("chat_turn", session=get_session_key(), kind=kind):
+            if user_input.startswith("/"):
+                response = command(user_input)
+                save_text_message(get_session_key(), "user", user_input)
+                save_text_message(get_session_key(), "assistant", response)
+                user_input = None
+
+            elif uploaded_image:
+                with st.spinner("Processing image..."):
+                    llm_answer = ChatAPIHandler.chat(
+                        user_input=user_input,
+                        chat_history=[],
+                        image=uploaded_image.getvalue()
+                    )
+                    save_text_message(get_session_key(), "user", user_input)
+                    save_image_message(get_session_key(), "user", uploaded_image.getvalue())
+                    save_text_message(get_session_key(), "assistant", llm_answer)
+                    user_input = None
+
+            elif uploaded_audio:
+                transcribed_audio = transcribe_audio(uploaded_audio.getvalue())
                 llm_answer = ChatAPIHandler.chat(
-                    user_input=user_input,
-                    chat_history=[],
-                    image=uploaded_image.getvalue()
+                    user_input=user_input + "\n" + transcribed_audio,
+                    chat_history=[]
                 )
                 save_text_message(get_session_key(), "user", user_input)
-                save_image_message(get_session_key(), "user", uploaded_image.getvalue())
+                save_audio_message(get_session_key(), "user", uploaded_audio.getvalue())
                 save_text_message(get_session_key(), "assistant", llm_answer)
+                st.session_state.audio_uploader_key += 2
                 user_input = None
 
-        elif uploaded_audio:
-            transcribed_audio = transcribe_audio(uploaded_audio.getvalue())
-            llm_answer = ChatAPIHandler.chat(
-                user_input=user_input + "\n" + transcribed_audio,
-                chat_history=[]
-            )
-            save_text_message(get_session_key(), "user", user_input)
-            save_audio_message(get_session_key(), "user", uploaded_audio.getvalue())
-            save_text_message(get_session_key(), "assistant", llm_answer)
-            st.session_state.audio_uploader_key += 2
-            user_input = None
-
-        elif user_input:
-            llm_answer = ChatAPIHandler.chat(
-                user_input=user_input,
-                chat_history=load_last_k_text_messages_ollama(get_session_key(), config["chat_config"]["chat_memory_length"])
-            )
-            save_text_message(get_session_key(), "user", user_input)
-            save_text_message(get_session_key(), "assistant", llm_answer)
-            user_input = None
+            elif user_input:
+                llm_answer = ChatAPIHandler.chat(
+                    user_input=user_input,
+                    chat_history=load_chat_context(get_session_key())
+                )
+                save_text_message(get_session_key(), "user", user_input)
+                save_text_message(get_session_key(), "assistant", llm_answer)
+                summarize_session()
+                user_input = None
 
     # ---------------------------
     # Display Chat History
@@ -0,0 +1,70 @@
+"""A retried ingest must overwrite what a failed attempt already stored, not duplicate it."""
+import os
+import sys
+import uuid
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for sub in ("", "database", "ingestionPipeline"):
+    sys.path.insert(0, os.path.join(ROOT, sub))
+
+for mod in ("pypdfium2", "chromadb", "langchain_chroma", "langchain", "streamlit", "yaml"):
+    pytest.importorskip(mod)
+
+
+class FakeStore:
+    """Chroma's add semantics: rows keyed by id (upsert), random UUIDs when no ids are given."""
+
+    def __init__(self, fail_on_call=None):
+        self.rows = {}
+        self.calls = 0
+        self.fail_on_call = fail_on_call
+
+    def add_documents(self, documents, ids=None):
+        self.calls += 1
+        if self.calls == self.fail_on_call:
+            raise ConnectionError("vector store went away")
+        for doc_id, doc in zip(ids or [str(uuid.uuid4()) for _ in documents], documents):
+            self.rows[doc_id] = doc
+
+    def count(self):
+        return len(self.rows)
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    monkeypatch.chdir(ROOT)  # utils reads config.yaml from the working directory
+    import Pdf_IngestionPipeline as pipeline
+
+    monkeypatch.setattr(pipeline, "invalidate_fast_retriever", lambda: None)
+    monkeypatch.setattr(pipeline.summary_index, "schedule", lambda *a, **k: 0)
+    monkeypatch.setattr(pipeline, "extract_text_from_pdf", lambda src: " ".join(f"sentence {i}." for i in range(400)))
+    return pipeline
+
+
+def _ingestor(pipeline, store):
+    cfg = pipeline.AppCfg.from_dict(
+        {
+            "pdf_text_splitter": {"chunk_size": 200, "overlap": 0},
+            "redis": {"enabled": False},
+            "dedup": {"enabled": False},
+            "ingestion": {"batch_size": 4, "max_retries": 0, "backoff_seconds": 0},
+        }
+    )
+    return pipeline.PDFIngestor(cfg, vdb=store)
+
+
+def test_retry_after_partial_add_does_not_duplicate(pipeline):
+    pdf = b"%PDF-1.4 retry test"
+    clean = FakeStore()
+    chunks = _ingestor(pipeline, clean).ingest_many([pdf])
+    assert clean.count() == chunks > 8
+
+    store = FakeStore(fail_on_call=3)  # two batches land, the third fails the job
+    with pytest.raises(ConnectionError):
+        _ingestor(pipeline, store).ingest_many([pdf])
+    assert 0 < store.count() < chunks
+
+    _ingestor(pipeline, store).ingest_many([pdf])
+    assert store.count() == clean.count()
@@ -5,7 +5,6 @@ import yaml
 import logging
 import asyncio
 import requests
-import aiohttp
 import streamlit as st
 from datetime import datetime
 from dotenv import load_dotenv
@@ -13,6 +12,10 @@ from typing import List, Dict, Optional, Any
 
 load_dotenv()
 
+# This module shares its name with the utils/ directory and shadows it on sys.path;
+# giving it a __path__ lets `utils.cache_handler`, `utils.metrics`, ... resolve there.
+__path__ = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "utils")]
+
 # ==================================================================
 #  Project   : Neura-Nix - Multimodal AI Assistant {Ollama MultiRag}
 #  Author    : UjjwalS (https://www.ujjwalsaini.dev)
@@ -30,12 +33,16 @@ config = load_config()
 
 #  Author: UjjwalS (https://www.ujjwalsaini.dev)
 def timeit(func):
+    from utils.metrics import FUNCTION_SECONDS
+
     def wrapper(*args, **kwargs):
-        start_time = time.time()
-        result = func(*args, **kwargs)
-        duration = time.time() - start_time
-        logger.info("Function '%s' executed in %.4f seconds", func.__name__, duration)
-        return result
+        start_time = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            duration = time.perf_counter() - start_time
+            FUNCTION_SECONDS.observe(duration, function=func.__name__)
+            logger.info("Function '%s' executed in %.4f seconds", func.__name__, duration)
     return wrapper
 
 # ---------------------------
@@ -84,6 +91,7 @@ def pull_ollama_model(model_name: str) -> Dict[str, Any]:
 async def pull_ollama_model_async(model_name: str, stream: bool = True, retries: int = 1) -> str:
     url = f"{config['ollama']['base_url']}/api/pull"
     payload = {"model": model_name, "stream": stream}
+    import aiohttp  # only needed for /pull; kept off the app's import path
 
     for attempt in range(1, retries + 1):
         try:
@@ -123,25 +131,67 @@ def pull_model_in_background(model_name: str, stream: bool = False):
 # ---------------------------
 # Model Listing
 # ---------------------------
+# Listings may run on a background refresh thread, so they log instead of calling st.* and
+# never wait longer than this on a slow or unreachable provider.
+MODEL_LIST_TIMEOUT = config.get("model_cache", {}).get("request_timeout_seconds", 5)
+
 def list_openai_models() -> List[str]:
     api_key = os.getenv("OPENAI_API_KEY")
     headers = {"Authorization": f"Bearer {api_key}"}
-    response = requests.get("https://api.openai.com/v1/models", headers=headers)
+    try:
+        base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+        response = requests.get(f"{base_url}/models", headers=headers, timeout=MODEL_LIST_TIMEOUT)
+    except requests.RequestException as e:
+        logger.warning("OpenAI model listing failed: %s", e)
+        return []
 
     if response.status_code != 200:
-        st.warning("OpenAI error: " + response.text)
+        logger.warning("OpenAI error: %s", response.text)
         return []
 
     return [m["id"] for m in response.json().get("data", [])]
 
 #  Author: UjjwalS (https://www.ujjwalsaini.dev)
 def list_ollama_models() -> List[str]:
-    url = f"{config['ollama']['base_url']}/api/tags"
-    response = requests.get(url).json()
-    if response.get("error"):
-        return []
-    return [m["name"] for m in response.get("models", []) if "embed" not in m["name"]]
+    names: List[str] = []
+    for base_url in ollama_endpoints(config.get("ollama", {})):
+        try:
+            response = requests.get(f"{base_url}/api/tags", timeout=MODEL_LIST_TIMEOUT).json()
+        except (requests.RequestException, ValueError) as e:
+            logger.warning("Ollama model listing failed for %s: %s", base_url, e)
+            continue
+        if response.get("error"):
+            continue
+        names += [m["name"] for m in response.get("models", []) if "embed" not in m["name"] and m["name"] not in names]
+    return names
+
 
+def ollama_endpoints(ollama_cfg: Dict[str, Any]) -> List[str]:
+    """Base URLs of the Ollama hosts chat traffic is spread over: ``endpoints``, else ``base_url``."""
+    urls = ollama_cfg.get("endpoints") or [ollama_cfg.get("base_url", "http://localhost:11434")]
+    return [url.rstrip("/") for url in urls]
+
+
+# ---------------------------
+# Ollama Model Parameters
+# ---------------------------
+def ollama_model_params(model: str) -> Dict[str, Any]:
+    """
+    ``keep_alive`` and ``options`` to send with every Ollama request for ``model``:
+    the ``ollama`` section's defaults, overridden by its ``models`` entry matched by
+    full name, then by name without the tag.
+    """
+    ollama_cfg = config.get("ollama", {})
+    per_model = ollama_cfg.get("models") or {}
+    override = per_model.get(model) or per_model.get(model.split(":", 1)[0]) or {}
+    params: Dict[str, Any] = {}
+    keep_alive = override.get("keep_alive_seconds", ollama_cfg.get("keep_alive_seconds"))
+    if keep_alive is not None:
+        params["keep_alive"] = int(keep_alive)
+    options = {**(ollama_cfg.get("options") or {}), **(override.get("options") or {})}
+    if options:
+        params["options"] = options
+    return params
 
 # ---------------------------
 # Utility Helpers
@@ -150,6 +200,9 @@ def convert_bytes_to_base64(image_bytes: bytes, with_prefix: bool = False) -> st
     b64 = base64.b64encode(image_bytes).decode("utf-8")
     return f"data:image/jpeg;base64,{b64}" if with_prefix else b64
 
+def convert_bytes_to_base64_with_prefix(image_bytes: bytes) -> str:
+    return convert_bytes_to_base64(image_bytes, with_prefix=True)
+
 #  Author: UjjwalS (https://www.ujjwalsaini.dev)
 def convert_ns_to_seconds(ns_value: int) -> float:
     return ns_value / 1_000_000_000
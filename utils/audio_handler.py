@@ -2,11 +2,14 @@ import io
 import logging
 import subprocess
 import tempfile
+import time
 import librosa
 from typing import Union
 from functools import lru_cache
 from transformers import pipeline
 from utils import load_config, timeit
+from utils.metrics import ASR_AUDIO_SECONDS_TOTAL, ASR_REAL_TIME_FACTOR, ASR_SECONDS
+from utils.tracing import set_attributes, span, traced
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 logger = logging.getLogger(__name__)
@@ -75,13 +78,25 @@ def get_asr_pipeline(device: Union[int, str] = "cpu"):
 
 #  Author: UjjwalS (https://www.ujjwalsaini.dev)
 @timeit
+@traced("transcribe_audio")
 def transcribe_audio(audio_bytes: bytes, device: str = "cpu") -> str:
     try:
-        audio_array, sr = convert_bytes_to_array(audio_bytes)
-        logger.info("Audio loaded (sample_rate=%d, duration=%.2fs)", sr, len(audio_array) / sr)
-
-        asr = get_asr_pipeline(device)
-        prediction = asr(audio_array, batch_size=1)
+        with span("decode_audio", bytes=len(audio_bytes)):
+            audio_array, sr = convert_bytes_to_array(audio_bytes)
+        duration = len(audio_array) / sr
+        logger.info("Audio loaded (sample_rate=%d, duration=%.2fs)", sr, duration)
+
+        with span("load_asr_pipeline"):
+            asr = get_asr_pipeline(device)
+        t0 = time.perf_counter()
+        with span("asr", audio_s=round(duration, 2)):
+            prediction = asr(audio_array, batch_size=1)
+        elapsed = time.perf_counter() - t0
+        set_attributes(audio_s=round(duration, 2), rtf=round(elapsed / duration, 3) if duration > 0 else None)
+        ASR_SECONDS.observe(elapsed)
+        ASR_AUDIO_SECONDS_TOTAL.inc(duration)
+        if duration > 0:
+            ASR_REAL_TIME_FACTOR.observe(elapsed / duration)
 
         return prediction.get("text", "").strip()
 
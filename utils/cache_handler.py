@@ -0,0 +1,445 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+try:
+    import redis  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    redis = None
+
+from utils.metrics import CACHE_REQUESTS_TOTAL
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------
+# Config
+# ---------------------------
+@dataclass(frozen=True)
+class RedisCfg:
+    enabled: bool = False
+    host: str = "localhost"
+    port: int = 6379
+    db: int = 0
+    password: Optional[str] = None
+    ssl: bool = False
+    ttl_seconds: int = 7 * 24 * 3600
+    socket_timeout: float = 0.5
+    failure_threshold: int = 1
+    health_check_interval: float = 5.0
+    local_max_bytes: int = 64 * 1024 * 1024
+
+    @staticmethod
+    def from_dict(d: Optional[Dict[str, Any]]) -> "RedisCfg":
+        """Build from the ``redis`` config section; REDIS_* env vars take precedence."""
+        rc = d or {}
+        return RedisCfg(
+            enabled=bool(rc.get("enabled", False)),
+            host=os.getenv("REDIS_HOST", str(rc.get("host", "localhost"))),
+            port=int(os.getenv("REDIS_PORT", rc.get("port", 6379))),
+            db=int(rc.get("db", 0)),
+            password=os.getenv("REDIS_PASSWORD", rc.get("password")),
+            ssl=os.getenv("REDIS_SSL", str(rc.get("ssl", False))).lower() in ("1", "true", "yes"),
+            ttl_seconds=int(rc.get("ttl_seconds", 7 * 24 * 3600)),
+            socket_timeout=float(rc.get("socket_timeout", 0.5)),
+            failure_threshold=int(rc.get("failure_threshold", 1)),
+            health_check_interval=float(rc.get("health_check_interval", 5.0)),
+            local_max_bytes=int(rc.get("local_max_bytes", 64 * 1024 * 1024)),
+        )
+
+
+# ---------------------------
+# Circuit breaker
+# ---------------------------
+class CircuitBreaker:
+    """
+    Closed -> requests go to Redis. Open -> requests skip Redis entirely.
+
+    Only the background health check closes the breaker again, so a request
+    never pays for probing a dead server.
+    """
+
+    def __init__(self, failure_threshold: int = 1):
+        self.failure_threshold = max(1, failure_threshold)
+        self._failures = 0
+        self._open = True  # unknown until the first health check succeeds
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._open
+
+    def allow(self) -> bool:
+        return not self._open
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if not self._open and self._failures >= self.failure_threshold:
+                self._open = True
+                logger.warning("Redis circuit opened after %d failure(s); using local cache", self._failures)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._open:
+                logger.info("Redis circuit closed; shared cache available")
+            self._open = False
+            self._failures = 0
+
+    def trip(self) -> None:
+        with self._lock:
+            self._open = True
+
+
+# ---------------------------
+# Local LRU fallback
+# ---------------------------
+class LRUCache:
+    """Byte-bounded, thread-safe LRU for ``bytes`` values with per-entry TTL."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                self._pop(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._pop(key)
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._pop(oldest)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._pop(key)
+
+    def _pop(self, key: str) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[0])
+
+
+# ---------------------------
+# Shared cache: Redis behind a circuit breaker, local LRU fallback
+# ---------------------------
+def _to_bytes(value: Union[bytes, str]) -> bytes:
+    return value.encode("utf-8") if isinstance(value, str) else bytes(value)
+
+
+class ResilientCache:
+    """
+    Byte-oriented cache used by the UI and the ingestion pipeline.
+
+    All operations are best-effort and never raise. When Redis is disabled,
+    not installed, or the breaker is open, reads and writes go to a local LRU
+    instead; a daemon thread pings Redis and closes the breaker on recovery.
+    """
+
+    def __init__(self, cfg: RedisCfg):
+        self.cfg = cfg
+        self.local = LRUCache(cfg.local_max_bytes)
+        self.breaker = CircuitBreaker(cfg.failure_threshold)
+        self.client = None
+        if cfg.enabled:
+            if redis is None:
+                logger.warning("Redis not installed, using local cache only.")
+            else:
+                self.client = redis.Redis(
+                    host=cfg.host,
+                    port=cfg.port,
+                    db=cfg.db,
+                    password=cfg.password,
+                    ssl=cfg.ssl,
+                    socket_timeout=cfg.socket_timeout,
+                    socket_connect_timeout=cfg.socket_timeout,
+                )
+                threading.Thread(target=self._health_loop, name="redis-health", daemon=True).start()
+
+    @property
+    def available(self) -> bool:
+        return self.client is not None and self.breaker.allow()
+
+    def _health_loop(self) -> None:
+        while True:
+            try:
+                self.client.ping()
+                self.breaker.close()
+            except Exception as e:
+                if not self.breaker.is_open:
+                    logger.warning("Redis health check failed: %s", repr(e))
+                self.breaker.trip()
+            time.sleep(self.cfg.health_check_interval)
+
+    def _redis_call(self, op: str, fn: Callable[[], Any]) -> Tuple[bool, Any]:
+        if not self.available:
+            return False, None
+        try:
+            result = fn()
+            self.breaker.record_success()
+            return True, result
+        except Exception as e:
+            logger.warning("Redis %s failed: %s", op, repr(e))
+            self.breaker.record_failure()
+            return False, None
+
+    def get(self, key: str) -> Optional[bytes]:
+        ok, value = self._redis_call("GET", lambda: self.client.get(key))
+        if ok:
+            return value
+        return self.local.get(key)
+
+    def set(self, key: str, value: Union[bytes, str], ttl: Optional[int] = None) -> None:
+        value = _to_bytes(value)
+        ttl = ttl or self.cfg.ttl_seconds
+        ok, _ = self._redis_call("SET", lambda: self.client.set(key, value, ex=ttl))
+        if not ok:
+            self.local.set(key, value, ttl)
+
+    def delete(self, key: str) -> None:
+        self.local.delete(key)
+        self._redis_call("DEL", lambda: self.client.delete(key))
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        """Fetch many keys in a single MGET round-trip; result order matches ``keys``."""
+        if not keys:
+            return []
+        ok, values = self._redis_call("MGET", lambda: self.client.mget(list(keys)))
+        if ok:
+            return list(values)
+        return [self.local.get(k) for k in keys]
+
+    def set_many(self, mapping: Dict[str, Union[bytes, str]], ttl: Optional[int] = None) -> None:
+        """Write many keys with one pipelined round-trip (SET ... EX per key)."""
+        if not mapping:
+            return
+        ttl = ttl or self.cfg.ttl_seconds
+        items = {k: _to_bytes(v) for k, v in mapping.items()}
+
+        def _pipeline() -> None:
+            pipe = self.client.pipeline(transaction=False)
+            for k, v in items.items():
+                pipe.set(k, v, ex=ttl)
+            pipe.execute()
+
+        ok, _ = self._redis_call("pipeline SET", _pipeline)
+        if not ok:
+            for k, v in items.items():
+                self.local.set(k, v, ttl)
+
+
+@lru_cache(maxsize=None)
+def get_shared_cache(cfg: RedisCfg) -> ResilientCache:
+    """One cache (and one health-check thread) per distinct Redis config in this process."""
+    return ResilientCache(cfg)
+
+# ---------------------------
+# In-process tier
+# ---------------------------
+class TTLCache:
+    """
+    Small thread-safe LRU where every entry carries its own fresh/expiry deadlines.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Tuple[Any, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Return (value, fresh_until) or None when missing/expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, fresh_until, expires_at = entry
+            if now >= expires_at:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value, fresh_until
+
+    def set(self, key: str, value: Any, fresh_for: float, expires_in: float) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._data[key] = (value, now + fresh_for, now + max(fresh_for, expires_in))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def mark_stale(self, key: str) -> None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, _, expires_at = entry
+                self._data[key] = (value, 0.0, expires_at)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+
+# ---------------------------
+# Tiered cache: in-process TTL -> namespaced Redis -> loader
+# ---------------------------
+class TieredCache:
+    """
+    Stale-while-revalidate cache for small JSON-serialisable values.
+
+    Reads are served from the in-process tier first, then from the shared
+    ``backend`` (normally a ResilientCache) under ``<namespace>:<key>``. A stale
+    hit is returned immediately and refreshed on a background thread, so only a
+    completely cold key ever waits on ``loader``.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        backend: Optional[ResilientCache] = None,
+        fresh_ttl: int = 300,
+        stale_ttl: int = 24 * 3600,
+        local_ttl: int = 30,
+        negative_ttl: int = 15,
+        max_workers: int = 2,
+    ):
+        self.namespace = namespace
+        self.backend = backend
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = stale_ttl
+        self.local_ttl = min(local_ttl, fresh_ttl)
+        self.negative_ttl = negative_ttl
+        self._local = TTLCache()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{namespace}-refresh")
+        self._inflight: Set[str] = set()
+        self._inflight_lock = threading.Lock()
+
+    def _shared_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    # --- Shared tier ------------------------------------------------
+    def _shared_get(self, key: str) -> Optional[Dict[str, Any]]:
+        if self.backend is None:
+            return None
+        raw = self.backend.get(self._shared_key(key))
+        if raw is None:
+            return None
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
+
+    def _shared_set(self, key: str, value: Any, fetched_at: float) -> None:
+        if self.backend is None:
+            return
+        payload = json.dumps({"value": value, "fetched_at": fetched_at})
+        self.backend.set(self._shared_key(key), payload, ttl=self.stale_ttl)
+
+    def _shared_delete(self, key: str) -> None:
+        if self.backend is not None:
+            self.backend.delete(self._shared_key(key))
+
+    # --- Loading ----------------------------------------------------
+    def _store(self, key: str, value: Any, fetched_at: float) -> None:
+        if not value:
+            # Don't pin an empty listing; retry after a short back-off instead.
+            self._local.set(key, value, self.negative_ttl, self.negative_ttl)
+            return
+        # A full local TTL, but never fresh for longer than the shared copy itself is.
+        age = max(0.0, time.time() - fetched_at)
+        self._local.set(key, value, max(0.0, min(self.local_ttl, self.fresh_ttl - age)), self.stale_ttl - age)
+
+    def refresh(self, key: str, loader: Callable[[], Any]) -> Any:
+        """Run ``loader`` now and write the result through both tiers."""
+        value = loader()
+        fetched_at = time.time()
+        self._store(key, value, fetched_at)
+        if value:
+            self._shared_set(key, value, fetched_at)
+        return value
+
+    def _refresh_quietly(self, key: str, loader: Callable[[], Any], force: bool) -> None:
+        try:
+            shared = None if force else self._shared_get(key)
+            if shared is not None and time.time() - float(shared.get("fetched_at", 0)) < self.fresh_ttl:
+                # Another process already refreshed the shared tier.
+                self._store(key, shared.get("value"), float(shared["fetched_at"]))
+            else:
+                self.refresh(key, loader)
+        except Exception as e:
+            logger.warning("Background refresh of %s failed, serving stale value: %s", key, e)
+        finally:
+            with self._inflight_lock:
+                self._inflight.discard(key)
+
+    def schedule_refresh(self, key: str, loader: Callable[[], Any], force: bool = False) -> bool:
+        """Queue a background refresh unless one is already running for ``key``."""
+        with self._inflight_lock:
+            if key in self._inflight:
+                return False
+            self._inflight.add(key)
+        self._executor.submit(self._refresh_quietly, key, loader, force)
+        return True
+
+    def get_or_load(self, key: str, loader: Callable[[], Any]) -> Any:
+        local = self._local.get(key)
+        if local is not None:
+            value, fresh_until = local
+            stale = time.monotonic() >= fresh_until
+            if stale:
+                self.schedule_refresh(key, loader)
+            CACHE_REQUESTS_TOTAL.inc(cache=f"{self.namespace}:local", result="stale" if stale else "hit")
+            return value
+
+        shared = self._shared_get(key)
+        if shared is not None:
+            value, fetched_at = shared.get("value"), float(shared.get("fetched_at", 0))
+            self._store(key, value, fetched_at)
+            stale = time.time() - fetched_at >= self.fresh_ttl
+            if stale:
+                self.schedule_refresh(key, loader)
+            CACHE_REQUESTS_TOTAL.inc(cache=f"{self.namespace}:shared", result="stale" if stale else "hit")
+            return value
+
+        CACHE_REQUESTS_TOTAL.inc(cache=f"{self.namespace}:shared", result="miss")
+        logger.info("Cold cache miss for %s, loading synchronously", key)
+        return self.refresh(key, loader)
+
+    # --- Invalidation -----------------------------------------------
+    def invalidate(self, key: str) -> None:
+        """Drop ``key`` from both tiers. Never touches any other key."""
+        self._local.delete(key)
+        self._shared_delete(key)
+
+    def revalidate(self, key: str, loader: Callable[[], Any]) -> None:
+        """Keep serving the current value for ``key`` but refresh it in the background."""
+        self._local.mark_stale(key)
+        self.schedule_refresh(key, loader, force=True)
@@ -0,0 +1,379 @@
+"""
+In-process metrics with a Prometheus text endpoint.
+
+Counters and histograms are plain Python objects guarded by a lock, so recording
+is cheap enough for every request and needs no third-party client. Each process
+(the Streamlit app, every API and ingestion worker) keeps its own registry and
+serves it from a small ``ThreadingHTTPServer`` on ``GET /metrics``; nginx routes
+``/metrics`` to the app's port. Worker processes bind ``worker_port`` upwards.
+
+    from utils.metrics import RETRIEVAL_SECONDS
+    with RETRIEVAL_SECONDS.time(backend="chroma"):
+        docs = vector_db.similarity_search(query, k=5)
+
+Every metric the app records is declared at the bottom of this module, so the
+full catalogue lives in one place.
+"""
+from __future__ import annotations
+
+import bisect
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+RATIO_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 4.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+
+# ---------------------------
+# Config
+# ---------------------------
+@dataclass(frozen=True)
+class MetricsCfg:
+    enabled: bool = True
+    host: str = "0.0.0.0"
+    port: int = 9464
+    worker_port: int = 9465
+
+    @staticmethod
+    def from_dict(d: Optional[Dict[str, Any]]) -> "MetricsCfg":
+        """Build from the ``metrics`` config section; METRICS_PORT overrides the app port."""
+        mc = d or {}
+        return MetricsCfg(
+            enabled=bool(mc.get("enabled", True)),
+            host=str(mc.get("host", "0.0.0.0")),
+            port=int(os.getenv("METRICS_PORT", mc.get("port", 9464))),
+            worker_port=int(mc.get("worker_port", 9465)),
+        )
+
+
+# ---------------------------
+# Metric types
+# ---------------------------
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing total, one series per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        if amount < 0:
+            raise ValueError("counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = self._header()
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, buckets: int):
+        self.counts = [0] * buckets
+        self.total = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram; ``histogram_quantile`` gives p50/p95/p99 from it."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        self._series: Dict[LabelValues, _HistogramSeries] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        slot = bisect.bisect_left(self.buckets, value)  # le semantics: value <= bound
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HistogramSeries(len(self.buckets) + 1)
+            series.counts[slot] += 1
+            series.total += value
+            series.count += 1
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """Observe the wall time of the ``with`` block, also when it raises."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def snapshot(self, **labels: Any) -> Tuple[int, float]:
+        """(count, sum) of one series; handy for benchmarks and tests."""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return (series.count, series.total) if series else (0, 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(
+                (key, list(s.counts), s.total, s.count) for key, s in self._series.items()
+            )
+        lines = self._header()
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+# ---------------------------
+# Registry
+# ---------------------------
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"metric {metric.name} already registered with a different shape")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# ---------------------------
+# HTTP endpoint
+# ---------------------------
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: Registry = REGISTRY
+
+    def do_GET(self) -> None:  # noqa: N802 - http.server naming
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path in ("", "/metrics"):
+            body = self.registry.render().encode("utf-8")
+            content_type = CONTENT_TYPE
+        elif path == "/health":
+            body, content_type = b"OK\n", "text/plain"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:  # scrapes every few seconds; keep the log quiet
+        pass
+
+
+def start_http_server(host: str, port: int, attempts: int = 1, registry: Registry = REGISTRY) -> Optional[ThreadingHTTPServer]:
+    """
+    Serve ``registry`` on the first free port in ``[port, port + attempts)`` from a
+    daemon thread. Returns None (and logs) when every port is taken.
+    """
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    for candidate in range(port, port + max(1, attempts)):
+        try:
+            server = ThreadingHTTPServer((host, candidate), handler)
+        except OSError:
+            continue
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name=f"metrics-{candidate}", daemon=True).start()
+        logger.info("Metrics endpoint listening on %s:%d/metrics", host, candidate)
+        return server
+    logger.warning("Metrics endpoint disabled: ports %d-%d are in use", port, port + max(1, attempts) - 1)
+    return None
+
+
+# ---------------------------
+# Catalogue
+# ---------------------------
+LLM_REQUEST_SECONDS = REGISTRY.histogram(
+    "neuranix_llm_request_seconds", "Wall time of a chat completion call.", ("provider", "model")
+)
+LLM_PHASE_SECONDS = REGISTRY.histogram(
+    "neuranix_llm_phase_seconds",
+    "Ollama-reported durations per phase (load, prompt_eval, eval).",
+    ("model", "phase"),
+)
+LLM_TTFT_SECONDS = REGISTRY.histogram(
+    "neuranix_llm_time_to_first_token_seconds",
+    "Time until the first generated token; load + prompt_eval for non-streamed Ollama calls.",
+    ("provider", "model"),
+)
+LLM_TOKENS_TOTAL = REGISTRY.counter(
+    "neuranix_llm_tokens_total", "Tokens processed by the LLM (prompt or eval).", ("model", "kind")
+)
+LLM_ERRORS_TOTAL = REGISTRY.counter("neuranix_llm_errors_total", "Failed chat completion calls.", ("provider",))
+
+RETRIEVAL_SECONDS = REGISTRY.histogram(
+    "neuranix_retrieval_seconds", "Similarity search latency, query embedding included.", ("backend",)
+)
+EMBEDDING_BATCH_SECONDS = REGISTRY.histogram(
+    "neuranix_embedding_batch_seconds", "Latency of one embedding request.", ("kind",)
+)
+EMBEDDING_BATCH_SIZE = REGISTRY.histogram(
+    "neuranix_embedding_batch_size", "Texts per embedding request.", ("kind",), SIZE_BUCKETS
+)
+RETRIEVAL_BATCH_SIZE = REGISTRY.histogram(
+    "neuranix_retrieval_batch_size", "Queries per batched similarity search (retrieval_service).", (), SIZE_BUCKETS
+)
+
+INDEX_ENTRIES_DELETED_TOTAL = REGISTRY.counter(
+    "neuranix_index_entries_deleted_total",
+    "Vector store entries removed by index_maintenance, by reason (delete, expire).",
+    ("reason",),
+)
+
+CACHE_REQUESTS_TOTAL = REGISTRY.counter(
+    "neuranix_cache_requests_total", "Cache lookups by cache and result (hit, stale, partial, miss).", ("cache", "result")
+)
+
+SQLITE_QUERY_SECONDS = REGISTRY.histogram(
+    "neuranix_sqlite_query_seconds", "SQLite statement latency, commit included.", ("db", "op")
+)
+
+ASR_SECONDS = REGISTRY.histogram("neuranix_asr_seconds", "Speech-to-text latency per clip.")
+ASR_AUDIO_SECONDS_TOTAL = REGISTRY.counter("neuranix_asr_audio_seconds_total", "Seconds of audio transcribed.")
+ASR_REAL_TIME_FACTOR = REGISTRY.histogram(
+    "neuranix_asr_real_time_factor", "Transcription time divided by audio duration.", (), RATIO_BUCKETS
+)
+
+INGEST_STAGE_SECONDS = REGISTRY.histogram(
+    "neuranix_ingest_stage_seconds", "Time spent in each ingestion stage.", ("stage",)
+)
+INGEST_ITEMS_TOTAL = REGISTRY.counter(
+    "neuranix_ingest_items_total",
+    "Ingestion throughput: pdfs and bytes extracted, chunks produced, embedded or dropped as duplicates.",
+    ("stage", "unit"),
+)
+
+OLLAMA_ROUTED_TOTAL = REGISTRY.counter(
+    "neuranix_ollama_routed_total",
+    "Ollama requests per node, by why the node was chosen (loaded, available, fallback).",
+    ("node", "reason"),
+)
+OLLAMA_NODE_FAILURES_TOTAL = REGISTRY.counter(
+    "neuranix_ollama_node_failures_total", "Ollama requests that could not reach their node.", ("node",)
+)
+
+ADMISSION_WAIT_SECONDS = REGISTRY.histogram(
+    "neuranix_admission_wait_seconds",
+    "Time LLM calls waited for an admission slot, by priority (interactive, background, bulk).",
+    ("model", "priority"),
+)
+ADMISSION_REJECTED_TOTAL = REGISTRY.counter(
+    "neuranix_admission_rejected_total",
+    "LLM calls refused by admission control (queue_full, shed, timeout).",
+    ("model", "priority", "reason"),
+)
+
+API_REQUEST_SECONDS = REGISTRY.histogram(
+    "neuranix_api_request_seconds",
+    "HTTP API latency by route and status; streamed responses until their headers are sent.",
+    ("method", "route", "status"),
+)
+
+FUNCTION_SECONDS = REGISTRY.histogram(
+    "neuranix_function_seconds", "Duration of functions decorated with utils.timeit.", ("function",)
+)
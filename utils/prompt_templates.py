@@ -1,3 +1,16 @@
+# Sent first on every chat request and never changes between turns, so Ollama can reuse its
+# KV cache for it (and for the summary and history that follow) instead of re-evaluating it.
+system_prompt = """You are Neura-Nix, a helpful multimodal AI assistant.
+Always be concise, truthful, and polite.
+Use the conversation so far to maintain context, and when document context is provided, answer from it;
+if it does not contain the answer, say so instead of making up facts."""
+
+# Volatile retrieval context goes last, after the question, so everything before it stays cacheable.
+rag_user_template = """{human_input}
+
+Answer the question above based on this context:
+{context}"""
+
 memory_prompt_template = """<s>[INST] 
 You are an AI assistant having a helpful and safe conversation with a human. 
 Always be concise, truthful, and polite. 
@@ -29,3 +42,39 @@ User question:
 {human_input}
 
 Answer:"""
+
+
+summary_prompt_template = """<s>[INST] 
+Progressively summarize the conversation between a human and an AI assistant.
+Extend the current summary with the new lines and reply with the new summary only, in at most {max_words} words.
+Keep names, facts, decisions and open questions; drop greetings and filler.
+[/INST]
+
+Current summary:
+{summary}
+
+New lines of conversation:
+{new_lines}
+
+New summary:"""
+
+summary_message_template = """Summary of the earlier conversation:
+{summary}"""
+
+# Ingest-time summaries (ingestionPipeline/summary_index.py): embedded and retrieved for overview questions.
+section_summary_prompt_template = """Summarize this section of a document in at most {max_words} words.
+Keep its topic, key facts, figures and conclusions; reply with the summary only.
+
+Section:
+{text}
+
+Summary:"""
+
+document_summary_prompt_template = """These are summaries of consecutive sections of one document.
+Write an overview of the whole document in at most {max_words} words: what it is, its main points and conclusions.
+Reply with the overview only.
+
+Section summaries:
+{sections}
+
+Overview:"""
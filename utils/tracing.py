@@ -0,0 +1,440 @@
+"""
+Lightweight per-turn tracing.
+
+A chat turn opens a root span with ``turn()``; everything it calls opens child
+spans with ``span()`` or ``@traced``. The current span lives in a ``ContextVar``,
+so nesting follows the call stack without passing ids around, and the trace id
+doubles as the turn id in logs.
+
+    from utils.tracing import set_attributes, span, turn
+
+    with turn("chat_turn", session=session_id):
+        with span("similarity_search", k=5):
+            ...
+        set_attributes(model="llama3")
+
+Sampling is decided once per trace. Unsampled traces record nothing unless a tail
+rule is on (``slow_turn_ms`` / ``keep_errors``), in which case spans are buffered
+and the trace is kept only if it turned out slow or failed. Finished traces are
+handed to a daemon thread that appends them to a JSONL file or POSTs them as
+OTLP/JSON to a collector, so exporting never blocks a request.
+
+    python utils/tracing.py tail --last 5        # print recent traces as trees
+"""
+from __future__ import annotations
+
+import argparse
+import functools
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------
+# Config
+# ---------------------------
+@dataclass(frozen=True)
+class TracingCfg:
+    enabled: bool = True
+    sample_rate: float = 0.1
+    slow_turn_ms: Optional[float] = 5000.0
+    keep_errors: bool = True
+    exporter: str = "jsonl"  # jsonl | otlp | none
+    path: str = "./chatTracking/traces.jsonl"
+    max_bytes: int = 50 * 1024 * 1024
+    otlp_endpoint: str = "http://localhost:4318/v1/traces"
+    service_name: str = "neuranix"
+    max_queue: int = 1000
+
+    @staticmethod
+    def from_dict(d: Optional[Dict[str, Any]]) -> "TracingCfg":
+        """Build from the ``tracing`` config section; TRACE_SAMPLE_RATE overrides the rate."""
+        tc = d or {}
+        slow = tc.get("slow_turn_ms", 5000.0)
+        return TracingCfg(
+            enabled=bool(tc.get("enabled", True)),
+            sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", tc.get("sample_rate", 0.1))),
+            slow_turn_ms=float(slow) if slow is not None else None,
+            keep_errors=bool(tc.get("keep_errors", True)),
+            exporter=str(tc.get("exporter", "jsonl")),
+            path=str(tc.get("path", "./chatTracking/traces.jsonl")),
+            max_bytes=int(tc.get("max_bytes", 50 * 1024 * 1024)),
+            otlp_endpoint=str(tc.get("otlp_endpoint", "http://localhost:4318/v1/traces")),
+            service_name=str(tc.get("service_name", "neuranix")),
+            max_queue=int(tc.get("max_queue", 1000)),
+        )
+
+
+# ---------------------------
+# Spans
+# ---------------------------
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int  # wall clock, for export
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    duration_ns: int = 0
+    status: str = "ok"
+    error: Optional[str] = None
+    _t0: int = 0  # monotonic, for the duration
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ns / 1e6, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+@dataclass
+class Trace:
+    trace_id: str
+    sampled: bool
+    spans: List[Span] = field(default_factory=list)
+    failed: bool = False
+
+
+# Marks a turn that is not being recorded, so its children don't start traces of their own.
+_UNRECORDED = Trace(trace_id="", sampled=False)
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("neuranix_span", default=None)
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("neuranix_trace", default=None)
+
+
+def _new_span_id() -> str:
+    return os.urandom(8).hex()
+
+
+# ---------------------------
+# Exporters
+# ---------------------------
+class JsonlExporter:
+    """One JSON line per trace: the root's name and duration plus its flat span list."""
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def export(self, trace: Trace) -> None:
+        root = trace.spans[-1]  # the root closes last
+        line = json.dumps(
+            {
+                "trace_id": trace.trace_id,
+                "name": root.name,
+                "start_ns": root.start_ns,
+                "duration_ms": round(root.duration_ns / 1e6, 3),
+                "status": "error" if trace.failed else "ok",
+                "spans": [s.to_dict() for s in sorted(trace.spans, key=lambda s: s.start_ns)],
+            },
+            default=str,
+        )
+        try:
+            if os.path.getsize(self.path) > self.max_bytes:
+                os.replace(self.path, self.path + ".1")
+        except FileNotFoundError:
+            pass
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpHttpExporter:
+    """POSTs OTLP/JSON (``/v1/traces``) to a collector; failures are logged and dropped."""
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float = 2.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def _payload(self, trace: Trace) -> Dict[str, Any]:
+        trace_id = trace.trace_id
+        if len(trace_id) != 32 or any(c not in "0123456789abcdef" for c in trace_id):
+            trace_id = hashlib.md5(trace_id.encode("utf-8")).hexdigest()  # OTLP wants 16 bytes of hex
+        spans = []
+        for s in trace.spans:
+            span = {
+                "traceId": trace_id,
+                "spanId": s.span_id,
+                "name": s.name,
+                "kind": 1,
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.start_ns + s.duration_ns),
+                "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+                "status": {"code": 2, "message": s.error or ""} if s.status == "error" else {"code": 1},
+            }
+            if s.parent_id:
+                span["parentSpanId"] = s.parent_id
+            spans.append(span)
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+                    "scopeSpans": [{"scope": {"name": "neuranix.tracing"}, "spans": spans}],
+                }
+            ]
+        }
+
+    def export(self, trace: Trace) -> None:
+        body = json.dumps(self._payload(trace), default=str).encode("utf-8")
+        req = urllib.request.Request(self.endpoint, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=self.timeout):
+            pass
+
+
+# ---------------------------
+# Tracer
+# ---------------------------
+class Tracer:
+    def __init__(self, cfg: TracingCfg, exporter: Optional[Any] = None):
+        self.cfg = cfg
+        self.exporter = exporter if exporter is not None else self._build_exporter(cfg)
+        self.dropped = 0
+        self._queue: "queue.Queue[Trace]" = queue.Queue(maxsize=max(1, cfg.max_queue))
+        self._tail = cfg.keep_errors or cfg.slow_turn_ms is not None
+        if self.enabled:
+            threading.Thread(target=self._export_loop, name="trace-export", daemon=True).start()
+
+    @staticmethod
+    def _build_exporter(cfg: TracingCfg) -> Optional[Any]:
+        if cfg.exporter == "jsonl":
+            return JsonlExporter(cfg.path, cfg.max_bytes)
+        if cfg.exporter == "otlp":
+            return OtlpHttpExporter(cfg.otlp_endpoint, cfg.service_name)
+        return None
+
+    @property
+    def enabled(self) -> bool:
+        return self.cfg.enabled and self.exporter is not None
+
+    def _export_loop(self) -> None:
+        while True:
+            trace = self._queue.get()
+            try:
+                self.exporter.export(trace)
+            except Exception as e:
+                logger.warning("Trace export failed: %s", e)
+
+    def start_trace(self, trace_id: Optional[str] = None) -> Optional[Trace]:
+        """New trace, or None when it is neither head-sampled nor eligible for tail rules."""
+        if not self.enabled:
+            return None
+        sampled = random.random() < self.cfg.sample_rate
+        if not sampled and not self._tail:
+            return None
+        return Trace(trace_id=trace_id or uuid.uuid4().hex, sampled=sampled)
+
+    def finish_trace(self, trace: Trace, root: Span) -> None:
+        keep = (
+            trace.sampled
+            or (self.cfg.keep_errors and trace.failed)
+            or (self.cfg.slow_turn_ms is not None and root.duration_ns / 1e6 >= self.cfg.slow_turn_ms)
+        )
+        if not keep:
+            return
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Wait (up to ``timeout``) for queued traces to be handed to the exporter."""
+        deadline = time.monotonic() + timeout
+        while not self._queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Process-wide tracer, configured from the ``tracing`` section on first use."""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                from utils import load_config
+
+                _tracer = Tracer(TracingCfg.from_dict(load_config().get("tracing")))
+    return _tracer
+
+
+def configure(cfg: TracingCfg, exporter: Optional[Any] = None) -> Tracer:
+    """Replace the process-wide tracer (benchmarks, CLIs, alternative exporters)."""
+    global _tracer
+    with _tracer_lock:
+        _tracer = Tracer(cfg, exporter)
+    return _tracer
+
+
+# ---------------------------
+# Public API
+# ---------------------------
+@contextmanager
+def _record(trace: Trace, name: str, parent: Optional[Span], attrs: Dict[str, Any]) -> Iterator[Span]:
+    s = Span(
+        name=name,
+        trace_id=trace.trace_id,
+        span_id=_new_span_id(),
+        parent_id=parent.span_id if parent else None,
+        start_ns=time.time_ns(),
+        attributes=attrs,
+        _t0=time.perf_counter_ns(),
+    )
+    span_token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.status, s.error = "error", repr(e)
+        trace.failed = True
+        raise
+    finally:
+        s.duration_ns = time.perf_counter_ns() - s._t0
+        _current_span.reset(span_token)
+        trace.spans.append(s)
+
+
+@contextmanager
+def turn(name: str = "chat_turn", turn_id: Optional[str] = None, **attrs: Any) -> Iterator[Optional[Span]]:
+    """Root span of a new trace; ``turn_id`` (default: random) becomes the trace id."""
+    tracer = get_tracer()
+    trace = tracer.start_trace(turn_id)
+    if trace is None:
+        token = _current_trace.set(_UNRECORDED)
+        try:
+            yield None
+        finally:
+            _current_trace.reset(token)
+        return
+    trace_token = _current_trace.set(trace)
+    try:
+        with _record(trace, name, None, attrs) as root:
+            yield root
+    finally:
+        _current_trace.reset(trace_token)
+        tracer.finish_trace(trace, trace.spans[-1])
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Optional[Span]]:
+    """Child of the current span; outside a turn this opens a trace of its own."""
+    trace = _current_trace.get()
+    if trace is None:
+        with turn(name, **attrs) as root:
+            yield root
+        return
+    if trace is _UNRECORDED:
+        yield None
+        return
+    with _record(trace, name, _current_span.get(), attrs) as s:
+        yield s
+
+
+def traced(name: Optional[str] = None) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorator form of ``span``; the span is named after the function by default."""
+
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(span_name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def set_attributes(**attrs: Any) -> None:
+    """Annotate the current span (no-op when the turn is not being recorded)."""
+    s = _current_span.get()
+    if s is not None:
+        s.attributes.update(attrs)
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.trace_id if trace is not None and trace is not _UNRECORDED else None
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def _print_tree(record: Dict[str, Any]) -> None:
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for s in record["spans"]:
+        children.setdefault(s["parent_id"], []).append(s)
+
+    def _walk(parent: Optional[str], depth: int) -> None:
+        for s in children.get(parent, []):
+            attrs = " ".join(f"{k}={v}" for k, v in s["attributes"].items())
+            flag = " !" if s["status"] == "error" else ""
+            print(f"  {'  ' * depth}{s['name']:<{40 - 2 * depth}} {s['duration_ms']:>10.1f} ms{flag}  {attrs}")
+            _walk(s["span_id"], depth + 1)
+
+    print(f"{record['trace_id']}  {record['name']}  {record['duration_ms']:.1f} ms  [{record['status']}]")
+    _walk(None, 0)
+
+
+def main(argv: Sequence[str]) -> int:
+    ap = argparse.ArgumentParser(description="Inspect traces written by the JSONL exporter.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    t = sub.add_parser("tail", help="print the most recent traces as span trees")
+    t.add_argument("--path", default=None)
+    t.add_argument("--last", type=int, default=5)
+    t.add_argument("--slowest", action="store_true", help="pick the slowest traces instead of the latest")
+    args = ap.parse_args(argv)
+
+    path = args.path
+    if path is None:
+        from utils import load_config
+
+        path = TracingCfg.from_dict(load_config().get("tracing")).path
+    try:
+        with open(path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        print(f"no traces at {path}")
+        return 1
+    if args.slowest:
+        records.sort(key=lambda r: r["duration_ms"])
+    for record in records[-args.last :]:
+        _print_tree(record)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))